@@ -0,0 +1,105 @@
+"""Portfolio read latency before and during a login flood.
+
+Seed first (``python -m benchmarks.seed``), then
+
+    python -m benchmarks.auth_flood --duration 20 --flooders 200
+
+Phase 1 measures ``GET /api/user/portfolio/{id}`` for random seeded users on
+its own.  Phase 2 repeats it while ``--flooders`` tasks send wrong-password
+logins as fast as they can, spread over ``--attacker-ips`` source addresses
+(sent as ``X-Real-IP``, as nginx would) and random seeded emails.  With the
+limiter of ``services/rate_limit.py`` almost all of them get 429 before any
+query or bcrypt hash runs, so reads should not notice the flood; the run exits
+with status 1 if the read p95 grows by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, DEFAULT_MANIFEST, print_table, summarize, write_results
+
+
+async def reader(client, users, rng, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        target = rng.choice(users)["id"]
+        start = time.perf_counter()
+        try:
+            response = await client.get(f"/api/user/portfolio/{target}")
+        except httpx.HTTPError:
+            errors.append(1)
+            continue
+        if response.status_code >= 400:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def flooder(client, users, rng, deadline, ips, statuses):
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.post(
+                "/api/user/login",
+                json={"email": rng.choice(users)["email"], "password": "wrong-password"},
+                headers={"X-Real-IP": rng.choice(ips)},
+            )
+            statuses[response.status_code] += 1
+        except httpx.HTTPError:
+            statuses["error"] += 1
+
+
+async def measure(args, users, flood: bool):
+    latencies, errors, statuses = [], [], Counter()
+    limits = httpx.Limits(max_connections=args.readers + args.flooders)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        tasks = [reader(client, users, random.Random(args.seed + i), deadline, latencies, errors)
+                 for i in range(args.readers)]
+        if flood:
+            ips = [f"203.0.113.{i % 254 + 1}" for i in range(args.attacker_ips)]
+            tasks += [flooder(client, users, random.Random(args.seed + 1000 + i), deadline, ips, statuses)
+                      for i in range(args.flooders)]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, len(errors)), statuses
+
+
+async def main(args):
+    with open(args.manifest) as f:
+        users = json.load(f)["users"]
+    if not users:
+        raise SystemExit("The manifest has no users; run benchmarks.seed first")
+
+    quiet, _ = await measure(args, users, flood=False)
+    flooded, statuses = await measure(args, users, flood=True)
+    rows = [{"phase": "reads alone", **quiet}, {"phase": "reads during login flood", **flooded}]
+    print_table(f"GET /api/user/portfolio/{{user_id}}, {args.readers} readers ({args.label})", rows)
+    logins = sum(statuses.values())
+    print(f"\nflood: {logins} logins ({round(logins / args.duration)}/s): "
+          + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+    write_results(args.output, "auth_flood", args.label, rows)
+
+    if quiet["p95_ms"] and flooded["p95_ms"] > quiet["p95_ms"] * (1 + args.tolerance):
+        print(f"Read p95 grew {flooded['p95_ms'] / quiet['p95_ms']:.2f}x during the flood")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--flooders", type=int, default=200)
+    parser.add_argument("--attacker-ips", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
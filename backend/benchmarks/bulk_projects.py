@@ -0,0 +1,109 @@
+"""Bulk project endpoint vs. one request per project.
+
+For each case a fresh user creates `--projects` projects, updates all of them
+and deletes all of them, first through the per-item endpoints
+(``POST/PUT/DELETE /api/user/projects[/{id}]``) and then through
+``POST /api/user/projects/bulk`` in batches of `--batch` operations.  Reports
+wall time, HTTP requests and, when the server runs with
+``QUERY_COUNT_HEADER=true``, the SQL statements each phase issued.
+
+    python -m benchmarks.bulk_projects --projects 200
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table, signup_and_login, write_results
+
+
+class Counter:
+    def __init__(self, client: httpx.AsyncClient, headers: dict):
+        self.client, self.headers = client, headers
+        self.requests = 0
+        self.queries = 0
+
+    async def __call__(self, method: str, url: str, **kwargs) -> httpx.Response:
+        response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        response.raise_for_status()
+        self.requests += 1
+        self.queries += int(response.headers.get("x-query-count", 0))
+        return response
+
+
+async def timed_phase(rows, case, phase, counter, work):
+    requests, queries = counter.requests, counter.queries
+    start = time.perf_counter()
+    result = await work()
+    rows.append({
+        "case": case,
+        "phase": phase,
+        "ms": round((time.perf_counter() - start) * 1000, 2),
+        "http_requests": counter.requests - requests,
+        "sql_statements": counter.queries - queries,
+    })
+    return result
+
+
+async def per_item(client, count, rows):
+    user = await signup_and_login(client)
+    call = Counter(client, {"Authorization": f"Bearer {user['access_token']}"})
+
+    async def create():
+        return [(await call("POST", "/api/user/projects", json={"name": f"project {i}"})).json()["id"] for i in range(count)]
+
+    ids = await timed_phase(rows, "per-item", "create", call, create)
+
+    async def update():
+        for i, project_id in enumerate(ids):
+            await call("PUT", f"/api/user/projects/{project_id}", json={"name": f"renamed {i}"})
+
+    await timed_phase(rows, "per-item", "update", call, update)
+
+    async def remove():
+        for project_id in ids:
+            await call("DELETE", f"/api/user/projects/{project_id}")
+
+    await timed_phase(rows, "per-item", "delete", call, remove)
+
+
+async def bulk(client, count, batch, rows):
+    user = await signup_and_login(client)
+    call = Counter(client, {"Authorization": f"Bearer {user['access_token']}"})
+
+    async def send(operations):
+        results = []
+        for start in range(0, len(operations), batch):
+            response = await call("POST", "/api/user/projects/bulk", json={"operations": operations[start:start + batch]})
+            results.extend(response.json()["results"])
+        return results
+
+    async def create():
+        results = await send([{"op": "create", "project": {"name": f"project {i}"}} for i in range(count)])
+        return [result["id"] for result in results]
+
+    ids = await timed_phase(rows, "bulk", "create", call, create)
+    await timed_phase(rows, "bulk", "update", call, lambda: send([
+        {"op": "update", "id": project_id, "project": {"name": f"renamed {i}"}} for i, project_id in enumerate(ids)
+    ]))
+    await timed_phase(rows, "bulk", "delete", call, lambda: send([{"op": "delete", "id": project_id} for project_id in ids]))
+
+
+async def main(args):
+    rows = []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0) as client:
+        await per_item(client, args.projects, rows)
+        await bulk(client, args.projects, args.batch, rows)
+    print_table(f"bulk projects: {args.projects} projects, batch {args.batch}", rows)
+    write_results(args.output, "bulk_projects", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,146 @@
+"""Cold start: from spawning uvicorn to the first real request answered.
+
+Starts ``uvicorn main:app`` as a subprocess (``--runs`` times, each a fresh
+process) against the database in the environment, and records:
+
+* import_s:    ``python -c "import main"`` minus an empty interpreter;
+* live_s:      spawn until ``GET /api/live`` answers (lifespan startup done);
+* ready_s:     spawn until ``GET /api/ready`` is 200 (warm-up done);
+* first_s:     spawn until the first ``--path`` request has been answered;
+* first_ms / second_ms: latency of that first request and of the one after,
+  so a cold pool or hash pool shows up as a gap between the two.
+
+``--path`` defaults to the first portfolio in the seed manifest (or ``/`` if
+there is none); ``--login`` also times a first login of a seeded user, which
+is what used to wait for the hash pool processes.  Compare with and without
+the warm-up, then check the target:
+
+    python -m benchmarks.cold_start --env WARMUP_ENABLED=false --label no-warmup --output cold.json
+    python -m benchmarks.cold_start --label warmup --output cold.json --target-s 5
+
+The script exits 1 if the median first_s is above ``--target-s``.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import DEFAULT_MANIFEST, print_table, write_results
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(env) -> float:
+    def timed(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    return max(0.0, min(timed("import main") for _ in range(3)) - min(timed("pass") for _ in range(3)))
+
+
+def wait_for(server, client, path, started, deadline, want=200) -> float:
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"the server exited with {server.returncode} (run with --verbose to see why)")
+        try:
+            if client.get(path).status_code == want:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{path} did not return {want} within the timeout")
+
+
+def timed_request(client, method, path, **kwargs) -> float:
+    start = time.perf_counter()
+    response = client.request(method, path, **kwargs)
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def one_run(args, env, login) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + args.timeout
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+            row = {"live_s": wait_for(server, client, "/api/live", started, deadline)}
+            if not args.no_ready:
+                row["ready_s"] = wait_for(server, client, "/api/ready", started, deadline)
+            row["first_ms"] = timed_request(client, "GET", args.path)
+            row["first_s"] = time.perf_counter() - started
+            row["second_ms"] = timed_request(client, "GET", args.path)
+            if login:
+                row["login_ms"] = timed_request(client, "POST", "/api/user/login", json=login)
+        return row
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main(args):
+    env = dict(os.environ)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    login = None
+    if os.path.exists(args.manifest):
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        users = manifest.get("users", [])
+        if users and args.path is None:
+            args.path = f"/api/user/portfolio/{users[0]['id']}"
+        if users and args.login:
+            login = {"email": users[0]["email"], "password": manifest.get("password", "")}
+    args.path = args.path or "/"
+
+    runs = [one_run(args, env, login) for _ in range(args.runs)]
+    row = {"label": args.label, "import_s": round(import_seconds(env), 3)}
+    for key in runs[0]:
+        digits = 1 if key.endswith("_ms") else 3
+        row[key] = round(statistics.median(run[key] for run in runs), digits)
+
+    print_table(f"cold start, median of {args.runs} runs, first request GET {args.path}", [row])
+    write_results(args.output, "cold_start", args.label, [row])
+    if args.target_s and row["first_s"] > args.target_s:
+        print(f"first request answered {row['first_s']}s after spawn, target {args.target_s}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", help="first request (default: a seeded portfolio, else /)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--login", action="store_true", help="also time a first login of a seeded user")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the server (repeatable)")
+    parser.add_argument("--no-ready", action="store_true", help="send the first request right after /api/live")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--target-s", type=float, default=0.0, help="fail if the median first_s is above this")
+    parser.add_argument("--verbose", action="store_true", help="show the server's stderr")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""Shared helpers for the scripts in ``benchmarks/``.
+
+Benchmarks run against a live API (``--base-url``) so they exercise the real
+uvicorn + Postgres stack.  Results are printed as a table and can be appended to
+a JSON file with ``--output`` so runs before/after a change can be compared.
+"""
+import json
+import math
+import os
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = os.getenv("BENCH_BASE_URL", "http://localhost:8000")
+# Written by benchmarks/seed.py, read by benchmarks/load.py
+DEFAULT_MANIFEST = os.getenv("BENCH_MANIFEST", "seed_manifest.json")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Summarize a list of per-request latencies (seconds) measured over `elapsed` seconds."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def print_table(title: str, rows: List[Dict[str, object]]):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print(f"\n{title}")
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def write_results(path: Optional[str], benchmark: str, label: str, rows: List[Dict[str, object]]):
+    """Append one run to a JSON results file (a list of runs)."""
+    if not path:
+        return
+    runs = []
+    if os.path.exists(path):
+        with open(path) as f:
+            runs = json.load(f)
+    runs.append({
+        "benchmark": benchmark,
+        "label": label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": rows,
+    })
+    with open(path, "w") as f:
+        json.dump(runs, f, indent=2)
+
+
+async def signup_and_login(client: httpx.AsyncClient, password: str = "benchmark-password") -> Dict[str, str]:
+    """Create a throwaway user through the public API and return its id and tokens."""
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/api/user/signup", json={"email": email, "password": password})
+    response.raise_for_status()
+    user_id = response.json()["id"]
+    response = await client.post("/api/user/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    tokens = response.json()
+    return {
+        "user_id": user_id,
+        "email": email,
+        "access_token": tokens["access_token"],
+        "refresh_token": tokens.get("refresh_token"),
+    }
@@ -0,0 +1,67 @@
+"""Throughput of the DB-backed read endpoints at increasing client concurrency.
+
+Run it once against the old build and once against the new one, e.g.
+
+    python -m benchmarks.concurrency --label before --output bench.json
+    python -m benchmarks.concurrency --label after --output bench.json
+
+Each level runs `--duration` seconds of closed-loop clients alternating
+``GET /api/user/profile`` (authenticated) and ``GET /api/user/portfolio/{id}``.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table, signup_and_login, summarize, write_results
+
+
+async def _client_loop(client: httpx.AsyncClient, user: dict, deadline: float, latencies: list, errors: list):
+    headers = {"Authorization": f"Bearer {user['access_token']}"}
+    paths = ["/api/user/profile", f"/api/user/portfolio/{user['user_id']}"]
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(paths[i % 2], headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+            else:
+                latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors.append(0)
+        i += 1
+
+
+async def run_level(base_url: str, user: dict, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client_loop(client, user, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, **summarize(latencies, elapsed, len(errors))}
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+        user = await signup_and_login(client)
+    rows = []
+    for level in args.levels:
+        rows.append(await run_level(args.base_url, user, level, args.duration))
+    print_table(f"concurrency ({args.label})", rows)
+    write_results(args.output, "concurrency", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
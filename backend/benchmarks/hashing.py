@@ -0,0 +1,70 @@
+"""Password hashes per second per core for each scheme at its calibrated cost.
+
+No database or API needed:
+
+    python -m benchmarks.hashing --target-ms 150 --processes 4
+
+For every scheme `services.hashing.calibrate` picks the work factor that makes
+one hash take about ``--target-ms`` on this machine (as the API does at
+startup), then ``--processes`` processes hash for ``--duration`` seconds.
+Reports the policy, single-hash latency, total throughput and throughput per
+core, which is what ``HASH_POOL_WORKERS`` and the login rate limits are sized
+from.  Schemes whose backend is not installed (argon2-cffi) are skipped.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+from passlib.exc import MissingBackendError
+
+from benchmarks.common import print_table, write_results
+from services.hashing import HASH_SCHEMES, calibrate, describe_policy, time_hash
+
+
+def hash_for(policy: dict, duration: float) -> float:
+    """Worker: hash for `duration` seconds; returns hashes per second (process start-up excluded)."""
+    context = CryptContext(**policy)
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        context.hash("benchmark-password")
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main(args):
+    rows = []
+    for scheme in args.schemes:
+        try:
+            policy = calibrate(scheme, args.target_ms)
+        except MissingBackendError as e:
+            print(f"skipping {scheme}: {e}")
+            continue
+        latency_ms = time_hash(policy, samples=5) * 1000
+        with ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            rate = sum(pool.map(hash_for, [policy] * args.processes, [args.duration] * args.processes))
+        description = describe_policy(policy)
+        rows.append({
+            "scheme": scheme,
+            "rounds": description["rounds"],
+            "memory_kb": description.get("memory_kb", "-"),
+            "hash_ms": round(latency_ms, 1),
+            "hashes_per_s": round(rate, 1),
+            "per_core_per_s": round(rate / args.processes, 2),
+        })
+    print_table(f"Password hashing, target {args.target_ms:.0f} ms, {args.processes} processes ({args.label})", rows)
+    write_results(args.output, "hashing", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schemes", nargs="+", choices=HASH_SCHEMES, default=list(HASH_SCHEMES))
+    parser.add_argument("--target-ms", type=float, default=150.0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of hashing per scheme")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    main(parser.parse_args())
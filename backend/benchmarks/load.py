@@ -0,0 +1,219 @@
+"""Scripted load test of the real user flows, with per-endpoint latency percentiles.
+
+Seed first (``python -m benchmarks.seed``), then run e.g.
+
+    python -m benchmarks.load --users 50 --duration 60 --label before --output load.json
+    python -m benchmarks.load --users 50 --duration 60 --label after --output load.json \\
+        --baseline load.json --baseline-label before
+
+Each of ``--users`` virtual users logs in as a seeded account and then, until
+``--duration`` runs out, picks a flow by weight (``--mix``) and runs it:
+
+* browse:   GET /profile, GET /portfolio/{random seeded user}
+* projects: GET /projects/me, POST /projects, PUT /projects/{id}, DELETE /projects/{id}
+* upload:   POST /profile/image/upload (a freshly generated JPEG each time)
+* login:    POST /login as a random seeded user
+* signup:   POST /signup with a new address
+
+Results are reported per endpoint (throughput, p50/p95/p99, errors) and can be
+appended to ``--output``.  With ``--baseline`` the run is compared with an
+earlier one; a p95 more than ``--tolerance`` worse, or throughput that much
+lower, on any endpoint exits with status 1.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, DEFAULT_MANIFEST, print_table, summarize, write_results
+
+DEFAULT_MIX = "browse=60,projects=20,upload=5,login=10,signup=5"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        return response
+
+
+def make_jpeg(rng: random.Random, side: int = 512) -> bytes:
+    from PIL import Image
+
+    image = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def login(client, recorder, email: str, password: str):
+    response = await recorder.call(client, "POST /api/user/login", "POST", "/api/user/login",
+                                   json={"email": email, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"} if response else None
+
+
+async def flow_browse(client, recorder, auth, ctx):
+    await recorder.call(client, "GET /api/user/profile", "GET", "/api/user/profile", headers=auth)
+    target = ctx["rng"].choice(ctx["users"])["id"]
+    await recorder.call(client, "GET /api/user/portfolio/{user_id}", "GET", f"/api/user/portfolio/{target}")
+
+
+async def flow_projects(client, recorder, auth, ctx):
+    await recorder.call(client, "GET /api/user/projects/me", "GET", "/api/user/projects/me", headers=auth)
+    response = await recorder.call(client, "POST /api/user/projects", "POST", "/api/user/projects", headers=auth,
+                                   json={"name": "load test project", "description": "created by benchmarks/load.py"})
+    if response is None:
+        return
+    project_id = response.json()["id"]
+    await recorder.call(client, "PUT /api/user/projects/{project_id}", "PUT", f"/api/user/projects/{project_id}",
+                        headers=auth, json={"name": "load test project (edited)"})
+    await recorder.call(client, "DELETE /api/user/projects/{project_id}", "DELETE", f"/api/user/projects/{project_id}",
+                        headers=auth)
+
+
+async def flow_upload(client, recorder, auth, ctx):
+    image = make_jpeg(ctx["rng"])
+    await recorder.call(client, "POST /api/user/profile/image/upload", "POST", "/api/user/profile/image/upload",
+                        headers=auth, files={"file": ("load.jpg", image, "image/jpeg")})
+
+
+async def flow_login(client, recorder, auth, ctx):
+    await login(client, recorder, ctx["rng"].choice(ctx["users"])["email"], ctx["password"])
+
+
+async def flow_signup(client, recorder, auth, ctx):
+    email = f"load-{uuid.UUID(int=ctx['rng'].getrandbits(128)).hex[:16]}@example.com"
+    await recorder.call(client, "POST /api/user/signup", "POST", "/api/user/signup",
+                        json={"email": email, "password": ctx["password"]})
+
+
+FLOWS = {
+    "browse": flow_browse,
+    "projects": flow_projects,
+    "upload": flow_upload,
+    "login": flow_login,
+    "signup": flow_signup,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in FLOWS:
+            raise SystemExit(f"Unknown flow {name!r}; choose from {', '.join(FLOWS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def virtual_user(client, recorder, account, ctx, weights, deadline, seed):
+    ctx = {**ctx, "rng": random.Random(seed)}
+    auth = await login(client, recorder, account["email"], ctx["password"])
+    if auth is None:
+        return
+    names, flow_weights = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        flow = ctx["rng"].choices(names, weights=flow_weights)[0]
+        await FLOWS[flow](client, recorder, auth, ctx)
+
+
+def compare(rows: List[dict], baseline_rows: List[dict], tolerance: float) -> List[dict]:
+    previous = {row["endpoint"]: row for row in baseline_rows}
+    report = []
+    for row in rows:
+        base = previous.get(row["endpoint"])
+        if base is None:
+            continue
+        p95_ratio = row["p95_ms"] / base["p95_ms"] if base["p95_ms"] else 1.0
+        rps_ratio = row["throughput_rps"] / base["throughput_rps"] if base["throughput_rps"] else 1.0
+        regressed = p95_ratio > 1 + tolerance or rps_ratio < 1 - tolerance
+        report.append({
+            "endpoint": row["endpoint"],
+            "p95_ms": f"{base['p95_ms']} -> {row['p95_ms']}",
+            "rps": f"{base['throughput_rps']} -> {row['throughput_rps']}",
+            "result": "REGRESSION" if regressed else "ok",
+        })
+    return report
+
+
+def load_baseline(path: str, label: str) -> List[dict]:
+    with open(path) as f:
+        runs = [run for run in json.load(f) if run["benchmark"] == "load" and run["label"] == label]
+    if not runs:
+        raise SystemExit(f"No 'load' run labelled {label!r} in {path}")
+    return runs[-1]["results"]
+
+
+async def main(args):
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    if not manifest["users"]:
+        raise SystemExit("The manifest has no users; run benchmarks.seed first")
+    baseline = load_baseline(args.baseline, args.baseline_label) if args.baseline else None
+
+    weights = parse_mix(args.mix)
+    ctx = {"users": manifest["users"], "password": manifest["password"]}
+    rng = random.Random(args.seed)
+    accounts = rng.sample(manifest["users"], min(args.users, len(manifest["users"])))
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, recorder, accounts[i % len(accounts)], ctx, weights, deadline, args.seed + i)
+            for i in range(args.users)
+        ))
+        elapsed = time.perf_counter() - started
+
+    rows = [
+        {"endpoint": name, **summarize(recorder.latencies[name], elapsed, recorder.errors[name])}
+        for name in sorted(set(recorder.latencies) | set(recorder.errors))
+    ]
+    total = sum(len(samples) for samples in recorder.latencies.values())
+    print_table(f"load: {args.users} users, {args.duration}s, mix {args.mix} ({args.label})", rows)
+    print(f"\n{total} requests, {round(total / elapsed, 1)} req/s overall")
+    write_results(args.output, "load", args.label, rows)
+
+    if baseline is not None:
+        report = compare(rows, baseline, args.tolerance)
+        print_table(f"vs. {args.baseline_label} (tolerance {args.tolerance:.0%})", report)
+        if any(row["result"] == "REGRESSION" for row in report):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="flow=weight,... (browse, projects, upload, login, signup)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline", help="results file holding an earlier run to compare with")
+    parser.add_argument("--baseline-label", default="baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
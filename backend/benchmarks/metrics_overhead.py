@@ -0,0 +1,92 @@
+"""Per-request cost of MetricsMiddleware, measured in-process.
+
+Drives a minimal FastAPI app directly through its ASGI callable (no server, no
+network, no database) so the only difference between the cases is the
+middleware stack:
+
+* bare:    the app alone
+* stats:   QueryStatsMiddleware (what every request already pays)
+* metrics: QueryStatsMiddleware + MetricsMiddleware (the production stack)
+
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.common import print_table, write_results
+from services.metrics import Metrics, MetricsMiddleware, render
+from services.query_stats import QueryStatsMiddleware
+
+
+def build_app(case: str):
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if case == "metrics":
+        app.add_middleware(MetricsMiddleware, registry=Metrics())
+    if case in ("stats", "metrics"):
+        app.add_middleware(QueryStatsMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/api/items/{i}", "raw_path": f"/api/items/{i}".encode(),
+            "root_path": "", "query_string": b"", "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+        }
+
+    for i in range(200):  # warm-up: builds the middleware stack and caches
+        await app(scope(i), receive, send)
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(scope(i), receive, send)
+    return time.perf_counter() - start
+
+
+async def main(args):
+    timings = {}
+    for case in ("bare", "stats", "metrics"):
+        # Best of `--repeat` to keep GC pauses and scheduler noise out of the comparison.
+        timings[case] = min([await drive(build_app(case), args.requests) for _ in range(args.repeat)])
+
+    bare = timings["bare"] / args.requests
+    rows = [
+        {
+            "case": case,
+            "us_per_request": round(elapsed / args.requests * 1e6, 2),
+            "overhead_us": round((elapsed / args.requests - bare) * 1e6, 2),
+        }
+        for case, elapsed in timings.items()
+    ]
+    registry = Metrics()
+    for i in range(50):
+        registry.record("GET", f"/api/route/{i}", 200, 0.01, None)
+    start = time.perf_counter()
+    render(registry=registry)
+    rows.append({"case": "render 50 routes", "us_per_request": round((time.perf_counter() - start) * 1e6, 2), "overhead_us": "-"})
+
+    print_table(f"metrics middleware overhead ({args.requests} requests, best of {args.repeat})", rows)
+    write_results(args.output, "metrics_overhead", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
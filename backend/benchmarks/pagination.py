@@ -0,0 +1,96 @@
+"""Keyset pagination of project lists at 10k projects per user.
+
+Creates a user through the API, bulk-inserts `--projects` rows for it directly
+through `database.engine` (set DATABASE_URL to the server's database), then
+measures:
+
+* first-page and last-page latency of ``GET /api/user/projects/me`` (keyset
+  pages should cost the same at any depth),
+* the time to walk every page,
+* the unpaginated ``SELECT ... WHERE owner_id = ...`` the endpoint used to run,
+  timed directly against the database for reference.
+
+    python -m benchmarks.pagination --projects 10000 --limit 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import insert, select
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table, signup_and_login, summarize, write_results
+from database import engine
+from models.project import Project
+
+
+async def seed_projects(owner_id: uuid.UUID, count: int, batch: int = 1000):
+    base = datetime.now(timezone.utc)
+    async with engine.begin() as conn:
+        for start in range(0, count, batch):
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "name": f"project {i}",
+                    "description": "benchmark project " * 4,
+                    "owner_id": owner_id,
+                    "created_at": base + timedelta(microseconds=i),
+                }
+                for i in range(start, min(count, start + batch))
+            ]
+            await conn.execute(insert(Project), rows)
+
+
+async def timed_get(client, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.get(url, **kwargs)
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0) as client:
+        user = await signup_and_login(client)
+        owner_id = uuid.UUID(user["user_id"])
+        await seed_projects(owner_id, args.projects)
+        headers = {"Authorization": f"Bearer {user['access_token']}"}
+
+        page_latencies, cursor, pages = [], None, 0
+        walk_start = time.perf_counter()
+        while True:
+            params = {"limit": args.limit, **({"cursor": cursor} if cursor else {})}
+            elapsed, page = await timed_get(client, "/api/user/projects/me", headers=headers, params=params)
+            page_latencies.append(elapsed)
+            pages += 1
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        walk_elapsed = time.perf_counter() - walk_start
+
+    async with engine.connect() as conn:
+        start = time.perf_counter()
+        rows = (await conn.execute(select(Project).where(Project.owner_id == owner_id))).all()
+        full_select = time.perf_counter() - start
+    await engine.dispose()
+
+    rows_out = [
+        {"case": "first page", "ms": round(page_latencies[0] * 1000, 2)},
+        {"case": "last page", "ms": round(page_latencies[-1] * 1000, 2)},
+        {"case": f"all {pages} pages (p95 per page)", "ms": summarize(page_latencies, walk_elapsed)["p95_ms"]},
+        {"case": f"walk all {pages} pages", "ms": round(walk_elapsed * 1000, 2)},
+        {"case": f"unpaginated SELECT ({len(rows)} rows, DB only)", "ms": round(full_select * 1000, 2)},
+    ]
+    print_table(f"pagination: {args.projects} projects, limit {args.limit}", rows_out)
+    write_results(args.output, "pagination", args.label, rows_out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
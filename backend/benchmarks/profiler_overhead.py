@@ -0,0 +1,67 @@
+"""Per-request cost of the request profiler, measured in-process.
+
+Same harness as ``benchmarks/metrics_overhead.py`` (ASGI calls, no server or
+database); only the middleware stack differs:
+
+* disabled: PROFILER_ENABLED=false, the middleware is not installed
+* idle:     installed with a token and PROFILER_SAMPLE_RATE=0, request not selected
+* sampled:  every request profiled and written to a temporary directory
+
+    python -m benchmarks.profiler_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import tempfile
+
+from fastapi import FastAPI
+
+from benchmarks.common import print_table, write_results
+from benchmarks.metrics_overhead import drive
+from services import profiler
+
+
+def build_app(case: str):
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if case != "disabled":
+        app.add_middleware(
+            profiler.ProfilerMiddleware,
+            sample_rate=1.0 if case == "sampled" else 0.0, paths=[], token="benchmark-token",
+        )
+    return app
+
+
+async def main(args):
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        profiler.capture_store = profiler.CaptureStore(directory, max_files=50)
+        for case in ("disabled", "idle"):
+            timings[case] = min([await drive(build_app(case), args.requests) for _ in range(args.repeat)])
+        # Each capture writes a file, so fewer requests are enough.
+        timings["sampled"] = await drive(build_app("sampled"), args.sampled_requests) * args.requests / args.sampled_requests
+
+    base = timings["disabled"] / args.requests
+    rows = [
+        {
+            "case": case,
+            "us_per_request": round(elapsed / args.requests * 1e6, 2),
+            "overhead_us": round((elapsed / args.requests - base) * 1e6, 2),
+        }
+        for case, elapsed in timings.items()
+    ]
+    print_table(f"profiler middleware overhead ({args.requests} requests, best of {args.repeat})", rows)
+    write_results(args.output, "profiler_overhead", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sampled-requests", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""Fail if any endpoint issues more SQL statements than its budget.
+
+The server must run with ``QUERY_COUNT_HEADER=true`` so every response carries
+``X-Query-Count``.  The script walks the main user flows with a fresh account
+(so the principal and portfolio caches start cold) and compares each count with
+``benchmarks/query_budgets.json``.  Exit status is 1 on any regression; lower
+counts are reported so the budget can be tightened in the same change.
+
+    python -m benchmarks.query_budget --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+
+
+async def collect_counts(base_url: str) -> dict:
+    counts = {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        async def call(name, method, url, **kwargs):
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            if "x-query-count" not in response.headers:
+                raise SystemExit("Server did not send X-Query-Count; start it with QUERY_COUNT_HEADER=true")
+            counts[name] = int(response.headers["x-query-count"])
+            return response
+
+        email = f"budget-{uuid.uuid4().hex[:12]}@example.com"
+        password = "budget-password"
+        user = (await call("POST /api/user/signup", "POST", "/api/user/signup",
+                           json={"email": email, "password": password})).json()
+        tokens = (await call("POST /api/user/login", "POST", "/api/user/login",
+                             json={"email": email, "password": password})).json()
+        tokens = (await call("POST /api/user/refresh-token", "POST", "/api/user/refresh-token",
+                             json={"refresh_token": tokens["refresh_token"]})).json()
+        auth = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+        await call("GET /api/user/profile", "GET", "/api/user/profile", headers=auth)
+        await call("PUT /api/user/profile", "PUT", "/api/user/profile", headers=auth,
+                   json={"name": "Budget", "job_title": "Tester"})
+        project = (await call("POST /api/user/projects", "POST", "/api/user/projects", headers=auth,
+                              json={"name": "budget project"})).json()
+        await call("GET /api/user/projects/me", "GET", "/api/user/projects/me", headers=auth)
+        await call("PUT /api/user/projects/{project_id}", "PUT", f"/api/user/projects/{project['id']}",
+                   headers=auth, json={"name": "renamed"})
+        await call("POST /api/user/projects/bulk", "POST", "/api/user/projects/bulk", headers=auth, json={
+            "operations": [
+                {"op": "create", "project": {"name": "bulk 1"}},
+                {"op": "create", "project": {"name": "bulk 2"}},
+                {"op": "update", "id": project["id"], "project": {"description": "bulk"}},
+                {"op": "delete", "id": str(uuid.uuid4())},
+            ],
+        })
+        await call("GET /api/user/portfolio/{user_id}", "GET", f"/api/user/portfolio/{user['id']}")
+        await call("GET /api/user/portfolio/{user_id} (cached)", "GET", f"/api/user/portfolio/{user['id']}")
+        await call("DELETE /api/user/projects/{project_id}", "DELETE", f"/api/user/projects/{project['id']}",
+                   headers=auth)
+    return counts
+
+
+def main(args):
+    with open(BUDGETS_PATH) as f:
+        budgets = json.load(f)
+    counts = asyncio.run(collect_counts(args.base_url))
+
+    rows, regressions = [], 0
+    for endpoint, budget in budgets.items():
+        count = counts.get(endpoint)
+        if count is None:
+            verdict = "not measured"
+        elif count > budget:
+            verdict = "REGRESSION"
+            regressions += 1
+        elif count < budget:
+            verdict = "under budget (tighten?)"
+        else:
+            verdict = "ok"
+        rows.append({"endpoint": endpoint, "queries": count, "budget": budget, "result": verdict})
+    print_table("SQL statements per request", rows)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    main(parser.parse_args())
@@ -0,0 +1,185 @@
+"""Fail if any CRUD query plans a sequential scan or stops using its index.
+
+Runs against the database behind ``DATABASE_URL`` after it has been seeded
+(``python -m benchmarks.seed``) and migrated.  Each case calls a real function
+from ``crud/`` inside one transaction that is rolled back at the end (commits
+become savepoints), captures every SELECT/UPDATE/DELETE it sends, and runs
+``EXPLAIN (FORMAT JSON)`` on it with the same parameters.
+
+Plans are taken with ``enable_seqscan = off``: Postgres then only picks a
+sequential scan when no index can serve the query at all, so the check does
+not depend on how much data the seed produced.  A case fails when
+
+* any plan node is a Seq Scan, or
+* an index listed for it in ``benchmarks/query_plans.json`` no longer appears.
+
+Indexes that appear but are not listed are reported so the file can be
+extended; ``--update`` rewrites it from the observed plans.
+
+    python -m benchmarks.query_plans
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import print_table
+from crud import email as crud_email
+from crud import image as crud_image
+from crud import project as crud_project
+from crud import search as crud_search
+from crud import user as crud_user
+from database import engine
+from schemas.project import ProjectBulkOperation, ProjectCreateUpdate
+from schemas.user import UserProfileUpdate
+
+PLANS_PATH = os.path.join(os.path.dirname(__file__), "query_plans.json")
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+async def _next_page(db, ctx):
+    _, cursor = await crud_project.get_user_projects(db, ctx["owner_id"], 1)
+    ctx["capture"].statements = []  # only the cursor page is checked
+    await crud_project.get_user_projects(db, ctx["owner_id"], 1, cursor)
+
+
+CASES = {
+    "get_user_by_email": lambda db, ctx: crud_user.get_user_by_email(db, ctx["email"].upper()),
+    "get_user_by_id (with projects)": lambda db, ctx: crud_user.get_user_by_id(db, ctx["owner_id"], with_projects=True),
+    "get_user_with_project_page": lambda db, ctx: crud_user.get_user_with_project_page(db, ctx["owner_id"], 50),
+    "get_user_projects (first page)": lambda db, ctx: crud_project.get_user_projects(db, ctx["owner_id"], 50),
+    "get_user_projects (next page)": _next_page,
+    "get_project_by_id": lambda db, ctx: crud_project.get_project_by_id(db, ctx["project_ids"][0]),
+    "update_user_profile": lambda db, ctx: crud_user.update_user_profile(
+        db, ctx["owner_id"], UserProfileUpdate(job_title="Plan check"), 50),
+    "update_user_profile_image": lambda db, ctx: crud_user.update_user_profile_image(db, ctx["owner_id"], None),
+    "update_project": lambda db, ctx: crud_project.update_project(
+        db, ctx["project_ids"][0], ProjectCreateUpdate(name="plan check"), ctx["owner_id"]),
+    "bulk_apply_projects": lambda db, ctx: crud_project.bulk_apply_projects(db, ctx["owner_id"], [
+        ProjectBulkOperation(op="update", id=ctx["project_ids"][1], project=ProjectCreateUpdate(name="plan check")),
+        ProjectBulkOperation(op="delete", id=ctx["project_ids"][2]),
+    ]),
+    "delete_project": lambda db, ctx: crud_project.delete_project(db, ctx["project_ids"][0], ctx["owner_id"]),
+    "search_users": lambda db, ctx: crud_search.search_users(db, "cloud", 20),
+    "search_projects": lambda db, ctx: crud_search.search_projects(db, "cloud", 20),
+    "claim_due_emails": lambda db, ctx: crud_email.claim_due_emails(db, 10, 60),
+    "claim_unreferenced": lambda db, ctx: crud_image.claim_unreferenced(db, datetime.now(timezone.utc), 100),
+    "get_known_hashes": lambda db, ctx: crud_image.get_known_hashes(db, ["0" * 64]),
+}
+
+
+class Capture:
+    """before_cursor_execute listener collecting the statements a case sends."""
+
+    def __init__(self):
+        self.active = False
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and statement.lstrip().upper().startswith(EXPLAINED):
+            self.statements.append((statement, parameters))
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def pick_context(conn) -> dict:
+    row = (await conn.execute(text(
+        "SELECT p.owner_id, u.email FROM projects p JOIN users u ON u.id = p.owner_id "
+        "GROUP BY p.owner_id, u.email HAVING count(*) >= 3 LIMIT 1"
+    ))).first()
+    if row is None:
+        raise SystemExit("No user with 3+ projects; seed the database first (python -m benchmarks.seed)")
+    project_ids = (await conn.execute(
+        text("SELECT id FROM projects WHERE owner_id = :owner_id ORDER BY created_at, id LIMIT 3"),
+        {"owner_id": row.owner_id},
+    )).scalars().all()
+    return {"owner_id": row.owner_id, "email": row.email, "project_ids": list(project_ids)}
+
+
+async def explain_cases(analyze: bool) -> dict:
+    capture = Capture()
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    observed = {}
+    try:
+        async with engine.connect() as conn:
+            if analyze:
+                await conn.execute(text("ANALYZE"))
+                await conn.commit()
+            ctx = await pick_context(conn)
+            ctx["capture"] = capture
+            # pick_context began the transaction that everything below runs (and is rolled back) in.
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+            try:
+                for name, case in CASES.items():
+                    capture.statements, capture.active = [], True
+                    try:
+                        await case(db, ctx)
+                    finally:
+                        capture.active = False
+                    indexes, seq_scans = set(), set()
+                    for statement, parameters in capture.statements:
+                        plan = (await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)).scalar()
+                        if isinstance(plan, str):
+                            plan = json.loads(plan)
+                        for node in plan_nodes(plan[0]["Plan"]):
+                            if node["Node Type"] == "Seq Scan":
+                                seq_scans.add(node.get("Relation Name", "?"))
+                            if "Index Name" in node:
+                                indexes.add(node["Index Name"])
+                    observed[name] = {"indexes": sorted(indexes), "seq_scans": sorted(seq_scans),
+                                      "statements": len(capture.statements)}
+            finally:
+                await db.close()
+                await conn.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        await engine.dispose()
+    return observed
+
+
+def main(args):
+    with open(PLANS_PATH) as f:
+        expected = json.load(f)
+    observed = asyncio.run(explain_cases(args.analyze))
+
+    if args.update:
+        with open(PLANS_PATH, "w") as f:
+            json.dump({name: result["indexes"] for name, result in observed.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {PLANS_PATH}")
+
+    rows, failures = [], 0
+    for name, result in observed.items():
+        missing = sorted(set(expected.get(name, [])) - set(result["indexes"]))
+        extra = sorted(set(result["indexes"]) - set(expected.get(name, [])))
+        if result["seq_scans"]:
+            verdict = "SEQ SCAN on " + ", ".join(result["seq_scans"])
+        elif missing and not args.update:
+            verdict = "REGRESSION: lost " + ", ".join(missing)
+        elif name not in expected and not args.update:
+            verdict = "not in query_plans.json"
+        else:
+            verdict = "ok" + (f" (also {', '.join(extra)})" if extra and not args.update else "")
+        if not verdict.startswith("ok"):
+            failures += 1
+        rows.append({"query": name, "statements": result["statements"],
+                     "indexes": ", ".join(result["indexes"]) or "-", "result": verdict})
+    print_table("Query plans (enable_seqscan = off)", rows)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyze", action="store_true", help="ANALYZE all tables before planning")
+    parser.add_argument("--update", action="store_true", help="rewrite query_plans.json from the observed plans")
+    main(parser.parse_args())
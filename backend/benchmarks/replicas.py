@@ -0,0 +1,115 @@
+"""End-to-end check of read-replica routing against a primary and a standby.
+
+Needs two local Postgres instances, the second a streaming standby of the first,
+e.g. ``pg_basebackup -D standby -R`` then ``pg_ctl -D standby -o "-p 5433" start``.
+Start the API with
+
+    DATABASE_URL=postgresql://...:5432/db DATABASE_REPLICA_URLS=postgresql://...:5433/db \\
+        REPLICA_HEALTH_INTERVAL=1 uvicorn main:app
+
+and run
+
+    python -m benchmarks.replicas --stop-replica "pg_ctl -D standby stop" \\
+        --start-replica "pg_ctl -D standby -o '-p 5433' start"
+
+Checks, in order (exit status 1 if any fails):
+
+1. read-your-writes: right after ``PUT /profile`` the same client (which now
+   carries the ``db_pin`` cookie) sees its change on ``GET /portfolio/{id}``;
+2. anonymous portfolio reads are served by the replica;
+3. with ``--stop-replica``: once the replica is down, reads keep succeeding
+   (served by the primary) and the replica is reported unhealthy;
+4. with ``--start-replica``: the replica is marked healthy again.
+"""
+import argparse
+import asyncio
+import subprocess
+import time
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table, signup_and_login
+
+
+async def replica_stats(client: httpx.AsyncClient) -> dict:
+    response = await client.get("/api/health/replicas")
+    response.raise_for_status()
+    return response.json()
+
+
+async def read_many(client: httpx.AsyncClient, user_id: str, count: int) -> int:
+    errors = 0
+    for _ in range(count):
+        response = await client.get(f"/api/user/portfolio/{user_id}")
+        errors += response.status_code != 200
+    return errors
+
+
+async def wait_for(client, predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate(await replica_stats(client)):
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def main(args) -> int:
+    rows = []
+
+    def record(check, ok, detail=""):
+        rows.append({"check": check, "result": "ok" if ok else "FAILED", "detail": detail})
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as editor, \
+            httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as visitor:
+        stats = await replica_stats(visitor)
+        if not stats["replicas"]:
+            raise SystemExit("The server has no replicas configured (DATABASE_REPLICA_URLS)")
+
+        user = await signup_and_login(editor)
+        auth = {"Authorization": f"Bearer {user['access_token']}"}
+        # Let the standby replay the signup before anonymous reads are routed to it.
+        await asyncio.sleep(args.replay_wait)
+
+        stale = 0
+        for i in range(args.writes):
+            name = f"replica check {i}"
+            (await editor.put("/api/user/profile", headers=auth, json={"name": name})).raise_for_status()
+            response = await editor.get(f"/api/user/portfolio/{user['user_id']}")
+            stale += response.json().get("name") != name
+        record("read-your-writes after PUT /profile", stale == 0, f"{stale}/{args.writes} stale reads")
+
+        await asyncio.sleep(args.replay_wait)
+        before = await replica_stats(visitor)
+        errors = await read_many(visitor, user["user_id"], args.reads)
+        after = await replica_stats(visitor)
+        replica_sessions = sum(r["sessions"] for r in after["replicas"]) - sum(r["sessions"] for r in before["replicas"])
+        record("anonymous reads use the replica", replica_sessions > 0 and errors == 0,
+               f"{replica_sessions} replica sessions, {errors} errors")
+
+        if args.stop_replica:
+            subprocess.run(args.stop_replica, shell=True, check=True)
+            down = await wait_for(visitor, lambda s: not any(r["healthy"] for r in s["replicas"]), args.timeout)
+            errors = await read_many(visitor, user["user_id"], args.reads)
+            record("replica down: reported unhealthy", down)
+            record("replica down: reads fall back to primary", errors == 0, f"{errors} errors")
+
+            if args.start_replica:
+                subprocess.run(args.start_replica, shell=True, check=True)
+                up = await wait_for(visitor, lambda s: all(r["healthy"] for r in s["replicas"]), args.timeout)
+                record("replica back: reported healthy", up)
+
+    print_table("read replica routing", rows)
+    return 0 if all(row["result"] == "ok" for row in rows) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--writes", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=50)
+    parser.add_argument("--replay-wait", type=float, default=1.0, help="seconds to let the standby catch up")
+    parser.add_argument("--stop-replica", help="shell command that stops the standby")
+    parser.add_argument("--start-replica", help="shell command that starts it again")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
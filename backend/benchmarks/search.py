@@ -0,0 +1,102 @@
+"""Latency of GET /api/search on a large seeded dataset.
+
+Seed about a million projects first (the seed vocabulary in
+``benchmarks/seed.py`` is what the queries below draw from), e.g.
+
+    python -m benchmarks.seed --users 20000 --projects-per-user 50 --reset
+    python -m benchmarks.search --requests 200 --target-ms 50
+
+Each case sends ``--requests`` searches with a random vocabulary word shaped
+into one kind of query:
+
+* word:   a whole word ("vector")
+* prefix: the first three letters ("vec"), served by the ``:*`` prefix match
+* typo:   one letter swapped ("vetcor"), only the trigram name index finds it
+* two:    two words ("cloud vector"), both must match
+* page 2: the word query again, following ``next_cursor``
+
+and reports p50/p95/p99 per case.  Any case whose p95 is above ``--target-ms``
+exits with status 1.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table, summarize, write_results
+from benchmarks.seed import WORDS
+
+
+def typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+CASES = {
+    "word": lambda rng: rng.choice(WORDS),
+    "prefix": lambda rng: rng.choice(WORDS)[:3],
+    "typo": lambda rng: typo(rng.choice(WORDS), rng),
+    "two": lambda rng: " ".join(rng.sample(WORDS, 2)),
+}
+
+
+async def timed_search(client, params):
+    start = time.perf_counter()
+    response = await client.get("/api/search", params=params)
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()
+
+
+async def run_case(client, name, rng, args):
+    latencies, errors, hits = [], 0, 0
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        params = {"q": CASES[name if name != "page 2" else "word"](rng), "type": args.type, "limit": args.limit}
+        try:
+            if name == "page 2":
+                _, first = await timed_search(client, params)
+                cursor = (first.get("projects") or first.get("users") or {}).get("next_cursor")
+                if not cursor:
+                    continue
+                params["projects_cursor" if first.get("projects") else "users_cursor"] = cursor
+            elapsed, body = await timed_search(client, params)
+        except httpx.HTTPError:
+            errors += 1
+            continue
+        latencies.append(elapsed)
+        hits += sum(len((body.get(kind) or {}).get("items", [])) for kind in ("users", "projects"))
+    row = {"case": name, **summarize(latencies, time.perf_counter() - started, errors)}
+    row["avg_hits"] = round(hits / len(latencies), 1) if latencies else 0
+    return row
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+        # Warm the connection pool and the GIN index pages before measuring.
+        for word in WORDS:
+            await timed_search(client, {"q": word, "type": args.type, "limit": args.limit})
+        rows = [await run_case(client, name, rng, args) for name in [*CASES, "page 2"]]
+
+    print_table(f"search: type={args.type}, limit {args.limit}, target p95 {args.target_ms} ms ({args.label})", rows)
+    write_results(args.output, "search", args.label, rows)
+    slow = [row["case"] for row in rows if row["p95_ms"] > args.target_ms]
+    if slow:
+        print(f"\np95 above {args.target_ms} ms: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--requests", type=int, default=200, help="searches per case")
+    parser.add_argument("--type", choices=["all", "users", "projects"], default="all")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
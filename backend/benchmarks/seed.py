@@ -0,0 +1,150 @@
+"""Bulk-load synthetic users and projects for benchmarks and load tests.
+
+Writes straight to the database behind ``DATABASE_URL`` through the
+``models/user.py`` / ``models/project.py`` tables, using Postgres COPY (asyncpg
+``copy_records_to_table``) or, with ``--method insert``, multi-row INSERTs.
+Every seeded user shares one bcrypt hash of ``--password`` so they can all log
+in; ids, names and project counts come from ``--seed`` so runs are reproducible.
+
+The users' ids and emails are written to ``--manifest``, which
+``benchmarks/load.py`` reads to pick accounts and portfolios.
+
+    python -m benchmarks.seed --users 1000 --projects-per-user 20 --reset
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from benchmarks.common import DEFAULT_MANIFEST, print_table
+from database import engine
+from models.project import Project
+from models.user import User
+from services.hashing import pwd_context
+
+USER_COLUMNS = ["id", "email", "hashed_password", "name", "job_title", "bio", "profile_image_url", "email_verified"]
+PROJECT_COLUMNS = ["id", "name", "demo_url", "repository_url", "description", "owner_id", "created_at"]
+
+JOB_TITLES = ["Backend Engineer", "Frontend Developer", "Data Scientist", "Designer", "DevOps Engineer", "Student"]
+WORDS = "api cache graph pixel stream vector cloud river atlas nova orbit prism signal canvas".split()
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def email_for(tag: str, i: int) -> str:
+    return f"seed-{tag}-{i:07d}@example.com"
+
+
+def generate(args, hashed_password: str) -> Tuple[List[tuple], Iterator[tuple]]:
+    rng = random.Random(args.seed)
+    users = [
+        (
+            _uuid(rng), email_for(args.tag, i), hashed_password, f"Seed User {i}",
+            rng.choice(JOB_TITLES), " ".join(rng.choices(WORDS, k=30)), None, True,
+        )
+        for i in range(args.users)
+    ]
+
+    def projects():
+        base = datetime.now(timezone.utc)
+        for n, user in enumerate(users):
+            count = args.projects_per_user
+            if args.jitter:
+                count = max(0, int(rng.gauss(count, count * args.jitter)))
+            for j in range(count):
+                name = " ".join(rng.choices(WORDS, k=2)).title()
+                yield (
+                    _uuid(rng), f"{name} {j}", f"https://demo.example.com/{n}/{j}",
+                    f"https://github.com/seed/{n}-{j}", " ".join(rng.choices(WORDS, k=40)),
+                    user[0], base + timedelta(microseconds=n * 100_000 + j),
+                )
+
+    return users, projects()
+
+
+def _chunks(rows, size: int) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def load(conn, table, columns: List[str], rows, method: str, batch: int) -> int:
+    total = 0
+    if method == "copy":
+        raw = (await conn.get_raw_connection()).driver_connection
+        for chunk in _chunks(rows, batch):
+            await raw.copy_records_to_table(table.name, records=chunk, columns=columns)
+            total += len(chunk)
+    else:
+        for chunk in _chunks(rows, batch):
+            await conn.execute(insert(table), [dict(zip(columns, row)) for row in chunk])
+            total += len(chunk)
+    return total
+
+
+async def reset(conn, tag: str) -> int:
+    seeded = select(User.id).where(User.email.like(f"seed-{tag}-%"))
+    await conn.execute(delete(Project).where(Project.owner_id.in_(seeded)))
+    result = await conn.execute(delete(User).where(User.email.like(f"seed-{tag}-%")))
+    return result.rowcount
+
+
+async def main(args):
+    hashed_password = pwd_context.hash(args.password)
+    users, projects = generate(args, hashed_password)
+
+    rows = []
+    async with engine.begin() as conn:
+        if args.reset:
+            rows.append({"step": "reset", "rows": await reset(conn, args.tag), "seconds": "-"})
+        start = time.perf_counter()
+        count = await load(conn, User.__table__, USER_COLUMNS, users, args.method, args.batch)
+        rows.append({"step": f"users ({args.method})", "rows": count, "seconds": round(time.perf_counter() - start, 2)})
+        start = time.perf_counter()
+        count = await load(conn, Project.__table__, PROJECT_COLUMNS, projects, args.method, args.batch)
+        rows.append({"step": f"projects ({args.method})", "rows": count, "seconds": round(time.perf_counter() - start, 2)})
+        # Fresh statistics so the planner sees the new row counts right away.
+        start = time.perf_counter()
+        await conn.exec_driver_sql("ANALYZE users")
+        await conn.exec_driver_sql("ANALYZE projects")
+        rows.append({"step": "analyze", "rows": "-", "seconds": round(time.perf_counter() - start, 2)})
+    await engine.dispose()
+
+    with open(args.manifest, "w") as f:
+        json.dump({
+            "tag": args.tag,
+            "seed": args.seed,
+            "password": args.password,
+            "users": [{"id": str(user[0]), "email": user[1]} for user in users],
+        }, f)
+    print_table(f"seed: {args.users} users x ~{args.projects_per_user} projects (tag {args.tag!r})", rows)
+    print(f"manifest written to {args.manifest}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects-per-user", type=int, default=20)
+    parser.add_argument("--jitter", type=float, default=0.5,
+                        help="relative stddev of projects per user (0 = exactly --projects-per-user)")
+    parser.add_argument("--method", choices=["copy", "insert"], default="copy")
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tag", default="bench", help="email prefix; lets several datasets coexist")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--reset", action="store_true", help="delete users (and projects) seeded with this tag first")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""CPU cost of serializing a portfolio: FastAPI's response_model path vs. services/serialization.py.
+
+Runs in-process, without a server or database: a transient `User` with
+``--sizes`` projects is serialized as `UserResponse` by
+
+* fastapi:   what FastAPI does for a route returning the ORM object with
+  ``response_model=UserResponse`` (validate, dump to a dict, JSONResponse's
+  ``json.dumps``), and
+* pydantic:  ``model_response(UserResponse, user)`` (validate, then JSON bytes
+  straight from pydantic-core).
+
+Both bodies are checked to decode to the same document before timing.
+
+    python -m benchmarks.serialization --sizes 10,1000,10000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from benchmarks.common import print_table, write_results
+from models.project import Project
+from models.user import User
+from schemas.user import UserResponse
+from services.serialization import model_response
+
+
+def make_user(projects: int) -> User:
+    owner_id = uuid.uuid4()
+    return User(
+        id=owner_id,
+        email="bench@example.com",
+        name="Benchmark User",
+        job_title="Backend Engineer",
+        bio="Builds things. " * 20,
+        profile_image_url="/static/profile_images/ab/abcdef.webp",
+        email_verified=True,
+        projects=[
+            Project(
+                id=uuid.uuid4(),
+                name=f"project {i}",
+                demo_url=f"https://example.com/demo/{i}",
+                repository_url=f"https://github.com/bench/project-{i}",
+                description="A benchmark project with a paragraph of description text. " * 3,
+                owner_id=owner_id,
+            )
+            for i in range(projects)
+        ],
+    )
+
+
+async def fastapi_body(field, user) -> bytes:
+    content = await serialize_response(field=field, response_content=user, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def pydantic_body(user) -> bytes:
+    return model_response(UserResponse, user).body
+
+
+async def best_of(fn, repeats: int) -> float:
+    """Fastest of `repeats` runs, in seconds; the minimum is least disturbed by GC and other noise."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main(args):
+    field = create_model_field(name="Response_get_user_profile", type_=UserResponse, mode="serialization")
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        user = make_user(size)
+        expected = await fastapi_body(field, user)
+        actual = pydantic_body(user)
+        if json.loads(expected) != json.loads(actual):
+            raise SystemExit(f"Bodies differ for {size} projects")
+        repeats = max(5, args.budget // max(size, 1))
+        slow = await best_of(lambda: fastapi_body(field, user), repeats)
+        fast = await best_of(lambda: pydantic_body(user), repeats)
+        rows.append({
+            "projects": size,
+            "body_kb": round(len(actual) / 1024, 1),
+            "fastapi_ms": round(slow * 1000, 3),
+            "pydantic_ms": round(fast * 1000, 3),
+            "speedup": f"{slow / fast:.1f}x",
+        })
+    print_table(f"UserResponse serialization, best of N ({args.label})", rows)
+    write_results(args.output, "serialization", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,10000", help="projects per portfolio, comma-separated")
+    parser.add_argument("--budget", type=int, default=200000, help="projects serialized per case (sets repeats)")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,114 @@
+"""Throughput and peak memory of the NDJSON portfolio export and import.
+
+Seed about a million projects first, e.g.
+
+    python -m benchmarks.seed --users 20000 --projects-per-user 50 --reset
+    python -m benchmarks.transfer --file /tmp/portfolios.ndjson
+
+Runs `crud.transfer.export_portfolios` into ``--file`` and then
+`crud.transfer.import_portfolios` from it, in this process against
+``DATABASE_URL`` (the HTTP layer only adds socket copies).  The import upserts
+the rows it just exported, so the data is unchanged afterwards.  For each
+phase it reports rows, seconds, rows/s and the peak RSS sampled from
+/proc/self/statm, which should stay flat as the table grows; ``--max-rss-mb``
+makes the run fail when a phase exceeds it.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+
+from benchmarks.common import print_table, write_results
+from crud import transfer as crud_transfer
+from database import SessionLocal, engine
+from models import user as models_user  # noqa: F401 (registers User for the Project mapper)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 2**20
+    except OSError:
+        # No procfs (macOS): the lifetime peak is the best there is (KB on Linux, bytes on macOS).
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class PeakRss:
+    """Samples RSS every few milliseconds while the block runs."""
+
+    async def __aenter__(self):
+        self.peak = rss_mb()
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, rss_mb())
+            await asyncio.sleep(0.02)
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, rss_mb())
+
+
+async def export_to(path: str):
+    users = projects = 0
+    async with SessionLocal() as db:
+        with open(path, "wb") as f:
+            async for chunk in crud_transfer.export_portfolios(db):
+                f.write(chunk)
+                users += chunk.count(b"\n")
+                projects += chunk.count(b'"created_at"')
+    return users, projects
+
+
+async def read_file(path: str, chunk_size: int):
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def import_from(path: str, chunk_size: int):
+    async with SessionLocal() as db:
+        totals = await crud_transfer.import_portfolios(db, read_file(path, chunk_size))
+    return totals["users"], totals["projects"]
+
+
+async def main(args):
+    baseline = rss_mb()
+    rows = []
+    try:
+        for phase, run in (("export", export_to(args.file)), ("import", import_from(args.file, args.chunk_size))):
+            async with PeakRss() as rss:
+                started = time.perf_counter()
+                users, projects = await run
+                elapsed = time.perf_counter() - started
+            rows.append({
+                "phase": phase, "users": users, "projects": projects, "seconds": round(elapsed, 2),
+                "rows_per_s": round((users + projects) / elapsed) if elapsed else 0,
+                "peak_rss_mb": round(rss.peak, 1),
+            })
+    finally:
+        await engine.dispose()
+
+    size_mb = os.path.getsize(args.file) / 2**20
+    print_table(f"NDJSON transfer, {size_mb:.0f} MB file, baseline RSS {baseline:.0f} MB ({args.label})", rows)
+    write_results(args.output, "transfer", args.label, rows)
+    if args.max_rss_mb and any(row["peak_rss_mb"] > args.max_rss_mb for row in rows):
+        print(f"Peak RSS above {args.max_rss_mb} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", default="portfolios.ndjson")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024, help="bytes per read, like a request body chunk")
+    parser.add_argument("--max-rss-mb", type=float)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""Profile image upload throughput and server memory with concurrent large files.
+
+Generates a noisy JPEG of roughly `--megapixels` MP client-side (noise defeats
+compression, so the file is large), then has `--concurrency` users upload it
+`--uploads` times each.  Pass `--pid` with the uvicorn PID (on the same host) to
+sample the resident memory of the server and its worker pool while the
+benchmark runs.
+
+    python -m benchmarks.upload --concurrency 1 8 32 --pid $(pgrep -of uvicorn)
+"""
+import argparse
+import asyncio
+import io
+import os
+import time
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, print_table, signup_and_login, summarize, write_results
+
+
+def make_image(megapixels: float) -> bytes:
+    from PIL import Image
+
+    side = int((megapixels * 1_000_000) ** 0.5)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                queue.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_mb(pid: int) -> float:
+    total_kb = 0
+    for child in _process_tree(pid):
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total_kb / 1024, 1)
+
+
+async def sample_rss(pid: Optional[int], samples: list, stop: asyncio.Event):
+    while pid and not stop.is_set():
+        samples.append(rss_mb(pid))
+        await asyncio.sleep(0.1)
+
+
+async def run_level(base_url: str, users: list, payload: bytes, uploads: int, pid: Optional[int]) -> dict:
+    latencies, errors, rss = [], [], []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(pid, rss, stop))
+    baseline = rss_mb(pid) if pid else 0.0
+
+    async def uploader(client, user):
+        headers = {"Authorization": f"Bearer {user['access_token']}"}
+        for _ in range(uploads):
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/user/profile/image/upload",
+                headers=headers,
+                files={"file": ("bench.jpg", payload, "image/jpeg")},
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status_code)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(uploader(client, user) for user in users))
+        elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    row = {"concurrency": len(users), **summarize(latencies, elapsed, len(errors))}
+    row["MB_per_s"] = round(len(latencies) * len(payload) / elapsed / 1024 / 1024, 2)
+    if pid:
+        row["rss_baseline_mb"] = baseline
+        row["rss_peak_mb"] = max(rss or [baseline])
+    return row
+
+
+async def main(args):
+    payload = make_image(args.megapixels)
+    print(f"payload: {len(payload) / 1024 / 1024:.1f} MB JPEG")
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+        users = [await signup_and_login(client) for _ in range(max(args.concurrency))]
+    rows = []
+    for level in args.concurrency:
+        rows.append(await run_level(args.base_url, users[:level], payload, args.uploads, args.pid))
+    print_table(f"uploads ({args.label})", rows)
+    write_results(args.output, "upload", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--uploads", type=int, default=5, help="uploads per client")
+    parser.add_argument("--megapixels", type=float, default=2.0)
+    parser.add_argument("--pid", type=int, help="uvicorn PID to sample RSS from")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""Portfolio read latency with view counting off and on, and no lost views.
+
+Seed first (``python -m benchmarks.seed``), then run the same load twice
+against servers started with ``VIEW_COUNTER_ENABLED=false`` and ``=true``:
+
+    python -m benchmarks.view_counter --label off --output views.json
+    python -m benchmarks.view_counter --label on --output views.json --baseline off
+
+``--readers`` tasks fetch ``GET /api/user/portfolio/{id}`` for ``--targets``
+seeded users for ``--duration`` seconds.  With ``--baseline`` the p50/p95 are
+compared with that earlier run in ``--output`` and the script exits 1 if the
+p95 grew by more than ``--tolerance``.  When counting is on it also waits for
+one flush interval and checks that ``/api/user/portfolio/{id}/stats`` grew by
+exactly the number of successful reads (run it on a server with no other
+traffic to those portfolios).
+
+Through nginx (``--base-url http://localhost:46000``) reads with a snapshot
+file are counted by nginx's mirror and the others by the API route.  With
+``--snapshot-miss DIR`` (the backend's ``PORTFOLIO_SNAPSHOT_DIR``, e.g. the
+``portfolio_snapshots`` volume) every reader deletes the target's file right
+before each read, so every view takes the miss path (nginx -> @backend_api)
+and the lost-views check covers it:
+
+    python -m benchmarks.view_counter --base-url http://localhost:46000 --label miss \
+        --snapshot-miss /var/lib/docker/volumes/portfolio_snapshots/_data
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, DEFAULT_MANIFEST, print_table, summarize, write_results
+
+
+def drop_snapshot(snapshot_dir, target):
+    try:
+        os.unlink(os.path.join(snapshot_dir, "portfolio", f"{target}.json"))
+    except FileNotFoundError:
+        pass
+
+
+async def reader(client, targets, rng, deadline, latencies, errors, served, snapshot_dir=None):
+    while time.perf_counter() < deadline:
+        target = rng.choice(targets)
+        if snapshot_dir:
+            drop_snapshot(snapshot_dir, target)
+        start = time.perf_counter()
+        try:
+            response = await client.get(f"/api/user/portfolio/{target}")
+        except httpx.HTTPError:
+            errors.append(1)
+            continue
+        if response.status_code >= 400:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - start)
+        served[target] += 1
+
+
+async def counting_enabled(client) -> bool:
+    response = await client.get("/api/health/caches")
+    response.raise_for_status()
+    return response.json().get("view_counter", {}).get("enabled", False)
+
+
+async def views_of(client, targets):
+    totals = {}
+    for target in targets:
+        response = await client.get(f"/api/user/portfolio/{target}/stats")
+        response.raise_for_status()
+        totals[target] = response.json()["views"]
+    return totals
+
+
+def baseline_row(path, label):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        runs = [run for run in json.load(f) if run["benchmark"] == "view_counter" and run["label"] == label]
+    return runs[-1]["results"][0] if runs else None
+
+
+async def main(args):
+    with open(args.manifest) as f:
+        users = json.load(f)["users"]
+    if not users:
+        raise SystemExit("The manifest has no users; run benchmarks.seed first")
+    rng = random.Random(args.seed)
+    targets = [user["id"] for user in rng.sample(users, min(args.targets, len(users)))]
+
+    latencies, errors, served = [], [], Counter()
+    limits = httpx.Limits(max_connections=args.readers)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        counting = await counting_enabled(client)
+        before = await views_of(client, targets) if counting else None
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            reader(client, targets, random.Random(args.seed + i), deadline, latencies, errors, served, args.snapshot_miss)
+            for i in range(args.readers)
+        ))
+        elapsed = time.perf_counter() - started
+        row = {"counting": args.label, **summarize(latencies, elapsed, len(errors))}
+
+        lost = None
+        if before is not None and args.flush_wait > 0:
+            await asyncio.sleep(args.flush_wait)
+            after = await views_of(client, targets)
+            lost = sum(served[t] - (after[t] - before[t]) for t in targets)
+            row["views_counted"] = sum(after[t] - before[t] for t in targets)
+
+    rows = [row]
+    baseline = baseline_row(args.output, args.baseline) if args.baseline else None
+    if baseline:
+        rows.insert(0, {key: baseline.get(key, "") for key in row})
+    print_table(f"GET /api/user/portfolio/{{user_id}}, {args.readers} readers, {len(targets)} portfolios", rows)
+    write_results(args.output, "view_counter", args.label, [row])
+
+    failed = False
+    if lost:
+        print(f"{lost} views were served but not counted")
+        failed = True
+    if baseline and baseline["p95_ms"] and row["p95_ms"] > baseline["p95_ms"] * (1 + args.tolerance):
+        print(f"p95 grew {row['p95_ms'] / baseline['p95_ms']:.2f}x over '{args.baseline}'")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--targets", type=int, default=100, help="portfolios read (few = hot rows)")
+    parser.add_argument("--flush-wait", type=float, default=7.0,
+                        help="seconds to wait for a flush before checking the totals (0 skips the check)")
+    parser.add_argument("--snapshot-miss", metavar="DIR",
+                        help="PORTFOLIO_SNAPSHOT_DIR to delete each target's file from before every read")
+    parser.add_argument("--baseline", help="label of an earlier run in --output to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="on")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""SQL statements and latency of the single-item write endpoints.
+
+Start the server with ``QUERY_COUNT_HEADER=true`` and run
+
+    python -m benchmarks.write_paths --iterations 200 --label after --output writes.json
+
+once on the old build (``--label before``) and once on the new one to compare
+the two runs in ``--output``.  Each case repeats one write ``--iterations``
+times for a throwaway user and reports the statements per request (from
+``X-Query-Count``; BEGIN/COMMIT are not counted) and p50/p95 latency.  Signup
+includes one password hash, so it is dominated by ``PASSWORD_HASH_TARGET_MS``;
+run with ``AUTH_RATE_LIMIT_ENABLED=false`` so the signup cases are not cut off
+with 429.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import DEFAULT_BASE_URL, percentile, print_table, signup_and_login, write_results
+
+
+async def run_case(client, name, requests, iterations):
+    latencies, statements = [], []
+    for i in range(iterations):
+        method, url, kwargs = await requests(i)
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        statements.append(int(response.headers.get("x-query-count", -1)))
+    return {
+        "endpoint": name,
+        "statements": max(statements),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+        account = await signup_and_login(client)
+        auth = {"Authorization": f"Bearer {account['access_token']}"}
+        if (await client.get("/api/user/profile", headers=auth)).headers.get("x-query-count") is None:
+            raise SystemExit("Server did not send X-Query-Count; start it with QUERY_COUNT_HEADER=true")
+
+        created = []
+
+        async def signup(i):
+            email = f"writes-{uuid.uuid4().hex[:12]}@example.com"
+            return "POST", "/api/user/signup", {"json": {"email": email, "password": "writes-password"}}
+
+        async def signup_taken(i):
+            return "POST", "/api/user/signup", {"json": {"email": account["email"], "password": "writes-password"}}
+
+        async def update_profile(i):
+            return "PUT", "/api/user/profile", {"headers": auth, "json": {"name": f"Writer {i}", "job_title": "Bench"}}
+
+        async def create_project(i):
+            return "POST", "/api/user/projects", {"headers": auth, "json": {"name": f"write path {i}"}}
+
+        async def update_project(i):
+            return "PUT", f"/api/user/projects/{created[i]}", {"headers": auth, "json": {"name": f"renamed {i}"}}
+
+        async def delete_project(i):
+            return "DELETE", f"/api/user/projects/{created[i]}", {"headers": auth}
+
+        rows = [
+            await run_case(client, "POST /api/user/signup", signup, args.signups),
+            await run_case(client, "POST /api/user/signup (taken)", signup_taken, args.signups),
+            await run_case(client, "PUT /api/user/profile", update_profile, args.iterations),
+        ]
+        # Remember the ids so the update/delete cases have one project per iteration.
+        for i in range(args.iterations):
+            response = await client.post("/api/user/projects", headers=auth, json={"name": f"target {i}"})
+            response.raise_for_status()
+            created.append(response.json()["id"])
+        rows += [
+            await run_case(client, "POST /api/user/projects", create_project, args.iterations),
+            await run_case(client, "PUT /api/user/projects/{project_id}", update_project, args.iterations),
+            await run_case(client, "DELETE /api/user/projects/{project_id}", delete_project, args.iterations),
+        ]
+
+    print_table(f"Single-item writes, {args.iterations} requests each ({args.label})", rows)
+    write_results(args.output, "write_paths", args.label, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--signups", type=int, default=20, help="signups hash a password, so fewer of them")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
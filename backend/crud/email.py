@@ -0,0 +1,79 @@
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.email import OutboxEmail
+from datetime import datetime, timedelta
+from typing import Optional, List
+import uuid
+
+def enqueue_email(db: AsyncSession, to_email: str, subject: str, html_content: str) -> OutboxEmail:
+    """Add an email to the outbox; it is sent once the caller's transaction commits."""
+    message = OutboxEmail(to_email=to_email, subject=subject, html_content=html_content)
+    db.add(message)
+    return message
+
+async def claim_due_emails(db: AsyncSession, limit: int, lease_seconds: float) -> List[OutboxEmail]:
+    """Lease up to `limit` due emails in one statement and commit the lease.
+
+    SKIP LOCKED lets several workers claim concurrently without waiting on each other.
+    """
+    due = (
+        select(OutboxEmail.id)
+        .where(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= func.now())
+        .order_by(OutboxEmail.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(due))
+        .values(
+            attempts=OutboxEmail.attempts + 1,
+            next_attempt_at=func.now() + timedelta(seconds=lease_seconds),
+        )
+        .returning(OutboxEmail)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = list(result.scalars().all())
+    await db.commit()
+    return claimed
+
+async def mark_sent(db: AsyncSession, ids: List[uuid.UUID]):
+    if ids:
+        await db.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(ids))
+            .values(status="sent", sent_at=func.now(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+async def mark_failed(db: AsyncSession, email_id: uuid.UUID, error: str, retry_at: Optional[datetime]):
+    """Schedule another attempt at `retry_at`, or dead-letter the email when it is None."""
+    values = {"last_error": error[:2000]}
+    if retry_at is None:
+        values["status"] = "dead"
+    else:
+        values["next_attempt_at"] = retry_at
+    await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id == email_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+async def get_outbox_counts(db: AsyncSession) -> dict:
+    result = await db.execute(select(OutboxEmail.status, func.count()).group_by(OutboxEmail.status))
+    counts = {"pending": 0, "sent": 0, "dead": 0}
+    counts.update({status: count for status, count in result.all()})
+    return counts
+
+async def requeue_dead_emails(db: AsyncSession) -> int:
+    """Give dead-lettered emails a fresh set of attempts (after fixing the transport)."""
+    result = await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.status == "dead")
+        .values(status="pending", attempts=0, next_attempt_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
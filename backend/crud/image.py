@@ -0,0 +1,87 @@
+from sqlalchemy import select, update, delete, case, func, values, column, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.image import StoredImage
+from services.images import hash_from_url
+from datetime import datetime
+from typing import Optional, List, Iterable, Set, Dict
+
+ADJUST_CHUNK = 5000  # rows per statement: two bind parameters each, far below asyncpg's 32767
+
+async def swap_image_reference(db: AsyncSession, old_url: Optional[str], new_url: Optional[str]):
+    """Move one reference from old_url's image to new_url's; the caller commits.
+
+    URLs that are not content-addressed (external links, legacy files) carry no
+    reference count and are ignored.
+    """
+    old_hash, new_hash = hash_from_url(old_url), hash_from_url(new_url)
+    if old_hash == new_hash:
+        return
+    if new_hash:
+        stmt = insert(StoredImage).values(hash=new_hash, refcount=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StoredImage.hash],
+            set_={"refcount": StoredImage.refcount + 1, "unreferenced_since": None},
+        )
+        await db.execute(stmt)
+    if old_hash:
+        await db.execute(
+            update(StoredImage)
+            .where(StoredImage.hash == old_hash)
+            .values(
+                refcount=StoredImage.refcount - 1,
+                unreferenced_since=case((StoredImage.refcount <= 1, func.now()), else_=None),
+            )
+        )
+
+async def adjust_image_references(db: AsyncSession, deltas: Dict[str, int]):
+    """Bulk form of `swap_image_reference`: add deltas[hash] references to each image; the caller commits.
+
+    As there, gains create or revive the row and losses only touch rows that
+    exist.  Rows are written in hash order so concurrent callers lock them in
+    the same order.
+    """
+    gains = sorted((image_hash, delta) for image_hash, delta in deltas.items() if delta > 0)
+    losses = sorted((image_hash, -delta) for image_hash, delta in deltas.items() if delta < 0)
+    for start in range(0, len(gains), ADJUST_CHUNK):
+        stmt = insert(StoredImage).values([
+            {"hash": image_hash, "refcount": delta} for image_hash, delta in gains[start:start + ADJUST_CHUNK]
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StoredImage.hash],
+            set_={"refcount": StoredImage.refcount + stmt.excluded.refcount, "unreferenced_since": None},
+        )
+        await db.execute(stmt)
+    for start in range(0, len(losses), ADJUST_CHUNK):
+        rows = values(column("hash", StoredImage.hash.type), column("count", Integer), name="v").data(
+            losses[start:start + ADJUST_CHUNK]
+        )
+        await db.execute(
+            update(StoredImage)
+            .where(StoredImage.hash == rows.c.hash)
+            .values(
+                refcount=StoredImage.refcount - rows.c.count,
+                unreferenced_since=case((StoredImage.refcount <= rows.c.count, func.now()), else_=None),
+            )
+        )
+
+async def claim_unreferenced(db: AsyncSession, older_than: datetime, limit: int) -> List[str]:
+    """Lock up to `limit` collectable hashes; other workers' sweeps skip them."""
+    result = await db.execute(
+        select(StoredImage.hash)
+        .where(StoredImage.refcount <= 0, StoredImage.unreferenced_since < older_than)
+        .order_by(StoredImage.unreferenced_since)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(result.scalars().all())
+
+async def delete_images(db: AsyncSession, hashes: List[str]):
+    await db.execute(delete(StoredImage).where(StoredImage.hash.in_(hashes), StoredImage.refcount <= 0))
+
+async def get_known_hashes(db: AsyncSession, hashes: Iterable[str]) -> Set[str]:
+    hashes = list(hashes)
+    if not hashes:
+        return set()
+    result = await db.execute(select(StoredImage.hash).where(StoredImage.hash.in_(hashes)))
+    return set(result.scalars().all())
@@ -0,0 +1,38 @@
+from sqlalchemy import select, func, values, column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.portfolio_stats import PortfolioStats
+from models.user import User
+from typing import Optional, List, Tuple
+import uuid
+
+async def add_views(db: AsyncSession, deltas: List[Tuple[uuid.UUID, int]]) -> int:
+    """Add view deltas in one INSERT ... ON CONFLICT DO UPDATE; the caller commits.
+
+    Rows are sorted by user id so concurrent flushes from several workers lock
+    them in the same order and cannot deadlock.  Ids without a user (deleted,
+    or never existed) are dropped by the join.  Returns the rows written.
+    """
+    rows = values(column("user_id", PortfolioStats.user_id.type), column("views", PortfolioStats.views.type), name="v").data(
+        sorted(deltas)
+    )
+    stmt = insert(PortfolioStats).from_select(
+        ["user_id", "views"],
+        select(rows.c.user_id, rows.c.views).join(User, User.id == rows.c.user_id).order_by(rows.c.user_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PortfolioStats.user_id],
+        set_={"views": PortfolioStats.views + stmt.excluded.views, "updated_at": func.now()},
+    )
+    result = await db.execute(stmt)
+    return result.rowcount
+
+async def get_portfolio_views(db: AsyncSession, user_id: uuid.UUID) -> Optional[int]:
+    """Flushed view total of the portfolio; None if there is no such user."""
+    result = await db.execute(
+        select(func.coalesce(PortfolioStats.views, 0))
+        .select_from(User)
+        .outerjoin(PortfolioStats, PortfolioStats.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    return result.scalar()
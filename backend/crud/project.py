@@ -1,36 +1,152 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_, insert, update, delete, values, column
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.project import Project
-from schemas.project import ProjectCreateUpdate
+from schemas.project import ProjectCreateUpdate, ProjectBulkOperation
+from services.invalidation import user_changed
+from services.pagination import encode_cursor, decode_cursor
+from typing import Optional, List, Dict
+from datetime import datetime, timedelta, timezone
 import uuid
 
-def create_project(db: Session, project: ProjectCreateUpdate, owner_id: uuid.UUID):
+async def create_project(db: AsyncSession, project: ProjectCreateUpdate, owner_id: uuid.UUID):
     db_project = Project(**project.model_dump(), owner_id=owner_id)
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    # Profile and portfolio responses embed the owner's projects.
+    user_changed(owner_id)
     return db_project
 
-def get_project_by_id(db: Session, project_id: uuid.UUID):
-    return db.query(Project).filter(Project.id == project_id).first()
+async def get_project_by_id(db: AsyncSession, project_id: uuid.UUID):
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    return result.scalars().first()
 
-def get_user_projects(db: Session, owner_id: uuid.UUID):
-    return db.query(Project).filter(Project.owner_id == owner_id).all()
+async def get_user_projects(db: AsyncSession, owner_id: uuid.UUID, limit: int, cursor: Optional[str] = None):
+    """Return one page of the owner's projects and the cursor of the next page (or None).
 
-def update_project(db: Session, project_id: uuid.UUID, project_update: ProjectCreateUpdate, owner_id: uuid.UUID):
-    db_project = db.query(Project).filter(Project.id == project_id, Project.owner_id == owner_id).first()
+    Keyset pagination on (created_at, id) served by ix_projects_owner_id_created_at_id,
+    so every page costs the same regardless of how deep the client has scrolled.
+    """
+    stmt = (
+        select(Project)
+        .where(Project.owner_id == owner_id)
+        .order_by(Project.created_at, Project.id)
+        .limit(limit + 1)
+    )
+    after = decode_cursor(cursor)
+    if after is not None:
+        stmt = stmt.where(tuple_(Project.created_at, Project.id) > tuple_(*after))
+    result = await db.execute(stmt)
+    projects = result.scalars().all()
+    next_cursor = None
+    if len(projects) > limit:
+        projects = projects[:limit]
+        next_cursor = encode_cursor(projects[-1].created_at, projects[-1].id)
+    return projects, next_cursor
+
+async def update_project(db: AsyncSession, project_id: uuid.UUID, project_update: ProjectCreateUpdate, owner_id: uuid.UUID):
+    # One UPDATE ... RETURNING; ownership is part of the WHERE clause.
+    update_data = project_update.model_dump(exclude_unset=True)
+    if not update_data:
+        result = await db.execute(select(Project).where(Project.id == project_id, Project.owner_id == owner_id))
+        return result.scalars().first()
+    result = await db.execute(
+        update(Project)
+        .where(Project.id == project_id, Project.owner_id == owner_id)
+        .values(**update_data)
+        .returning(Project)
+        .execution_options(populate_existing=True)
+    )
+    db_project = result.scalars().first()
+    await db.commit()
     if db_project:
-        update_data = project_update.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_project, key, value)
-        db.add(db_project)
-        db.commit()
-        db.refresh(db_project)
+        user_changed(owner_id)
     return db_project
 
-def delete_project(db: Session, project_id: uuid.UUID, owner_id: uuid.UUID):
-    db_project = db.query(Project).filter(Project.id == project_id, Project.owner_id == owner_id).first()
-    if db_project:
-        db.delete(db_project)
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+async def delete_project(db: AsyncSession, project_id: uuid.UUID, owner_id: uuid.UUID):
+    result = await db.execute(
+        delete(Project)
+        .where(Project.id == project_id, Project.owner_id == owner_id)
+        .returning(Project.id)
+    )
+    deleted = result.scalar() is not None
+    await db.commit()
+    if deleted:
+        user_changed(owner_id)
+    return deleted
+
+async def bulk_apply_projects(db: AsyncSession, owner_id: uuid.UUID, operations: List[ProjectBulkOperation]) -> List[Dict]:
+    """Apply a mixed list of create/update/delete operations in one transaction.
+
+    One DELETE ... RETURNING for all deletes, one UPDATE ... FROM (VALUES ...)
+    RETURNING per distinct set of updated fields, one multi-row INSERT ... RETURNING
+    for all creates.  Ownership is part of every WHERE clause, so ids that do not
+    exist or belong to someone else come back as "not_found" and change nothing.
+    Each id may appear in at most one update/delete (checked by the router).
+    Returns {"index", "op", "status", "id", "project"} per operation, in request order.
+    """
+    results: List[Dict] = [None] * len(operations)
+
+    deletes = {op.id: i for i, op in enumerate(operations) if op.op == "delete"}
+    if deletes:
+        result = await db.execute(
+            delete(Project)
+            .where(Project.owner_id == owner_id, Project.id.in_(list(deletes)))
+            .returning(Project.id)
+        )
+        deleted = set(result.scalars().all())
+        for project_id, i in deletes.items():
+            results[i] = {"index": i, "op": "delete", "id": project_id,
+                          "status": "deleted" if project_id in deleted else "not_found"}
+
+    # Rows can only share an UPDATE if they set the same columns (updates are partial).
+    update_groups: Dict[tuple, Dict[uuid.UUID, int]] = {}
+    for i, op in enumerate(operations):
+        if op.op == "update":
+            fields = tuple(sorted(op.project.model_dump(exclude_unset=True)))
+            update_groups.setdefault(fields, {})[op.id] = i
+    for fields, indexes in update_groups.items():
+        if fields:
+            rows = values(
+                column("id", Project.id.type), *(column(name, Project.__table__.c[name].type) for name in fields),
+                name="v",
+            ).data([
+                (project_id, *(getattr(operations[i].project, name) for name in fields))
+                for project_id, i in indexes.items()
+            ])
+            result = await db.execute(
+                update(Project)
+                .where(Project.id == rows.c.id, Project.owner_id == owner_id)
+                .values({name: rows.c[name] for name in fields})
+                .returning(Project)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            # Nothing to set: still report which ids exist for this owner.
+            result = await db.execute(
+                select(Project).where(Project.owner_id == owner_id, Project.id.in_(list(indexes)))
+            )
+        updated = {project.id: project for project in result.scalars().all()}
+        for project_id, i in indexes.items():
+            project = updated.get(project_id)
+            results[i] = {"index": i, "op": "update", "id": project_id,
+                          "status": "updated" if project else "not_found", "project": project}
+
+    creates = [i for i, op in enumerate(operations) if op.op == "create"]
+    if creates:
+        # Spread created_at by a microsecond so pagination keeps the request order.
+        base = datetime.now(timezone.utc)
+        result = await db.execute(
+            insert(Project).returning(Project, sort_by_parameter_order=True),
+            [
+                {**operations[i].project.model_dump(), "id": uuid.uuid4(), "owner_id": owner_id,
+                 "created_at": base + timedelta(microseconds=n)}
+                for n, i in enumerate(creates)
+            ],
+        )
+        for i, project in zip(creates, result.scalars().all()):
+            results[i] = {"index": i, "op": "create", "id": project.id, "status": "created", "project": project}
+
+    await db.commit()
+    if any(item["status"] != "not_found" for item in results):
+        user_changed(owner_id)
+    return results
@@ -0,0 +1,76 @@
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.refresh_token import RefreshTokenFamily
+from datetime import datetime
+from typing import Optional, List, Tuple
+import uuid
+
+async def create_family(db: AsyncSession, user_id: uuid.UUID, jti: uuid.UUID, expires_at: datetime) -> uuid.UUID:
+    family = RefreshTokenFamily(id=uuid.uuid4(), user_id=user_id, current_jti=jti, expires_at=expires_at)
+    db.add(family)
+    await db.commit()
+    return family.id
+
+async def rotate_family(db: AsyncSession, family_id: uuid.UUID, jti: uuid.UUID, new_jti: uuid.UUID, expires_at: datetime) -> Optional[uuid.UUID]:
+    """Swap `jti` for `new_jti` if it is still the family's current token; returns the user id.
+
+    The compare-and-set runs in one UPDATE, so of two requests presenting the same
+    token only one can win.  None means the token was already rotated (reuse),
+    the family was revoked, or it does not exist.
+    """
+    result = await db.execute(
+        update(RefreshTokenFamily)
+        .where(
+            RefreshTokenFamily.id == family_id,
+            RefreshTokenFamily.current_jti == jti,
+            RefreshTokenFamily.revoked_at.is_(None),
+        )
+        .values(current_jti=new_jti, expires_at=expires_at)
+        .returning(RefreshTokenFamily.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    user_id = result.scalar()
+    await db.commit()
+    return user_id
+
+async def revoke_family(db: AsyncSession, family_id: uuid.UUID) -> Optional[datetime]:
+    """Revoke one family; returns its expiry, or None if it is unknown or was already revoked."""
+    result = await db.execute(
+        update(RefreshTokenFamily)
+        .where(RefreshTokenFamily.id == family_id, RefreshTokenFamily.revoked_at.is_(None))
+        .values(revoked_at=func.now())
+        .returning(RefreshTokenFamily.expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    expires_at = result.scalar()
+    await db.commit()
+    return expires_at
+
+async def revoke_user_families(db: AsyncSession, user_id: uuid.UUID) -> List[Tuple[uuid.UUID, datetime]]:
+    """Revoke every live family of the user (e.g. after a password reset); the caller commits."""
+    result = await db.execute(
+        update(RefreshTokenFamily)
+        .where(RefreshTokenFamily.user_id == user_id, RefreshTokenFamily.revoked_at.is_(None))
+        .values(revoked_at=func.now())
+        .returning(RefreshTokenFamily.id, RefreshTokenFamily.expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    return [tuple(row) for row in result.all()]
+
+async def get_revoked_families(db: AsyncSession) -> List[Tuple[uuid.UUID, datetime]]:
+    """Revoked families whose tokens have not expired yet, i.e. could still be replayed."""
+    result = await db.execute(
+        select(RefreshTokenFamily.id, RefreshTokenFamily.expires_at)
+        .where(RefreshTokenFamily.expires_at > func.now(), RefreshTokenFamily.revoked_at.is_not(None))
+    )
+    return [tuple(row) for row in result.all()]
+
+async def delete_expired_families(db: AsyncSession) -> int:
+    # Expired tokens fail JWT validation on their own; their rows are no longer needed.
+    result = await db.execute(
+        delete(RefreshTokenFamily)
+        .where(RefreshTokenFamily.expires_at <= func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,150 @@
+from sqlalchemy import select, func, or_, and_, cast, literal_column
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.user import User
+from models.project import Project
+from services.pagination import encode_score_cursor, decode_score_cursor
+from config import settings
+from typing import Optional
+import html
+import re
+
+# ts_headline wraps matches in these private-use characters; they are turned into
+# <mark> only after the snippet text has been HTML-escaped.
+_MARK_START, _MARK_STOP = "\ue000", "\ue001"
+_HEADLINE_OPTIONS = f'StartSel="{_MARK_START}", StopSel="{_MARK_STOP}", MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "'
+_SIMPLE = literal_column("'simple'::regconfig")
+_MAX_TERMS = 8
+
+
+def prefix_tsquery(q: str) -> Optional[str]:
+    """'vec clou' -> 'vec:* & clou:*' built only from word characters, so user input
+    can never produce tsquery syntax errors.  Words shorter than
+    SEARCH_MIN_TERM_LENGTH are dropped; None if nothing searchable is left."""
+    terms = [term for term in re.findall(r"\w+", q.lower()) if len(term) >= settings.SEARCH_MIN_TERM_LENGTH]
+    terms = terms[:_MAX_TERMS]
+    return " & ".join(f"{term}:*" for term in terms) or None
+
+
+def _snippet(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    return html.escape(text).replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
+
+
+def _ranked(model, q: str, tsquery: str):
+    """Score and match condition shared by both searches.
+
+    A row matches on the prefix tsquery (GIN on search_vector) or on trigram
+    similarity of its name (GIN gin_trgm_ops), which catches typos.  The score adds
+    both, so exact word hits still rank above fuzzy name matches.
+    """
+    query = func.to_tsquery(_SIMPLE, tsquery)
+    score = cast(
+        func.ts_rank_cd(model.search_vector, query) + func.coalesce(func.similarity(model.name, q), 0),
+        DOUBLE_PRECISION,
+    ).label("score")
+    match = or_(model.search_vector.op("@@")(query), model.name.op("%")(q))
+    return query, score, match
+
+
+def _candidates(model, match):
+    """At most SEARCH_CANDIDATE_LIMIT matching ids, unordered.
+
+    Without it a broad query ranks its whole match set (ts_rank_cd and
+    similarity on every row) for each page; the LIMIT lets the scan of the GIN
+    matches stop early, and only these rows are scored.
+    """
+    return select(model.id).where(match).limit(settings.SEARCH_CANDIDATE_LIMIT).subquery()
+
+
+def _after(score, model, cursor: Optional[str]):
+    after = decode_score_cursor(cursor)
+    if after is None:
+        return None
+    # (score DESC, id ASC) keyset
+    return or_(score < after[0], and_(score == after[0], model.id > after[1]))
+
+
+async def search_users(db: AsyncSession, q: str, limit: int, cursor: Optional[str] = None):
+    """One page of users ranked by name (A), job_title (B) and bio (C), plus the next cursor."""
+    tsquery = prefix_tsquery(q)
+    if tsquery is None:
+        return [], None
+    query, score, match = _ranked(User, q, tsquery)
+
+    # Rank and page on the indexed columns first; ts_headline only runs on the page.
+    candidates = _candidates(User, match)
+    page = select(User.id, score).join(candidates, candidates.c.id == User.id)
+    after = _after(score, User, cursor)
+    if after is not None:
+        page = page.where(after)
+    page = page.order_by(score.desc(), User.id).limit(limit + 1).subquery()
+
+    stmt = (
+        select(
+            User.id, User.name, User.job_title, User.profile_image_url, page.c.score,
+            func.ts_headline(_SIMPLE, func.coalesce(User.bio, ""), query, _HEADLINE_OPTIONS).label("snippet"),
+        )
+        .join(page, page.c.id == User.id)
+        .order_by(page.c.score.desc(), User.id)
+    )
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_score_cursor(rows[-1].score, rows[-1].id)
+    hits = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "job_title": row.job_title,
+            "profile_image_url": row.profile_image_url,
+            "score": row.score,
+            "snippet": _snippet(row.snippet),
+        }
+        for row in rows
+    ]
+    return hits, next_cursor
+
+
+async def search_projects(db: AsyncSession, q: str, limit: int, cursor: Optional[str] = None):
+    """One page of projects ranked by name (A) and description (B), plus the next cursor."""
+    tsquery = prefix_tsquery(q)
+    if tsquery is None:
+        return [], None
+    query, score, match = _ranked(Project, q, tsquery)
+
+    candidates = _candidates(Project, match)
+    page = select(Project.id, score).join(candidates, candidates.c.id == Project.id)
+    after = _after(score, Project, cursor)
+    if after is not None:
+        page = page.where(after)
+    page = page.order_by(score.desc(), Project.id).limit(limit + 1).subquery()
+
+    stmt = (
+        select(
+            Project.id, Project.owner_id, Project.name, Project.demo_url, Project.repository_url, page.c.score,
+            func.ts_headline(_SIMPLE, func.coalesce(Project.description, ""), query, _HEADLINE_OPTIONS).label("snippet"),
+        )
+        .join(page, page.c.id == Project.id)
+        .order_by(page.c.score.desc(), Project.id)
+    )
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_score_cursor(rows[-1].score, rows[-1].id)
+    hits = [
+        {
+            "id": row.id,
+            "owner_id": row.owner_id,
+            "name": row.name,
+            "demo_url": row.demo_url,
+            "repository_url": row.repository_url,
+            "score": row.score,
+            "snippet": _snippet(row.snippet),
+        }
+        for row in rows
+    ]
+    return hits, next_cursor
@@ -0,0 +1,255 @@
+"""Bulk export and import of whole portfolios as NDJSON (routers/admin.py).
+
+Export: one JSON line per user with all of its projects, read through a
+server-side cursor (``yield_per``) over users LEFT JOIN projects in
+(users.id, created_at, id) order, so memory stays flat however large the
+tables are and the response is written as rows arrive.
+
+Import: the stream is parsed line by line into batches of about
+``TRANSFER_IMPORT_BATCH`` rows; each batch is COPYed into temp tables and
+upserted in one transaction, users on lower(email) and projects on id.  Every
+batch commits on its own, and re-running the same file is harmless, so a
+failed import can simply be fixed and sent again (a record whose id belongs to
+another email stops the import at its line, like a malformed one).  A changed
+``profile_image_url`` moves its image reference (crud.image) in the same
+transaction, so image_gc never collects an image an imported user points at.
+"""
+import json
+import uuid
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Set, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.user import User
+from models.project import Project
+from schemas.transfer import PortfolioRecord
+from crud import image as crud_image
+from services.images import hash_from_url
+from services.invalidation import user_changed
+
+USER_FIELDS = ("id", "email", "hashed_password", "name", "job_title", "bio", "profile_image_url", "email_verified")
+PROJECT_FIELDS = ("id", "name", "demo_url", "repository_url", "description", "created_at")
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _export_statement():
+    return (
+        select(
+            *(getattr(User, field) for field in USER_FIELDS),
+            *(getattr(Project, field).label(f"project_{field}") for field in PROJECT_FIELDS),
+        )
+        .outerjoin(Project, Project.owner_id == User.id)
+        # Matches users_pkey + ix_projects_owner_id_created_at_id: a merge join, no sort
+        .order_by(User.id, Project.created_at, Project.id)
+        .execution_options(yield_per=settings.TRANSFER_EXPORT_FETCH)
+    )
+
+
+def _json_default(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value.isoformat()  # datetime
+
+
+def _line(record: dict) -> bytes:
+    return json.dumps(record, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+async def export_portfolios(db: AsyncSession) -> AsyncIterator[bytes]:
+    """Yield the NDJSON export in chunks of about 64 KB."""
+    result = await db.stream(_export_statement())
+    buffer: List[bytes] = []
+    size = 0
+    current = None
+    async for row in result:
+        if current is None or row.id != current["id"]:
+            if current is not None:
+                line = _line(current)
+                buffer.append(line)
+                size += len(line)
+                if size >= EXPORT_CHUNK_BYTES:
+                    yield b"".join(buffer)
+                    buffer, size = [], 0
+            current = {field: getattr(row, field) for field in USER_FIELDS}
+            current["projects"] = []
+        if row.project_id is not None:
+            current["projects"].append({field: getattr(row, f"project_{field}") for field in PROJECT_FIELDS})
+    if current is not None:
+        buffer.append(_line(current))
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+    if pending.strip():
+        yield number + 1, pending
+
+
+_CREATE_TEMP_TABLES = (
+    """CREATE TEMP TABLE import_users (
+        id uuid, email text, hashed_password text, name text, job_title text,
+        bio text, profile_image_url text, email_verified boolean, ordinal integer
+    ) ON COMMIT DROP""",
+    """CREATE TEMP TABLE import_projects (
+        id uuid, owner_email text, name text, demo_url text, repository_url text,
+        description text, created_at timestamptz, ordinal integer
+    ) ON COMMIT DROP""",
+)
+
+# Users are matched on lower(email) and keep their id, so a record whose id
+# already belongs to another email (in the table or earlier in the batch) would
+# violate users_pkey: report the first such record instead.
+_ID_CONFLICT = text("""
+    SELECT i.ordinal, i.id FROM import_users i
+    WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = i.id AND lower(u.email) <> lower(i.email))
+       OR EXISTS (SELECT 1 FROM import_users o
+                  WHERE o.id = i.id AND lower(o.email) <> lower(i.email) AND o.ordinal < i.ordinal)
+    ORDER BY i.ordinal
+    LIMIT 1
+""")
+
+# Image URLs of the users this batch overwrites, locked until commit: the upsert's
+# RETURNING only sees the new values.
+_PREVIOUS_IMAGES = text("""
+    SELECT u.id, u.profile_image_url FROM users u
+    WHERE lower(u.email) IN (SELECT lower(email) FROM import_users)
+    ORDER BY u.id
+    FOR UPDATE
+""")
+
+# DISTINCT ON: ON CONFLICT DO UPDATE may not touch one row twice, so a repeated
+# email or project id within a batch keeps only its first occurrence (ordinal is
+# the position in the batch; without it DISTINCT ON would keep an arbitrary one).
+_UPSERT_USERS = text("""
+    INSERT INTO users (id, email, hashed_password, name, job_title, bio, profile_image_url, email_verified)
+    SELECT DISTINCT ON (lower(email)) id, email, hashed_password, name, job_title, bio, profile_image_url, email_verified
+    FROM import_users ORDER BY lower(email), ordinal
+    ON CONFLICT ((lower(email))) DO UPDATE SET
+        email = EXCLUDED.email,
+        hashed_password = EXCLUDED.hashed_password,
+        name = EXCLUDED.name,
+        job_title = EXCLUDED.job_title,
+        bio = EXCLUDED.bio,
+        profile_image_url = EXCLUDED.profile_image_url,
+        email_verified = EXCLUDED.email_verified
+    RETURNING id, profile_image_url
+""")
+
+# Owners that lose a project to another user in this batch also need their caches dropped.
+_PREVIOUS_OWNERS = text("""
+    SELECT DISTINCT p.owner_id FROM projects p JOIN import_projects i ON i.id = p.id
+""")
+
+_UPSERT_PROJECTS = text("""
+    INSERT INTO projects (id, owner_id, name, demo_url, repository_url, description, created_at)
+    SELECT DISTINCT ON (i.id) i.id, u.id, i.name, i.demo_url, i.repository_url, i.description, coalesce(i.created_at, now())
+    FROM import_projects i JOIN users u ON lower(u.email) = lower(i.owner_email)
+    ORDER BY i.id, i.ordinal
+    ON CONFLICT (id) DO UPDATE SET
+        owner_id = EXCLUDED.owner_id,
+        name = EXCLUDED.name,
+        demo_url = EXCLUDED.demo_url,
+        repository_url = EXCLUDED.repository_url,
+        description = EXCLUDED.description,
+        created_at = EXCLUDED.created_at
+""")
+
+
+async def _load_batch(db: AsyncSession, users: List[tuple], projects: List[tuple], line_numbers: List[int]) -> Tuple[int, int]:
+    """Upsert one batch in one transaction; `line_numbers[ordinal]` is each user's line, for errors."""
+    try:
+        return await _upsert_batch(db, users, projects, line_numbers)
+    except IntegrityError as e:
+        # Anything _ID_CONFLICT cannot see (e.g. a concurrent writer): the batch is not imported.
+        await db.rollback()
+        raise ValueError(f"lines {line_numbers[0]}-{line_numbers[-1]}: {e.orig}") from None
+
+
+async def _upsert_batch(db: AsyncSession, users: List[tuple], projects: List[tuple], line_numbers: List[int]) -> Tuple[int, int]:
+    conn = await db.connection()
+    for statement in _CREATE_TEMP_TABLES:
+        await conn.execute(text(statement))
+    raw = (await conn.get_raw_connection()).driver_connection
+    await raw.copy_records_to_table("import_users", records=users, columns=[*USER_FIELDS, "ordinal"])
+    if projects:
+        await raw.copy_records_to_table(
+            "import_projects", records=projects,
+            columns=["id", "owner_email", "name", "demo_url", "repository_url", "description", "created_at", "ordinal"],
+        )
+
+    conflict = (await conn.execute(_ID_CONFLICT)).first()
+    if conflict is not None:
+        await db.rollback()
+        raise ValueError(f"line {line_numbers[conflict.ordinal]}: id {conflict.id} already belongs to another email")
+
+    previous = dict((await conn.execute(_PREVIOUS_IMAGES)).all())
+    image_deltas: Counter = Counter()
+    affected: Set[uuid.UUID] = set()
+    for user_id, image_url in (await conn.execute(_UPSERT_USERS)).all():
+        affected.add(user_id)
+        old_hash, new_hash = hash_from_url(previous.get(user_id)), hash_from_url(image_url)
+        if old_hash != new_hash:
+            if new_hash:
+                image_deltas[new_hash] += 1
+            if old_hash:
+                image_deltas[old_hash] -= 1
+    await crud_image.adjust_image_references(db, image_deltas)
+    project_count = 0
+    if projects:
+        affected.update((await conn.execute(_PREVIOUS_OWNERS)).scalars().all())
+        project_count = (await conn.execute(_UPSERT_PROJECTS)).rowcount
+    await db.commit()
+    for user_id in affected:
+        user_changed(user_id)
+    return len(users), project_count
+
+
+async def import_portfolios(db: AsyncSession, chunks: AsyncIterator[bytes]) -> Dict[str, int]:
+    """Upsert every NDJSON record of `chunks`; raises ValueError naming the first bad line.
+
+    A bad line is one that does not parse, or whose id belongs to another
+    email.  Batches before it are already committed.
+    """
+    totals = {"users": 0, "projects": 0, "batches": 0}
+    users: List[tuple] = []
+    projects: List[tuple] = []
+    line_numbers: List[int] = []
+
+    async def flush():
+        user_count, project_count = await _load_batch(db, users, projects, line_numbers)
+        totals["users"] += user_count
+        totals["projects"] += project_count
+        totals["batches"] += 1
+        users.clear()
+        projects.clear()
+        line_numbers.clear()
+
+    async for number, line in _lines(chunks):
+        try:
+            record = PortfolioRecord.model_validate_json(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+        users.append((*(getattr(record, field) for field in USER_FIELDS), len(users)))
+        line_numbers.append(number)
+        projects.extend(
+            (p.id, record.email, p.name, p.demo_url, p.repository_url, p.description, p.created_at, len(projects) + i)
+            for i, p in enumerate(record.projects)
+        )
+        if len(users) + len(projects) >= settings.TRANSFER_IMPORT_BATCH:
+            await flush()
+    if users:
+        await flush()
+    return totals
@@ -1,48 +1,137 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from models.user import User
+from crud import project as crud_project
+from crud import image as crud_image
 from schemas.auth import UserCreate
 from schemas.user import UserProfileUpdate
+from services.invalidation import user_changed
 import uuid
 from typing import Optional # <-- THÊM DÒNG NÀY VÀO ĐÂY
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
-
-def get_user_by_id(db: Session, user_id: uuid.UUID):
-    return db.query(User).filter(User.id == user_id).first()
-
-def create_user(db: Session, user: UserCreate, hashed_password: str):
-    db_user = User(
-        email=user.email,
-        hashed_password=hashed_password,
-        name=None,
-        job_title=None,
-        bio=None,
-        profile_image_url=None,
-        email_verified=False,
+async def get_user_by_email(db: AsyncSession, email: str):
+    # Case-insensitive; matches the expression of ix_users_email_lower
+    result = await db.execute(select(User).where(func.lower(User.email) == email.lower()))
+    return result.scalars().first()
+
+async def get_user_by_id(db: AsyncSession, user_id: uuid.UUID, with_projects: bool = False):
+    # Pass with_projects=True when every project is needed (responses embed only
+    # a page: get_user_with_project_page); they then arrive in one planned
+    # SELECT ... WHERE owner_id IN (...).
+    # User.projects is lazy="raise", so forgetting it fails loudly instead of
+    # issuing a hidden query during serialization.
+    stmt = select(User).where(User.id == user_id)
+    if with_projects:
+        stmt = stmt.options(selectinload(User.projects))
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_user_with_project_page(db: AsyncSession, user_id: uuid.UUID, project_limit: int):
+    """Load a user with only the first page of projects; returns (user, next_cursor)."""
+    db_user = await get_user_by_id(db, user_id)
+    if db_user is None:
+        return None, None
+    projects, next_cursor = await crud_project.get_user_projects(db, user_id, project_limit)
+    # Populate the relationship as if it had been loaded, without marking it dirty.
+    set_committed_value(db_user, "projects", projects)
+    return db_user, next_cursor
+
+async def create_user(db: AsyncSession, user: UserCreate, hashed_password: str) -> Optional[User]:
+    """Insert the user in one statement; None if the email is already registered (in any case).
+
+    ON CONFLICT on ix_users_email_lower replaces a separate existence check, so
+    two concurrent signups for one address cannot both pass it.
+    """
+    result = await db.execute(
+        insert(User)
+        .values(email=user.email, hashed_password=hashed_password, email_verified=False)
+        .on_conflict_do_nothing(index_elements=[func.lower(User.email)])
+        .returning(User)
+    )
+    db_user = result.scalars().first()
+    await db.commit()
+    if db_user is not None:
+        set_committed_value(db_user, "projects", [])
+    return db_user
+
+async def _update_user(db: AsyncSession, user_id: uuid.UUID, values: dict) -> Optional[User]:
+    """One UPDATE ... RETURNING for the user row; the caller commits.
+
+    When profile_image_url changes, the previous URL is read in the same
+    statement (a locked self-join, since RETURNING only sees new values) so the
+    image reference counts can be moved without loading the user first.
+    """
+    if "profile_image_url" not in values:
+        result = await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(**values)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    previous = (
+        select(User.id, User.profile_image_url)
+        .where(User.id == user_id)
+        .with_for_update()
+        .subquery("previous")
+    )
+    result = await db.execute(
+        update(User)
+        .where(User.id == previous.c.id)
+        .values(**values)
+        .returning(User, previous.c.profile_image_url)
+        .execution_options(populate_existing=True, synchronize_session=False)
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    row = result.first()
+    if row is None:
+        return None
+    db_user, previous_url = row
+    await crud_image.swap_image_reference(db, previous_url, values["profile_image_url"])
     return db_user
 
-def update_user_profile(db: Session, user_id: uuid.UUID, profile_update: UserProfileUpdate):
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def update_user_profile(db: AsyncSession, user_id: uuid.UUID, profile_update: UserProfileUpdate, project_limit: int):
+    """Apply the update; returns (user, next_cursor) with the first page of projects, like get_user_with_project_page."""
+    update_data = profile_update.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_user_with_project_page(db, user_id, project_limit)
+    db_user = await _update_user(db, user_id, update_data)
+    next_cursor = None
+    if db_user:
+        projects, next_cursor = await crud_project.get_user_projects(db, user_id, project_limit)
+        set_committed_value(db_user, "projects", projects)
+    await db.commit()
+    if db_user:
+        user_changed(user_id)
+    return db_user, next_cursor
+
+async def update_user_profile_image(db: AsyncSession, user_id: uuid.UUID, image_url: Optional[str]):
+    db_user = await _update_user(db, user_id, {"profile_image_url": image_url})
+    await db.commit()
     if db_user:
-        update_data = profile_update.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_user, key, value)
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        user_changed(user_id)
     return db_user
 
-# THAY ĐỔI DÒNG NÀY:
-def update_user_profile_image(db: Session, user_id: uuid.UUID, image_url: Optional[str]): # <-- SỬA TẠI ĐÂY
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def update_user_password(db: AsyncSession, user_id: uuid.UUID, hashed_password: str):
+    db_user = await _update_user(db, user_id, {"hashed_password": hashed_password})
+    await db.commit()
     if db_user:
-        db_user.profile_image_url = image_url
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-    return db_user
\ No newline at end of file
+        user_changed(user_id)
+    return db_user
+
+async def replace_password_hash(db: AsyncSession, user_id: uuid.UUID, old_hash: str, new_hash: str) -> bool:
+    """Store a rehash of the same password, unless the password was changed in the meantime."""
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, User.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if result.rowcount:
+        user_changed(user_id)
+    return bool(result.rowcount)
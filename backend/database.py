@@ -1,23 +1,58 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from config import settings
 
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Create the SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def _async_database_url(url: str) -> str:
+    # DATABASE_URL is shared with Alembic (psycopg2), so switch only the driver here.
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    return url
 
-# Create a SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+SQLALCHEMY_DATABASE_URL = _async_database_url(settings.DATABASE_URL)
+
+# Create the async SQLAlchemy engine (asyncpg)
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
+
+# Read replicas (empty unless DATABASE_REPLICA_URLS is set); services/replicas.py
+# decides per request whether a read may use one of them.
+replica_engines = [
+    create_async_engine(
+        _async_database_url(url),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+    )
+    for url in settings.DATABASE_REPLICA_URLS
+]
+
+# Create a SessionLocal class.
+# expire_on_commit=False keeps loaded attributes usable after commit, because an
+# AsyncSession cannot lazily reload them while the response is being serialized.
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+ReplicaSessionLocals = [
+    async_sessionmaker(bind=replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    for replica in replica_engines
+]
 
 # Base class for declarative models
 Base = declarative_base()
 
 # Dependency to get a database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
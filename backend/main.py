@@ -1,16 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from database import Base, engine
-from routers import auth, user
-from fastapi.responses import JSONResponse
+from database import Base, engine, replica_engines, get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from routers import auth, user, search, admin
+from crud import email as crud_email
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 # Import models to ensure they are loaded and registered with Base.metadata
 from models import user as models_user
 from models import project as models_project
+from models import image as models_image
+from models import email as models_email
+from models import refresh_token as models_refresh_token
+from models import portfolio_stats as models_portfolio_stats
+from services.hashing import hash_pool, configure_hashing
+from services.rate_limit import auth_rate_limiter
+from services import refresh_tokens
+from services.snapshots import snapshot_writer
+from services.view_counter import view_counter
+from services import images, image_gc, email_dispatcher
+from services.principal_cache import principal_cache
+from services.portfolio_cache import portfolio_cache
+from services import query_stats, metrics, profiler
+from services.replicas import replica_router, PrimaryPinMiddleware
+from services.warmup import readiness
+from config import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Picks the password work factor for this machine before the first login.
+    configure_hashing()
+    background = []
+    # Uvicorn starts accepting right after this; /api/ready stays 503 until the warm-up is done.
+    if settings.WARMUP_ENABLED:
+        background.append(asyncio.create_task(readiness.warm_up(app)))
+        if replica_engines:
+            background.append(asyncio.create_task(readiness.warm_replicas()))
+    else:
+        readiness.mark_ready()
+    if settings.IMAGE_GC_ENABLED:
+        background.append(asyncio.create_task(image_gc.run_gc_loop()))
+    if settings.EMAIL_OUTBOX_ENABLED:
+        background.append(asyncio.create_task(email_dispatcher.run_dispatcher()))
+    if replica_router.enabled:
+        background.append(asyncio.create_task(replica_router.run_health_loop()))
+    background.append(asyncio.create_task(refresh_tokens.load_revoked_families()))
+    if snapshot_writer.enabled:
+        background.append(asyncio.create_task(snapshot_writer.run()))
+    if settings.VIEW_COUNTER_ENABLED:
+        background.append(asyncio.create_task(view_counter.run()))
+    yield
+    for task in background:
+        task.cancel()
+    # Let the dispatcher close its HTTP client before the engine goes away.
+    await asyncio.gather(*background, return_exceptions=True)
+    # Views counted since the last interval are written before the pool closes.
+    await view_counter.shutdown()
+    hash_pool.shutdown()
+    images.shutdown_pool()
+    await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+
 
 app = FastAPI(
     title="User Portfolio Management API",
-    description="API for managing user profiles and portfolios."
+    description="API for managing user profiles and portfolios.",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -19,20 +79,40 @@ origins = [
     # Add your deployed frontend URL here
 ]
 
+query_stats.install(engine)
+for replica in replica_engines:
+    query_stats.install(replica)
+# Added first so it runs inside QueryStatsMiddleware and can read the request's SQL stats.
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(query_stats.QueryStatsMiddleware, expose_header=settings.QUERY_COUNT_HEADER)
+if replica_router.enabled:
+    app.add_middleware(PrimaryPinMiddleware, pin_seconds=settings.REPLICA_PIN_SECONDS)
+# Wraps the middlewares above so a capture covers them too; not installed at all when disabled.
+if settings.PROFILER_ENABLED:
+    app.add_middleware(
+        profiler.ProfilerMiddleware,
+        sample_rate=settings.PROFILER_SAMPLE_RATE, paths=settings.PROFILER_PATHS, token=settings.ADMIN_API_TOKEN,
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Query-Count"],
 )
 
 # Mount a static directory to serve uploaded files
-# Images will be accessible via /static/your-image-name.jpg
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Images will be accessible via /static/<sha256>_<size>.<ext> (immutable)
+os.makedirs(settings.STATIC_DIR, exist_ok=True)
+app.mount("/static", images.HashedStaticFiles(directory=settings.STATIC_DIR), name="static")
 
 app.include_router(auth.router)
 app.include_router(user.router)
+app.include_router(search.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def read_root():
@@ -41,4 +121,65 @@ async def read_root():
 
 @app.get("/api/health")
 async def health_check():
-    return JSONResponse(content={"status": "ok"})
\ No newline at end of file
+    return JSONResponse(content={"status": "ok"})
+
+
+@app.get("/api/live")
+async def liveness():
+    # The event loop answers: nothing else is checked, so a busy database never gets the worker restarted.
+    return JSONResponse(content={"status": "alive"})
+
+
+@app.get("/api/ready")
+async def readiness_check():
+    # 503 until the warm-up has filled the pool and started the hash workers, and whenever the pool cannot reach the database.
+    ready = await readiness.check()
+    return JSONResponse(
+        content={"status": "ready" if ready else "not_ready", **readiness.stats()},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(engine), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/api/internal/portfolio-views/{user_id}", status_code=204, include_in_schema=False)
+async def count_mirrored_portfolio_view(user_id: uuid.UUID):
+    # nginx mirrors every GET /api/user/portfolio/{id} here, including the ones it
+    # serves from a snapshot file; nginx itself does not proxy /api/internal.
+    if settings.VIEW_COUNTER_ENABLED:
+        view_counter.hit(user_id)
+    return Response(status_code=204)
+
+
+# /api/health/* are for operators and monitoring only: nginx does not proxy them (nginx/nginx.conf).
+@app.get("/api/health/hash-pool")
+async def hash_pool_stats():
+    return JSONResponse(content=hash_pool.stats())
+
+
+@app.get("/api/health/auth-rate-limit")
+async def auth_rate_limit_stats():
+    return JSONResponse(content=auth_rate_limiter.stats())
+
+
+@app.get("/api/health/caches")
+async def cache_stats():
+    return JSONResponse(content={
+        "principal": principal_cache.stats(),
+        "portfolio": portfolio_cache.stats(),
+        "snapshots": snapshot_writer.stats(),
+        "view_counter": view_counter.stats(),
+    })
+
+
+@app.get("/api/health/replicas")
+async def replica_stats():
+    return JSONResponse(content=replica_router.stats())
+
+
+@app.get("/api/health/email-outbox")
+async def email_outbox_stats(db: AsyncSession = Depends(get_db)):
+    return JSONResponse(content=await crud_email.get_outbox_counts(db))
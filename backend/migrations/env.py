@@ -15,6 +15,10 @@ sys.path.append(os.getcwd())
 # 'Base' contains the metadata for all tables defined using it.
 from models.user import Base # Make sure this path is correct based on your project structure
 from models.project import Project # Import all other models you want to be part of the migration
+from models.image import StoredImage
+from models.email import OutboxEmail
+from models.refresh_token import RefreshTokenFamily
+from models.portfolio_stats import PortfolioStats
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
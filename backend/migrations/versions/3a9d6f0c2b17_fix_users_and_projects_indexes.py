@@ -0,0 +1,47 @@
+"""fix users and projects indexes
+
+Revision ID: 3a9d6f0c2b17
+Revises: e41a7c9b2f65
+Create Date: 2025-07-16 15:42:08.604312
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d6f0c2b17'
+down_revision: Union[str, None] = 'e41a7c9b2f65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The unique lower(email) index cannot be built over case-only duplicates; list them instead of failing inside CREATE INDEX.
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT lower(email) FROM users GROUP BY lower(email) HAVING count(*) > 1 ORDER BY 1 LIMIT 20"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            "Emails that differ only in case must be merged before this migration: " + ", ".join(duplicates)
+        )
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+    # Superseded by ix_users_email_lower: every lookup goes through lower(email).
+    op.drop_index('ix_users_email', table_name='users')
+    # Duplicates of the primary keys.
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_projects_id', table_name='projects')
+    # projects.owner_id already leads ix_projects_owner_id_created_at_id (9c3e5a1f7b42), which serves
+    # the owner filters of get_user_projects, update/delete_project and User.projects; a separate
+    # owner_id index would only add write cost.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_projects_id', 'projects', ['id'], unique=False)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,37 @@
+"""create images table for the content-addressed image store
+
+Revision ID: 5d2b8e0c4a91
+Revises: 9c3e5a1f7b42
+Create Date: 2025-07-09 16:42:08.903311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2b8e0c4a91'
+down_revision: Union[str, None] = '9c3e5a1f7b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('images',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('unreferenced_since', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.create_index('ix_images_gc_candidates', 'images', ['unreferenced_since'], unique=False, postgresql_where=sa.text('refcount <= 0'))
+    # Files already in static/ are moved into the store by `python -m scripts.rehash_static`.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_images_gc_candidates', table_name='images', postgresql_where=sa.text('refcount <= 0'))
+    op.drop_table('images')
@@ -0,0 +1,31 @@
+"""add project created_at and owner keyset index
+
+Revision ID: 9c3e5a1f7b42
+Revises: 44664d61edca
+Create Date: 2025-07-02 10:14:37.512044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5a1f7b42'
+down_revision: Union[str, None] = '44664d61edca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows get now(); ties are broken by id, so pagination stays stable.
+    op.add_column('projects', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_projects_owner_id_created_at_id', 'projects', ['owner_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_projects_owner_id_created_at_id', table_name='projects')
+    op.drop_column('projects', 'created_at')
@@ -0,0 +1,42 @@
+"""create refresh_token_families table
+
+Revision ID: c5e2a8f41d93
+Revises: 3a9d6f0c2b17
+Create Date: 2025-07-18 11:20:54.730116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a8f41d93'
+down_revision: Union[str, None] = '3a9d6f0c2b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('refresh_token_families',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('current_jti', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_refresh_token_families_user_id', 'refresh_token_families', ['user_id'], unique=False)
+    op.create_index('ix_refresh_token_families_expires_at', 'refresh_token_families', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_refresh_token_families_expires_at', table_name='refresh_token_families')
+    op.drop_index('ix_refresh_token_families_user_id', table_name='refresh_token_families')
+    op.drop_table('refresh_token_families')
@@ -0,0 +1,52 @@
+"""add full-text search vectors and trigram indexes
+
+Revision ID: e41a7c9b2f65
+Revises: b7f14c2e9d30
+Create Date: 2025-07-14 09:27:50.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a7c9b2f65'
+down_revision: Union[str, None] = 'b7f14c2e9d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USERS_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(job_title, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(bio, '')), 'C')"
+)
+PROJECTS_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Adding a STORED generated column rewrites the table once; run it in a quiet window on big tables.
+    op.add_column('users', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(USERS_VECTOR, persisted=True), nullable=True))
+    op.add_column('projects', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(PROJECTS_VECTOR, persisted=True), nullable=True))
+    op.create_index('ix_users_search_vector', 'users', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_users_name_trgm', 'users', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_projects_search_vector', 'projects', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_projects_name_trgm', 'projects', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_projects_name_trgm', table_name='projects', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.drop_index('ix_projects_search_vector', table_name='projects', postgresql_using='gin')
+    op.drop_index('ix_users_name_trgm', table_name='users', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.drop_index('ix_users_search_vector', table_name='users', postgresql_using='gin')
+    op.drop_column('projects', 'search_vector')
+    op.drop_column('users', 'search_vector')
+    # pg_trgm is left installed; other objects may depend on it.
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, Index, func, text
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from datetime import datetime, timezone
+
+from database import Base
+
+class OutboxEmail(Base):
+    """An email waiting to be (or already) delivered by services/email_dispatcher.py.
+
+    Handlers only insert rows.  The dispatcher claims due `pending` rows by moving
+    next_attempt_at one lease into the future, so a worker that dies mid-send
+    leaves the row to be retried once the lease runs out.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", server_default="pending") # pending | sent | dead
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+    last_error = Column(Text, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_due", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index, func, text
+from datetime import datetime, timezone
+
+from database import Base
+
+class StoredImage(Base):
+    """One content-addressed image in static/ (all of its variants share the hash).
+
+    refcount is the number of users whose profile_image_url points at one of the
+    variants.  Rows that reach zero get unreferenced_since and are collected,
+    files first, by the GC sweep in services/image_gc.py.
+    """
+    __tablename__ = "images"
+
+    hash = Column(String(64), primary_key=True) # sha256 hex của file gốc
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+    unreferenced_since = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_images_gc_candidates", "unreferenced_since", postgresql_where=text("refcount <= 0")),
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from database import Base
+
+class PortfolioStats(Base):
+    """View totals of a public portfolio, one row per user.
+
+    Written only by the batched flushes of services/view_counter.py, never once
+    per request, so the hot portfolio read path takes no row lock.
+    """
+    __tablename__ = "portfolio_stats"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    views = Column(BigInteger, nullable=False, server_default="0")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now()) # Lần flush gần nhất
@@ -1,20 +1,45 @@
-from sqlalchemy import Column, String, Text, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Index, Computed, func
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 import uuid
+from datetime import datetime, timezone
 
 from database import Base
 
 class Project(Base):
     __tablename__ = "projects"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     demo_url = Column(String, nullable=True)
     repository_url = Column(String, nullable=True)
     description = Column(Text, nullable=True)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False) # Khóa ngoại đến bảng users
+    # Sort key for keyset pagination: (created_at, id) is unique and stable per owner.
+    # The Python default keeps the value loaded after INSERT without a refresh.
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+    # Full-text search (crud/search.py); generated by Postgres, deferred so normal loads skip it.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    ))
 
     # Quan hệ n-1 (Many-to-One) với bảng User
     # 'back_populates' chỉ định tên thuộc tính trên mô hình User sẽ tham chiếu ngược về Project này.
-    owner = relationship("User", back_populates="projects")
\ No newline at end of file
+    owner = relationship("User", back_populates="projects")
+
+    __table_args__ = (
+        # Leading owner_id: also serves every "WHERE owner_id = ..." (User.projects, per-owner lookups)
+        Index("ix_projects_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_projects_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_projects_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
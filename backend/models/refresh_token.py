@@ -0,0 +1,32 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from datetime import datetime, timezone
+
+from database import Base
+
+class RefreshTokenFamily(Base):
+    """One login session: the chain of refresh tokens rotated from a single login.
+
+    Only the newest token of a family (`current_jti`) may be exchanged.  Presenting
+    an older one means the chain was copied, so the whole family is revoked and
+    both holders have to log in again (see services/refresh_tokens.py).
+    """
+    __tablename__ = "refresh_token_families"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4) # Claim "fam" của refresh token
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    current_jti = Column(UUID(as_uuid=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False) # exp của token mới nhất; hết hạn thì xóa được
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        Index("ix_refresh_token_families_user_id", "user_id"),
+        Index("ix_refresh_token_families_expires_at", "expires_at"),
+    )
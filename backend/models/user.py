@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Integer, String, Boolean, Text, Computed, Index, func
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 import uuid
 
 from database import Base
@@ -8,15 +8,35 @@ from database import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    email = Column(String, nullable=False) # Unique regardless of case: ix_users_email_lower
     hashed_password = Column(String, nullable=False)
     name = Column(String, nullable=True)
     job_title = Column(String, nullable=True)
     bio = Column(Text, nullable=True)
     profile_image_url = Column(String, nullable=True)
     email_verified = Column(Boolean, default=False)
+    # Full-text search (crud/search.py). Generated by Postgres; deferred so normal loads skip it.
+    # 'simple' config: portfolios mix Vietnamese and English, so no language stemming.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(job_title, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(bio, '')), 'C')",
+            persisted=True,
+        ),
+    ))
 
     # Quan hệ 1-n (One-to-Many) với bảng Project
     # 'back_populates' chỉ định tên thuộc tính trên mô hình Project sẽ tham chiếu ngược về User này.
-    projects = relationship("Project", back_populates="owner", cascade="all, delete-orphan")
\ No newline at end of file
+    # lazy="raise": callers must ask for projects explicitly (crud_user.get_user_by_id(..., with_projects=True)).
+    projects = relationship("Project", back_populates="owner", cascade="all, delete-orphan", lazy="raise")
+
+    __table_args__ = (
+        # get_user_by_email compares lower(email), so this index serves it and rejects case-only duplicates
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+        Index("ix_users_search_vector", "search_vector", postgresql_using="gin"),
+        # Trigram index: prefix and typo-tolerant matches on name (pg_trgm)
+        Index("ix_users_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse, FileResponse
+from schemas.transfer import ImportSummary
+from schemas.profiler import ProfileCaptureList
+from services.profiler import capture_store
+from services.serialization import model_response
+from config import settings
+from services.auth import require_admin
+from database import get_db, SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import transfer as crud_transfer
+from crud import email as crud_email
+from services.email import notify_dispatcher
+import asyncio
+
+# Operator endpoints: enabled only when ADMIN_API_TOKEN is set, called with the
+# X-Admin-Token header.  nginx does not proxy /api/admin; call the backend directly.
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+async def _export_stream():
+    # Dependency sessions are closed before a streaming body is sent, so the
+    # generator owns its session (and the server-side cursor inside it).
+    async with SessionLocal() as db:
+        async for chunk in crud_transfer.export_portfolios(db):
+            yield chunk
+
+@router.get("/portfolios/export", response_class=StreamingResponse)
+async def export_portfolios():
+    """
+    Every user with all of their projects, one JSON object per line (NDJSON).
+
+    The body is streamed from a server-side cursor, so it starts at once and the
+    worker's memory does not grow with the number of portfolios.  The file is
+    the input format of `POST /api/admin/portfolios/import`.
+    """
+    return StreamingResponse(
+        _export_stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="portfolios.ndjson"'},
+    )
+
+@router.post("/portfolios/import", response_model=ImportSummary)
+async def import_portfolios(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Bulk upsert an NDJSON export: users by email (case-insensitive), projects by id.
+
+    Send the file as the raw request body.  Rows are loaded with COPY in batches
+    that commit one by one; on a bad line (invalid JSON, or a user id that
+    belongs to another email) the response is 422 and the batches before it
+    stay imported; importing the same file again is safe.
+    """
+    try:
+        return await crud_transfer.import_portfolios(db, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.get("/profiles", response_model=ProfileCaptureList)
+async def list_profiles():
+    """
+    Stored request profiles, newest first (see services/profiler.py).
+
+    Enable with PROFILER_ENABLED, then send a request with
+    `X-Profile-Token: <ADMIN_API_TOKEN>` or set PROFILER_SAMPLE_RATE.
+    """
+    captures = await asyncio.to_thread(capture_store.list)
+    return model_response(ProfileCaptureList, {"enabled": settings.PROFILER_ENABLED, "captures": captures})
+
+@router.get("/profiles/{name}", response_class=FileResponse)
+async def download_profile(name: str):
+    """One capture as collapsed stacks, ready for flamegraph.pl or speedscope."""
+    path = capture_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+@router.post("/email-outbox/requeue-dead")
+async def requeue_dead_emails(db: AsyncSession = Depends(get_db)):
+    """
+    Give every dead-lettered email a fresh set of attempts.
+
+    Use after fixing what made them fail (API key, SMTP host...); counts per
+    status are at `/api/health/email-outbox`.
+    """
+    requeued = await crud_email.requeue_dead_emails(db)
+    notify_dispatcher()
+    return {"requeued": requeued}
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from schemas.auth import UserCreate, UserLogin, ForgotPasswordRequest, ResetPasswordRequest, Token
+from schemas.auth import UserCreate, UserLogin, ForgotPasswordRequest, ResetPasswordRequest, Token, RefreshTokenRequest
 from schemas.user import UserResponse
-from services.auth import get_password_hash, verify_password, create_access_token, create_refresh_token
-from services.email import send_email
+from services.auth import get_password_hash, verify_password, create_access_token, password_needs_rehash, rehash_password
+from services import refresh_tokens
+from services.email import queue_email
+from services.rate_limit import limit_auth
 from database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
 from datetime import timedelta
 from jose import JWTError, jwt
@@ -16,17 +18,19 @@ from urllib.parse import unquote
 router = APIRouter(prefix="/api/user", tags=["Auth"])
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = crud_user.get_user_by_email(db, user.email)
-    if existing_user:
+async def signup_user(user: UserCreate, http_request: Request, db: AsyncSession = Depends(get_db)):
+    # Rate limits run before any query or hash (429 + Retry-After when exceeded).
+    limit_auth("signup", http_request, user.email)
+    # No existence check first: the INSERT itself reports a taken email (ON CONFLICT).
+    hashed_password = await get_password_hash(user.password)
+    db_user = await crud_user.create_user(db, user, hashed_password)
+    if db_user is None:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
-    db_user = crud_user.create_user(db, user, hashed_password)
-
     # verification_token = create_access_token({"sub": str(db_user.id)}, timedelta(hours=24))
     # verification_link = f"{settings.FRONTEND_URL}/verify-email?token={verification_token}"
-    # email_sent = await send_email(
+    # await queue_email(
+    #     db,
     #     to_email=db_user.email,
     #     subject="Verify Your Email for User Portfolio App",
     #     html_content=f"""
@@ -37,28 +41,29 @@ async def signup_user(user: UserCreate, db: Session = Depends(get_db)):
     #     <p>If you did not sign up for this service, please ignore this email.</p>
     #     """
     # )
-    # if not email_sent:
-    #     print("Warning: Could not send verification email.") # Hoặc xử lý lỗi mạnh mẽ hơn
 
     return db_user
 
 @router.post("/login")
-async def login(payload: UserLogin, db: Session = Depends(get_db)):
-    user = crud_user.get_user_by_email(db, payload.email)
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(payload: UserLogin, http_request: Request, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    limit_auth("login", http_request, payload.email)
+    user = await crud_user.get_user_by_email(db, payload.email)
+    if not user or not await verify_password(payload.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
-    
+    # Hash made under an older scheme or cost: store a fresh one after responding,
+    # so the login itself still costs a single hash.
+    if password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(rehash_password, user.id, user.hashed_password, payload.password)
+
     access_token = create_access_token(
         data={"sub": str(user.id)},
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    refresh_token = create_refresh_token(
-        data={"sub": str(user.id)},
-        expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    )
+    # Starts a new token family; POST /refresh-token rotates within it.
+    refresh_token = await refresh_tokens.start_session(db, user.id)
 
     return {
         "access_token": access_token,
@@ -67,15 +72,17 @@ async def login(payload: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/forgot-password", status_code=status.HTTP_200_OK)
-async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
-    user = crud_user.get_user_by_email(db, request.email)
+async def forgot_password(request: ForgotPasswordRequest, http_request: Request, db: AsyncSession = Depends(get_db)):
+    limit_auth("forgot-password", http_request, request.email)
+    user = await crud_user.get_user_by_email(db, request.email)
     if not user:
         return {"message": "If an account with that email exists, a password reset link has been sent."}
 
-    print(user.id)
     reset_token = create_access_token({"sub": str(user.id)}, timedelta(hours=1))
     reset_link = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
-    await send_email(
+    # Only enqueues; services/email_dispatcher.py delivers it in the background.
+    await queue_email(
+        db,
         to_email=user.email,
         subject="Password Reset Request for User Portfolio App",
         html_content=f"Click <a href={reset_link}>here</a> to reset your password. This link will expire in 1 hour."
@@ -83,13 +90,13 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
     return {"message": "If an account with that email exists, a password reset link has been sent."}
 
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
-async def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: ResetPasswordRequest, http_request: Request, db: AsyncSession = Depends(get_db)):
+    limit_auth("reset-password", http_request)
     try:
 
         payload = jwt.decode(request.token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id_str: str = payload.get("sub")
-        print(user_id_str)  # Debugging line to check the user_id_str value
-        if user_id_str is None:
+        if user_id_str is None or payload.get("type") == "refresh":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token payload.")
         user_id = uuid.UUID(user_id_str) # ValueError có thể xảy ra ở đây nếu user_id_str không phải UUID hợp lệ
     except jwt.ExpiredSignatureError:
@@ -100,51 +107,21 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID in token.")
 
 
-    user = crud_user.get_user_by_id(db, user_id)
+    hashed_new_password = await get_password_hash(request.new_password)
+    # Sign out every existing session; committed together with the new password.
+    await refresh_tokens.revoke_user_sessions(db, user_id)
+    user = await crud_user.update_user_password(db, user_id, hashed_new_password)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
-
-    hashed_new_password = get_password_hash(request.new_password)
-    user.hashed_password = hashed_new_password
-    db.add(user)
-    db.commit()
-    db.refresh(user)
     return {"message": "Password has been reset successfully."}
 
-# @router.post("/refresh-token", response_model=Token)
-# async def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
-#     try:
-#         # Hàm này sẽ giải mã refresh token và kiểm tra tính hợp lệ/hết hạn
-#         # Nó nên đảm bảo token là refresh token (nếu bạn có thêm claim 'type' khi tạo token)
-#         # và chưa bị thu hồi (nếu bạn có blacklist/whitelist refresh token)
-#         user_id = decode_token_for_refresh(request.refresh_token)
-
-#         # Lấy thông tin user để tạo access token mới
-#         user = crud_user.get_user_by_id(db, user_id)
-#         if not user:
-#             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-
-#         # Tạo access token mới
-#         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-#         new_access_token = create_access_token(
-#             data={"sub": str(user.id)}, expires_delta=access_token_expires
-#         )
-
-#         # (Tùy chọn) Tạo refresh token mới (Rotation).
-#         # Nếu bạn không muốn rotate refresh token, bạn có thể bỏ qua dòng này
-#         # và trả về refresh token cũ nếu nó vẫn còn hiệu lực hoặc không cần rotate.
-#         # Tuy nhiên, rotation là một phương pháp bảo mật tốt.
-#         new_refresh_token = create_refresh_token(
-#             data={"sub": str(user.id)}, # Đảm bảo refresh token cũng có 'sub'
-#             expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-#         )
+@router.post("/refresh-token", response_model=Token)
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
 
-#         return {
-#             "access_token": new_access_token,
-#             "token_type": "bearer",
-#             "refresh_token": new_refresh_token # Trả về refresh token mới (nếu có rotate)
-#         }
-#     except HTTPException as e:
-#         raise e # Đẩy các HTTPException đã định nghĩa sẵn
-#     except Exception: # Bắt các lỗi khác không xác định
-#         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+    Refresh tokens rotate: each one can be used once.  Presenting an already-used
+    token revokes every token issued from the same login, and the user has to
+    log in again.
+    """
+    return await refresh_tokens.rotate(db, request.refresh_token)
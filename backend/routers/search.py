@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Query
+from schemas.search import SearchResponse, UserSearchPage, ProjectSearchPage
+from services.replicas import get_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import search as crud_search
+from typing import Literal, Optional
+from config import settings
+
+router = APIRouter(prefix="/api", tags=["Search"])
+
+@router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=settings.SEARCH_QUERY_MAX_LENGTH),
+    type: Literal["all", "users", "projects"] = "all",
+    limit: int = Query(settings.SEARCH_PAGE_DEFAULT_LIMIT, ge=1, le=settings.SEARCH_PAGE_MAX_LIMIT),
+    users_cursor: Optional[str] = None,
+    projects_cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Full-text search over portfolios (name, job title, bio) and projects (name, description).
+
+    Every word is matched as a prefix ("vec clo" finds "vector cloud"), and names
+    also match on trigram similarity so small typos still hit.  Words shorter than
+    `SEARCH_MIN_TERM_LENGTH` are ignored (a query of only those returns nothing),
+    and at most `SEARCH_CANDIDATE_LIMIT` matches are ranked.  Results are ranked
+    by relevance; pass a returned `next_cursor` back as `users_cursor` /
+    `projects_cursor` (with the same `q`) to get the next page of that list.
+    """
+    response = SearchResponse()
+    if type in ("all", "users"):
+        items, next_cursor = await crud_search.search_users(db, q, limit, users_cursor)
+        response.users = UserSearchPage(items=items, next_cursor=next_cursor)
+    if type in ("all", "projects"):
+        items, next_cursor = await crud_search.search_projects(db, q, limit, projects_cursor)
+        response.projects = ProjectSearchPage(items=items, next_cursor=next_cursor)
+    return response
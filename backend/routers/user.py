@@ -1,94 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from schemas.user import UserProfileUpdate, UserResponse
-from schemas.project import ProjectCreateUpdate, ProjectResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Response, Query
+from schemas.user import UserProfileUpdate, UserResponse, PortfolioResponse, PortfolioStatsResponse
+from schemas.project import ProjectCreateUpdate, ProjectResponse, ProjectPage, ProjectBulkRequest, ProjectBulkResponse
 from services.auth import get_current_user
+from services.portfolio_cache import portfolio_cache, etag_matches
+from services import images
+from services.replicas import get_read_db
+from services.serialization import model_response, dump_json
+from services.snapshots import render_portfolio, snapshot_writer
+from services.view_counter import view_counter
 from database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from crud import user as crud_user
 from crud import project as crud_project
+from crud import portfolio_stats as crud_portfolio_stats
 from models.user import User
 import uuid
 from typing import List, Optional
-import os
-import shutil
 from config import settings
 
 router = APIRouter(prefix="/api/user", tags=["User"])
 
+def _profile_response(user: User, next_cursor: Optional[str]):
+    # Power users own thousands of projects: the rest are paged from /projects/me.
+    profile = UserResponse.model_validate(user)
+    profile.projects_next_cursor = next_cursor
+    return model_response(UserResponse, profile)
+
 @router.put("/profile", response_model=UserResponse)
 async def update_user_profile(
     profile_update: UserProfileUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    updated_user = crud_user.update_user_profile(db, current_user.id, profile_update)
+    updated_user, next_cursor = await crud_user.update_user_profile(
+        db, current_user.id, profile_update, settings.PORTFOLIO_EMBEDDED_PROJECTS
+    )
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found after update")
-    return updated_user
-
-@router.post("/profile/image/upload", status_code=status.HTTP_200_OK)
+    return _profile_response(updated_user, next_cursor)
+
+@router.post(
+    "/profile/image/upload",
+    status_code=status.HTTP_200_OK,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+    }}}}},
+)
 async def upload_profile_image(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only image files are allowed.")
-
-    file_extension = file.filename.split(".")[-1] if "." in file.filename else "png"
-    filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join("static", filename)
-
-    os.makedirs("static", exist_ok=True)
-
+    # The body is parsed here rather than through File(...) so the byte cap is
+    # enforced while the upload is still streaming in.
+    file = await images.receive_upload(request)
+    incoming = await images.receive_image(file)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to save file: {e}")
+        stored = await images.ensure_variants(incoming)
+        # Reference counts for the new and the previous image move in the same
+        # transaction; the previous files are left to the background GC sweep.
+        updated_user = await crud_user.update_user_profile_image(db, current_user.id, stored["image_url"])
+        if not updated_user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found after image upload.")
+        # A GC sweep may have collected this hash between the check above and our
+        # commit; after the commit the reference protects it, so one re-check suffices.
+        await images.ensure_variants(incoming)
     finally:
-        file.file.close()
-
-    image_url = f"{settings.STATIC_FILES_BASE_URL}/{filename}"
-
-    # Delete old profile image if it exists
-    if current_user.profile_image_url:
-        old_filename = current_user.profile_image_url.split('/')[-1]
-        old_file_path = os.path.join("static", old_filename)
-        if os.path.exists(old_file_path):
-            try:
-                os.remove(old_file_path)
-                print(f"Deleted old profile image: {old_file_path}")
-            except OSError as e:
-                print(f"Error deleting old profile image {old_file_path}: {e}")
-
-    updated_user = crud_user.update_user_profile_image(db, current_user.id, image_url)
-    if not updated_user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found after image upload.")
+        await images.discard_incoming(incoming)
 
-    return {"message": "Profile image uploaded successfully.", "image_url": image_url}
+    return {
+        "message": "Profile image uploaded successfully.",
+        "image_url": stored["image_url"],
+        "variants": stored["variants"],
+        "srcset": stored["srcset"],
+    }
 
 @router.delete("/profile/image", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_profile_image(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user.profile_image_url:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile image to delete.")
 
-    filename = current_user.profile_image_url.split('/')[-1]
-    file_path = os.path.join("static", filename)
-
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-            print(f"Deleted profile image: {file_path}")
-        except OSError as e:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to delete file: {e}")
-    else:
-        print(f"File not found on disk: {file_path}. Proceeding to clear DB URL.")
-
-    updated_user = crud_user.update_user_profile_image(db, current_user.id, None)
+    # Only the reference is dropped here; the files are removed by the GC sweep.
+    updated_user = await crud_user.update_user_profile_image(db, current_user.id, None)
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found after image deletion.")
 
@@ -98,89 +94,156 @@ async def delete_profile_image(
 async def add_project(
     project: ProjectCreateUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    added_project = crud_project.create_project(db, project, current_user.id)
+    added_project = await crud_project.create_project(db, project, current_user.id)
     if not added_project:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to add project")
-    return added_project
+    return model_response(ProjectResponse, added_project, status_code=status.HTTP_201_CREATED)
 
 @router.put("/projects/{project_id}", response_model=ProjectResponse)
 async def edit_project(
     project_id: uuid.UUID,
     project_update: ProjectCreateUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    updated_project = crud_project.update_project(db, project_id, project_update, current_user.id)
+    updated_project = await crud_project.update_project(db, project_id, project_update, current_user.id)
     if not updated_project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found or not owned by user")
-    return updated_project
+    return model_response(ProjectResponse, updated_project)
 
 @router.delete("/projects/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_project(
     project_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    success = crud_project.delete_project(db, project_id, current_user.id)
+    success = await crud_project.delete_project(db, project_id, current_user.id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found or not owned by user")
     return
 
-@router.get("/projects/me", response_model=List[ProjectResponse])
+@router.post("/projects/bulk", response_model=ProjectBulkResponse)
+async def bulk_projects(
+    request: ProjectBulkRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create, update and delete many projects in one request and one transaction.
+
+    Ids that do not exist or are not owned by the user are reported as "not_found";
+    results are returned in the order of `operations`.
+    """
+    if len(request.operations) > settings.PROJECTS_BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.PROJECTS_BULK_MAX_OPERATIONS} operations per request.",
+        )
+    ids = [op.id for op in request.operations if op.op != "create"]
+    if len(ids) != len(set(ids)):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Each project id may appear in only one update or delete operation.",
+        )
+    results = await crud_project.bulk_apply_projects(db, current_user.id, request.operations)
+    return model_response(ProjectBulkResponse, {"results": results})
+
+@router.get("/projects/me", response_model=ProjectPage)
 async def get_my_projects(
+    limit: int = Query(settings.PROJECTS_PAGE_DEFAULT_LIMIT, ge=1, le=settings.PROJECTS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Retrieve all projects owned by the currently authenticated user.
+    Retrieve one page of the projects owned by the currently authenticated user.
+    Pass the returned `next_cursor` back as `cursor` to get the following page;
+    it is null on the last page.
     """
-    projects = crud_project.get_user_projects(db, current_user.id)
-    print(projects)
-    if not projects:
-        # It's generally fine to return an empty list if no projects exist,
-        # rather than a 404, as the request was successful.
-        return []
-    return projects
+    projects, next_cursor = await crud_project.get_user_projects(db, current_user.id, limit, cursor)
+    return model_response(ProjectPage, {"items": projects, "next_cursor": next_cursor})
 
 
 
 @router.get("/profile", response_model=UserResponse)
 async def get_user_profile(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return current_user
-
-@router.get("/portfolio/{user_id}", response_model=UserResponse)
-async def get_public_portfolio(user_id: uuid.UUID, db: Session = Depends(get_db)):
-    user = crud_user.get_user_by_id(db, user_id)
+    # The cached principal carries no projects; embed only their first page.
+    user, next_cursor = await crud_user.get_user_with_project_page(db, current_user.id, settings.PORTFOLIO_EMBEDDED_PROJECTS)
     if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User portfolio not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return _profile_response(user, next_cursor)
+
+@router.get("/portfolio/{user_id}", response_model=PortfolioResponse)
+async def get_public_portfolio(
+    user_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    cached = portfolio_cache.get(user_id)
+    if cached is None:
+        started_version = portfolio_cache.version
+        portfolio = await render_portfolio(db, user_id)
+        if portfolio is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User portfolio not found")
+
+        body = dump_json(PortfolioResponse, portfolio)
+        cached = portfolio_cache.put(user_id, body, started_version)
+        # nginx only proxies here when the snapshot file is missing; have it written.
+        snapshot_writer.queue_if_missing(user_id)
+
+    # In-memory increment only.  Behind nginx this request is a snapshot miss, which
+    # its mirror does not see (try_files jumps to @backend_api first), so count it here.
+    if settings.VIEW_COUNTER_ENABLED:
+        view_counter.hit(user_id)
+
+    # no-cache: browsers may store it but must revalidate, which is a cheap 304.
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+@router.get("/portfolio/{user_id}/stats", response_model=PortfolioStatsResponse)
+async def get_public_portfolio_stats(user_id: uuid.UUID, db: AsyncSession = Depends(get_read_db)):
+    """
+    View count of a public portfolio.
 
-    # In a real app, you might create a dedicated schema for public portfolio
-    # to explicitly exclude sensitive fields like email and email_verified
-    return UserResponse.model_validate(user)
+    Views are counted in memory and written in batches, so the total can lag
+    the real count by a few seconds (`VIEW_COUNTER_FLUSH_INTERVAL`).
+    """
+    views = await crud_portfolio_stats.get_portfolio_views(db, user_id)
+    if views is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User portfolio not found")
+    return model_response(PortfolioStatsResponse, {"user_id": user_id, "views": views + view_counter.pending(user_id)})
+
+@router.get("/portfolio/{user_id}/projects", response_model=ProjectPage)
+async def get_public_portfolio_projects(
+    user_id: uuid.UUID,
+    limit: int = Query(settings.PROJECTS_PAGE_DEFAULT_LIMIT, ge=1, le=settings.PROJECTS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    projects, next_cursor = await crud_project.get_user_projects(db, user_id, limit, cursor)
+    return model_response(ProjectPage, {"items": projects, "next_cursor": next_cursor})
 
 @router.post("/contact/{user_id}", status_code=status.HTTP_200_OK)
-async def contact_user(user_id: uuid.UUID, sender_email: str, subject: str, message: str, db: Session = Depends(get_db)):
-    target_user = crud_user.get_user_by_id(db, user_id)
+async def contact_user(user_id: uuid.UUID, sender_email: str, subject: str, message: str, db: AsyncSession = Depends(get_db)):
+    target_user = await crud_user.get_user_by_id(db, user_id)
     if not target_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User to contact not found")
 
     if not target_user.email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Target user has no contact email set.")
 
+    # Simulated, as before the outbox: this endpoint takes no authentication, so sending
+    # for real would make it an open relay to every registered address.
     print(f"Simulating email to: {target_user.email}")
     print(f"From: {sender_email}")
     print(f"Subject: {subject}")
     print(f"Message: {message}")
 
-    # You would typically use your email service here:
-    # await send_email(
-    #     to_email=target_user.email,
-    #     subject=f"Portfolio Contact from {sender_email}: {subject}",
-    #     html_content=f"Sender Email: {sender_email}<br><br>Message:<br>{message}"
-    # )
-
     return {"message": "Contact email simulated successfully. In production, this would send an actual email."}
\ No newline at end of file
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+
+class ProfileCapture(BaseModel):
+    name: str # Tên file; tải về qua /api/admin/profiles/{name}
+    created_at: str
+    method: str
+    path: str # Đường dẫn đã rút gọn trong tên file (tối đa 80 ký tự)
+    status: int
+    duration_ms: int
+    size: int
+
+class ProfileCaptureList(BaseModel):
+    enabled: bool
+    captures: List[ProfileCapture]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Literal
 import uuid # Không cần thiết cho Pydantic, nhưng để nhắc nhở id sẽ là UUID
 
 class ProjectCreateUpdate(BaseModel):
@@ -17,4 +17,34 @@ class ProjectResponse(BaseModel):
     owner_id: uuid.UUID # Thêm owner_id để biết dự án thuộc về ai
 
     class Config:
-        from_attributes = True # Đổi từ orm_mode = True (Pydantic v1) sang from_attributes = True (Pydantic v2)
\ No newline at end of file
+        from_attributes = True # Đổi từ orm_mode = True (Pydantic v1) sang from_attributes = True (Pydantic v2)
+
+class ProjectPage(BaseModel):
+    items: List[ProjectResponse]
+    next_cursor: Optional[str] = None # Opaque; pass back as ?cursor= to get the next page
+
+class ProjectBulkOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[uuid.UUID] = None # Bắt buộc với update/delete
+    project: Optional[ProjectCreateUpdate] = None # Bắt buộc với create/update
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"'{self.op}' needs an 'id'")
+        if self.op != "delete" and self.project is None:
+            raise ValueError(f"'{self.op}' needs a 'project'")
+        return self
+
+class ProjectBulkRequest(BaseModel):
+    operations: List[ProjectBulkOperation] = Field(min_length=1)
+
+class ProjectBulkResult(BaseModel):
+    index: int # Vị trí của operation trong request
+    op: Literal["create", "update", "delete"]
+    status: Literal["created", "updated", "deleted", "not_found"]
+    id: Optional[uuid.UUID] = None
+    project: Optional[ProjectResponse] = None
+
+class ProjectBulkResponse(BaseModel):
+    results: List[ProjectBulkResult]
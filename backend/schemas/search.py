@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from typing import Optional, List
+import uuid
+
+class UserSearchHit(BaseModel):
+    id: uuid.UUID
+    name: Optional[str] = None
+    job_title: Optional[str] = None
+    profile_image_url: Optional[str] = None
+    snippet: Optional[str] = None # Đoạn bio có từ khóa, bọc trong <mark>; phần còn lại đã được HTML-escape
+    score: float
+
+class ProjectSearchHit(BaseModel):
+    id: uuid.UUID
+    owner_id: uuid.UUID
+    name: str
+    demo_url: Optional[str] = None
+    repository_url: Optional[str] = None
+    snippet: Optional[str] = None # Đoạn description có từ khóa, như trên
+    score: float
+
+class UserSearchPage(BaseModel):
+    items: List[UserSearchHit]
+    next_cursor: Optional[str] = None # Opaque; pass back as ?users_cursor=
+
+class ProjectSearchPage(BaseModel):
+    items: List[ProjectSearchHit]
+    next_cursor: Optional[str] = None # Opaque; pass back as ?projects_cursor=
+
+class SearchResponse(BaseModel):
+    users: Optional[UserSearchPage] = None # None khi type=projects
+    projects: Optional[ProjectSearchPage] = None # None khi type=users
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, EmailStr
+from typing import Optional, List
+from datetime import datetime
+import uuid
+
+# Một dòng NDJSON của /api/admin/portfolios/export và /import: một user kèm toàn bộ project.
+
+class ProjectRecord(BaseModel):
+    id: uuid.UUID
+    name: str
+    demo_url: Optional[str] = None
+    repository_url: Optional[str] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None # Thiếu thì lấy thời điểm import
+
+class PortfolioRecord(BaseModel):
+    id: uuid.UUID # Chỉ dùng khi email chưa tồn tại; user trùng email giữ id hiện có
+    email: EmailStr
+    hashed_password: str
+    name: Optional[str] = None
+    job_title: Optional[str] = None
+    bio: Optional[str] = None
+    profile_image_url: Optional[str] = None
+    email_verified: bool = False
+    projects: List[ProjectRecord] = []
+
+class ImportSummary(BaseModel):
+    users: int # Số user được tạo hoặc cập nhật
+    projects: int
+    batches: int
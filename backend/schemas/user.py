@@ -18,6 +18,18 @@ class UserResponse(BaseModel):
     profile_image_url: Optional[str] = None
     email_verified: bool
     projects: List[ProjectResponse] = [] # List of ProjectResponse models
+    # Only the first page of projects is embedded (PORTFOLIO_EMBEDDED_PROJECTS); the
+    # rest come from the paginated projects endpoints, starting at this cursor.
+    projects_next_cursor: Optional[str] = None
 
     class Config:
-        from_attributes = True # Đổi từ orm_mode = True (Pydantic v1) sang from_attributes = True (Pydantic v2)
\ No newline at end of file
+        from_attributes = True # Đổi từ orm_mode = True (Pydantic v1) sang from_attributes = True (Pydantic v2)
+
+class PortfolioResponse(UserResponse):
+    # Public portfolios: fetch the rest of the projects from
+    # /api/user/portfolio/{user_id}/projects?cursor=<projects_next_cursor>.
+    pass
+
+class PortfolioStatsResponse(BaseModel):
+    user_id: uuid.UUID
+    views: int # Đã flush + chưa flush của worker này; có thể trễ tối đa VIEW_COUNTER_FLUSH_INTERVAL
@@ -0,0 +1,95 @@
+"""Regenerate every prerendered portfolio snapshot (see services/snapshots.py).
+
+Run from backend/ with the same PORTFOLIO_SNAPSHOT_DIR as the API, e.g. after
+enabling snapshots, restoring a volume or changing the portfolio schema:
+
+    python -m scripts.rebuild_snapshots --processes 4 --concurrency 8
+    python -m scripts.rebuild_snapshots --prune    # also delete files of deleted users
+
+User ids are split across ``--processes`` worker processes; each renders
+``--concurrency`` portfolios at a time over its own connection pool.  Files are
+replaced atomically, so nginx keeps serving while the rebuild runs.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select
+
+from config import settings
+from database import SessionLocal, engine
+from models.user import User
+from models import project as models_project  # noqa: F401 (registers Project for the User mapper)
+from services.snapshots import SnapshotWriter
+
+
+async def rebuild(user_ids, directory: str, write_html: bool, concurrency: int) -> int:
+    writer = SnapshotWriter(directory, write_html, debounce=0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id):
+        async with semaphore:
+            async with SessionLocal() as db:
+                return await writer.refresh(user_id, db)
+
+    try:
+        results = await asyncio.gather(*(one(user_id) for user_id in user_ids))
+    finally:
+        await engine.dispose()
+    return sum(results)
+
+
+def rebuild_chunk(user_ids, directory: str, write_html: bool, concurrency: int) -> int:
+    """Worker-process entry point."""
+    return asyncio.run(rebuild(user_ids, directory, write_html, concurrency))
+
+
+async def load_user_ids():
+    async with SessionLocal() as db:
+        ids = (await db.execute(select(User.id))).scalars().all()
+    await engine.dispose()
+    return ids
+
+
+def main(args):
+    if not args.directory:
+        raise SystemExit("Set PORTFOLIO_SNAPSHOT_DIR (or pass --directory)")
+    writer = SnapshotWriter(args.directory, args.html, debounce=0)
+    os.makedirs(writer.directory, exist_ok=True)
+
+    user_ids = asyncio.run(load_user_ids())
+    print(f"{len(user_ids)} portfolios to render into {writer.directory}")
+    started = time.perf_counter()
+    chunks = [user_ids[i::args.processes] for i in range(args.processes)]
+    # "spawn" so the workers don't inherit the parent's event loop or connections.
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        written = sum(pool.map(
+            rebuild_chunk, chunks,
+            [args.directory] * len(chunks), [args.html] * len(chunks), [args.concurrency] * len(chunks),
+        ))
+    elapsed = time.perf_counter() - started
+    print(f"wrote {written} snapshots in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f}/s)")
+
+    if args.prune:
+        known = {str(user_id) for user_id in user_ids}
+        removed = 0
+        for name in os.listdir(writer.directory):
+            stem, _, extension = name.rpartition(".")
+            if extension in ("json", "html") and not name.startswith(".") and stem not in known:
+                os.remove(os.path.join(writer.directory, name))
+                removed += 1
+        print(f"removed {removed} snapshots of deleted users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directory", default=settings.PORTFOLIO_SNAPSHOT_DIR)
+    parser.add_argument("--html", action="store_true", default=settings.PORTFOLIO_SNAPSHOT_HTML,
+                        help="also write the static HTML pages")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=8, help="portfolios rendered at once per process")
+    parser.add_argument("--prune", action="store_true", help="delete snapshots of users that no longer exist")
+    main(parser.parse_args())
@@ -0,0 +1,177 @@
+"""One-off migration of static/ into the content-addressed image store.
+
+Run from backend/ after `alembic upgrade head`:
+
+    python -m scripts.rehash_static --dry-run
+    python -m scripts.rehash_static
+
+* Legacy uploads (`<uuid4>.<ext>`, full resolution) are hashed and rendered into
+  `<sha256>_<size>.<ext>` variants.
+* Variant sets from the previous pipeline (`<uuid hex>_<size>.<ext>`) are hashed
+  from their largest variant and renamed; missing sizes/formats are rendered.
+* Every `users.profile_image_url` pointing at one of those files is rewritten,
+  then `images.refcount` is recomputed from the users table for every stored
+  hash (so the script is safe to re-run and also repairs drifted counts).
+* Old files are removed only after the database commit.  Hashes nobody
+  references are marked unreferenced and left to the GC sweep.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from config import settings
+from database import SessionLocal, engine
+from models.image import StoredImage
+from models.user import User
+from models import project as models_project  # noqa: F401 (registers Project for the User mapper)
+from services.images import (
+    FORMAT_EXTENSIONS, HASHED_FILENAME, _render_variants, hash_from_url, sniff_image_type, variant_filename,
+)
+
+PREVIOUS_VARIANT = re.compile(r"^([0-9a-f]{32})_([0-9]+)\.([a-z0-9]+)$")
+EXTENSION_FORMATS = {extension: fmt for fmt, extension in FORMAT_EXTENSIONS.items()}
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def plan_migration(static_dir: str) -> list:
+    """Group non-hashed files into units that each become one hash."""
+    legacy, previous = [], {}
+    for name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, name)
+        if not os.path.isfile(path) or HASHED_FILENAME.match(name):
+            continue
+        match = PREVIOUS_VARIANT.match(name)
+        if match:
+            previous.setdefault(match.group(1), []).append((int(match.group(2)), match.group(3), name))
+            continue
+        with open(path, "rb") as f:
+            if sniff_image_type(f.read(16)):
+                legacy.append({"kind": "legacy", "files": [name], "source": name})
+
+    units = list(legacy)
+    for stem, variants in previous.items():
+        # Prefer the largest JPEG as the rendering source: it is lossless enough and always opaque-safe.
+        largest = max(variants, key=lambda v: (v[0], v[1] == "jpg"))
+        units.append({"kind": "variants", "files": [v[2] for v in variants], "source": largest[2], "variants": variants})
+    return units
+
+
+def new_filename_for(unit: dict, old_name: str, image_hash: str) -> str:
+    """The hashed file that replaces `old_name` in a user's profile_image_url."""
+    default_fmt, default_size = settings.IMAGE_DEFAULT_VARIANT
+    if unit["kind"] == "variants":
+        match = PREVIOUS_VARIANT.match(old_name)
+        fmt = EXTENSION_FORMATS.get(match.group(3)) if match else None
+        size = int(match.group(2)) if match else None
+        if fmt in settings.IMAGE_VARIANT_FORMATS and size in settings.IMAGE_VARIANT_SIZES:
+            return variant_filename(image_hash, size, fmt)
+    return variant_filename(image_hash, default_size, default_fmt)
+
+
+def materialize(unit: dict, static_dir: str) -> str:
+    """Hash a unit and write its hashed variants; returns the hash. Runs in a worker process."""
+    image_hash = sha256_file(os.path.join(static_dir, unit["source"]))
+    if unit["kind"] == "variants":
+        for size, extension, name in unit["variants"]:
+            target = os.path.join(static_dir, f"{image_hash}_{size}.{extension}")
+            if not os.path.exists(target):
+                os.link(os.path.join(static_dir, name), target)
+    missing = [
+        (size, fmt) for size in settings.IMAGE_VARIANT_SIZES for fmt in settings.IMAGE_VARIANT_FORMATS
+        if not os.path.exists(os.path.join(static_dir, variant_filename(image_hash, size, fmt)))
+    ]
+    if missing:
+        _render_variants(
+            os.path.join(static_dir, unit["source"]), static_dir, image_hash,
+            sorted({size for size, _ in missing}), sorted({fmt for _, fmt in missing}), settings.IMAGE_MAX_PIXELS,
+        )
+    return image_hash
+
+
+async def rewrite_references(renames: dict, dry_run: bool) -> Counter:
+    """Point users at the hashed files and recompute every image's refcount."""
+    base = settings.STATIC_FILES_BASE_URL
+    references = Counter()
+    async with SessionLocal() as db:
+        result = await db.execute(select(User.id, User.profile_image_url).where(User.profile_image_url.is_not(None)))
+        for user_id, url in result.all():
+            new_name = renames.get(url.rsplit("/", 1)[-1])
+            if new_name:
+                url = f"{base}/{new_name}"
+                if not dry_run:
+                    await db.execute(update(User).where(User.id == user_id).values(profile_image_url=url))
+            image_hash = hash_from_url(url)
+            if image_hash:
+                references[image_hash] += 1
+
+        stored = set((await db.execute(select(StoredImage.hash))).scalars().all())
+        stored |= {match.group(1) for match in map(HASHED_FILENAME.match, os.listdir(settings.STATIC_DIR)) if match}
+        stored |= set(references)
+        if not dry_run:
+            for image_hash in stored:
+                count = references.get(image_hash, 0)
+                stmt = insert(StoredImage).values(hash=image_hash, refcount=count)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[StoredImage.hash],
+                    set_={
+                        "refcount": count,
+                        "unreferenced_since": None if count else StoredImage.unreferenced_since,
+                    },
+                )
+                await db.execute(stmt)
+            # Zero-reference rows need a timestamp for the GC grace period.
+            await db.execute(
+                update(StoredImage)
+                .where(StoredImage.refcount <= 0, StoredImage.unreferenced_since.is_(None))
+                .values(unreferenced_since=StoredImage.created_at)
+            )
+            await db.commit()
+    return references
+
+
+async def main(args):
+    static_dir = settings.STATIC_DIR
+    units = plan_migration(static_dir)
+    print(f"{len(units)} images to move into the content-addressed store")
+
+    renames = {}
+    if units and not args.dry_run:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            hashes = await asyncio.gather(*(
+                loop.run_in_executor(pool, materialize, unit, static_dir) for unit in units
+            ))
+        for unit, image_hash in zip(units, hashes):
+            for old_name in unit["files"]:
+                renames[old_name] = new_filename_for(unit, old_name, image_hash)
+
+    references = await rewrite_references(renames, args.dry_run)
+    print(f"{sum(references.values())} profile image references across {len(references)} images")
+
+    if not args.dry_run:
+        for unit in units:
+            for old_name in unit["files"]:
+                os.remove(os.path.join(static_dir, old_name))
+        print(f"removed {sum(len(unit['files']) for unit in units)} pre-hash files")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    asyncio.run(main(parser.parse_args()))
@@ -1,23 +1,37 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from config import settings
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Header
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, SessionLocal
 from crud import user as crud_user
+from services.hashing import hash_password, check_password, needs_update
+from services.principal_cache import principal_cache
+import hmac
 import uuid
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/user/login")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt runs in services.hashing's process pool, never on the event loop.
+async def verify_password(plain_password, hashed_password):
+    return await check_password(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await hash_password(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return needs_update(hashed_password)
+
+async def rehash_password(user_id: uuid.UUID, old_hash: str, password: str):
+    """Background task after a login whose stored hash is out of policy; failures wait for the next login."""
+    try:
+        new_hash = await hash_password(password)
+        async with SessionLocal() as db:
+            await crud_user.replace_password_hash(db, user_id, old_hash, new_hash)
+    except Exception as e:
+        print(f"Password rehash for user {user_id} skipped: {e!r}")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -35,11 +49,12 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    # "type" keeps refresh tokens out of get_current_user; see services/refresh_tokens.py for jti/fam.
+    to_encode.update({"exp": expire, "type": "refresh"})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,15 +63,29 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id_str: str = payload.get("sub")
-        if user_id_str is None:
+        if user_id_str is None or payload.get("type") == "refresh":
             raise credentials_exception
         user_id = uuid.UUID(user_id_str)
     except (JWTError, ValueError):
         raise credentials_exception
 
-    user = crud_user.get_user_by_id(db, user_id)
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return user
+
+    cache_version = principal_cache.version
+    user = await crud_user.get_user_by_id(db, user_id)
     if user is None:
         raise credentials_exception
+    # Detach so the snapshot can be shared across requests and sessions.
+    db.expunge(user)
+    principal_cache.put(user_id, user, payload.get("exp"), cache_version)
     return user
 
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency for operator-only routes: the X-Admin-Token header must equal ADMIN_API_TOKEN."""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
@@ -1,20 +1,190 @@
-import sendgrid
-from sendgrid.helpers.mail import Mail, Email, To
+"""Outgoing email: the outbox API used by request handlers and the delivery transports.
+
+Handlers call `queue_email`, which only inserts an `email_outbox` row and wakes
+the dispatcher (services/email_dispatcher.py); nothing is sent on the request
+path.  The dispatcher hands batches to the transport picked by `EMAIL_TRANSPORT`:
+
+* "sendgrid": SendGrid v3 API over one pooled HTTP/1.1 client.
+* "smtp":     an SMTP server or local sink (MailHog, `python -m aiosmtpd -n`),
+              one connection per batch.
+* "file":     writes each message as an .eml file into `EMAIL_SINK_DIR`.
+* "log":      prints the message (the old behaviour without an API key).
+* "auto":     "sendgrid" when EMAIL_SERVICE_API_KEY is set, otherwise "log".
+
+`send_batch` returns one entry per message: None when it was delivered, or an
+`EmailDeliveryError` whose `permanent` flag tells the dispatcher not to retry.
+
+httpx and smtplib are imported by the transport that uses them, not with this
+module: every router imports `queue_email`, and only the dispatcher sends.
+"""
+import asyncio
+import os
+from email.message import EmailMessage
+from typing import List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
 from config import settings
+from crud.email import enqueue_email
+from models.email import OutboxEmail
+
+
+class EmailDeliveryError(Exception):
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+_wakeup = asyncio.Event()
+
 
-async def send_email(to_email: str, subject: str, html_content: str):
+def notify_dispatcher():
+    _wakeup.set()
+
+
+async def wait_for_work(timeout: float):
+    """Block the dispatcher until something is queued in this process or `timeout` passes."""
     try:
-        if not settings.EMAIL_SERVICE_API_KEY:
-            print("EMAIL_SERVICE_API_KEY not set. Skipping email sending.")
-            return False
-
-        sg = sendgrid.SendGridAPIClient(settings.EMAIL_SERVICE_API_KEY)
-        from_email = Email(settings.SENDER_EMAIL)
-        to_email_obj = To(to_email)
-        message = Mail(from_email, to_email_obj, subject, html_content)
-        response = sg.client.mail.send.post(request_body=message.get())
-        print(f"Email sent to {to_email}. Status Code: {response.status_code}")
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
\ No newline at end of file
+        await asyncio.wait_for(_wakeup.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    _wakeup.clear()
+
+
+async def queue_email(db: AsyncSession, to_email: str, subject: str, html_content: str):
+    """Persist an email in the outbox and commit; delivery happens in the background."""
+    # Subjects may contain user input (contact form); never let it inject headers.
+    subject = " ".join(subject.splitlines())
+    enqueue_email(db, to_email, subject, html_content)
+    await db.commit()
+    notify_dispatcher()
+
+
+def _to_mime(message: OutboxEmail) -> EmailMessage:
+    mime = EmailMessage()
+    mime["From"] = settings.SENDER_EMAIL
+    mime["To"] = message.to_email
+    mime["Subject"] = message.subject
+    mime["Message-ID"] = f"<{message.id}@outbox>"
+    mime.set_content(message.html_content, subtype="html")
+    return mime
+
+
+class LogTransport:
+    async def send_batch(self, messages: Sequence[OutboxEmail]) -> List[Optional[EmailDeliveryError]]:
+        for message in messages:
+            print(f"[email:log] to={message.to_email} subject={message.subject!r}")
+        return [None] * len(messages)
+
+    async def close(self):
+        pass
+
+
+class FileTransport:
+    """Offline sink: one .eml file per message, named after the outbox id."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _write(self, messages: Sequence[OutboxEmail]):
+        for message in messages:
+            path = os.path.join(self.directory, f"{message.id}.eml")
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(bytes(_to_mime(message)))
+            os.replace(f"{path}.tmp", path)
+
+    async def send_batch(self, messages: Sequence[OutboxEmail]) -> List[Optional[EmailDeliveryError]]:
+        try:
+            await run_in_threadpool(self._write, messages)
+        except OSError as e:
+            return [EmailDeliveryError(f"file sink: {e}")] * len(messages)
+        return [None] * len(messages)
+
+    async def close(self):
+        pass
+
+
+class SmtpTransport:
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+
+    def _send(self, messages: Sequence[OutboxEmail]) -> List[Optional[EmailDeliveryError]]:
+        import smtplib
+
+        results: List[Optional[EmailDeliveryError]] = []
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                for message in messages:
+                    try:
+                        smtp.send_message(_to_mime(message))
+                        results.append(None)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        results.append(EmailDeliveryError(f"smtp: recipient refused {e.recipients}", permanent=True))
+                    except smtplib.SMTPResponseException as e:
+                        results.append(EmailDeliveryError(f"smtp {e.smtp_code}: {e.smtp_error!r}", permanent=500 <= e.smtp_code < 600))
+        except (OSError, smtplib.SMTPException) as e:
+            # Connection-level failure: everything not yet attempted is retried.
+            results.extend([EmailDeliveryError(f"smtp: {e}")] * (len(messages) - len(results)))
+        return results
+
+    async def send_batch(self, messages: Sequence[OutboxEmail]) -> List[Optional[EmailDeliveryError]]:
+        return await run_in_threadpool(self._send, messages)
+
+    async def close(self):
+        pass
+
+
+class SendGridTransport:
+    """SendGrid v3 mail/send over a single keep-alive client shared by every batch."""
+
+    def __init__(self, api_key: str, timeout: float, max_connections: int):
+        import httpx
+
+        self.http_error = httpx.HTTPError
+        self.client = httpx.AsyncClient(
+            base_url="https://api.sendgrid.com",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def _send(self, message: OutboxEmail) -> Optional[EmailDeliveryError]:
+        body = {
+            "personalizations": [{"to": [{"email": message.to_email}]}],
+            "from": {"email": settings.SENDER_EMAIL},
+            "subject": message.subject,
+            "content": [{"type": "text/html", "value": message.html_content}],
+            "headers": {"X-Outbox-Id": str(message.id)},
+        }
+        try:
+            response = await self.client.post("/v3/mail/send", json=body)
+        except self.http_error as e:
+            return EmailDeliveryError(f"sendgrid: {e!r}")
+        if response.status_code < 300:
+            return None
+        # 429 and 5xx are worth retrying; any other 4xx will fail the same way again.
+        permanent = 400 <= response.status_code < 500 and response.status_code != 429
+        return EmailDeliveryError(f"sendgrid {response.status_code}: {response.text[:500]}", permanent=permanent)
+
+    async def send_batch(self, messages: Sequence[OutboxEmail]) -> List[Optional[EmailDeliveryError]]:
+        return list(await asyncio.gather(*(self._send(message) for message in messages)))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def get_transport():
+    kind = settings.EMAIL_TRANSPORT
+    if kind == "auto":
+        kind = "sendgrid" if settings.EMAIL_SERVICE_API_KEY else "log"
+    if kind == "sendgrid":
+        return SendGridTransport(settings.EMAIL_SERVICE_API_KEY, settings.EMAIL_SEND_TIMEOUT, settings.EMAIL_BATCH_SIZE)
+    if kind == "smtp":
+        return SmtpTransport(settings.EMAIL_SMTP_HOST, settings.EMAIL_SMTP_PORT, settings.EMAIL_SEND_TIMEOUT)
+    if kind == "file":
+        return FileTransport(settings.EMAIL_SINK_DIR)
+    if kind == "log":
+        return LogTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT {settings.EMAIL_TRANSPORT!r}")
@@ -0,0 +1,68 @@
+"""Background delivery of the email outbox.
+
+Each worker runs `run_dispatcher`: it leases up to `EMAIL_BATCH_SIZE` due rows
+(crud.email.claim_due_emails, SKIP LOCKED), hands them to the transport as one
+batch and records the outcome in a single transaction.  Failures are retried
+with exponential backoff and jitter; permanent failures, and emails that used
+up `EMAIL_MAX_ATTEMPTS`, are dead-lettered (status "dead", last_error kept).
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from config import settings
+from crud import email as crud_email
+from database import SessionLocal
+from services.email import get_transport, wait_for_work
+
+
+def retry_at(attempts: int) -> Optional[datetime]:
+    """When to try again after the `attempts`-th failure, or None to dead-letter."""
+    if attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        return None
+    delay = min(settings.EMAIL_RETRY_BASE * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX)
+    # Full jitter in the upper half keeps a burst of failures from retrying in lockstep.
+    return datetime.now(timezone.utc) + timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+async def dispatch_once(transport) -> int:
+    """Send one batch; returns how many emails were claimed."""
+    async with SessionLocal() as db:
+        claimed = await crud_email.claim_due_emails(db, settings.EMAIL_BATCH_SIZE, settings.EMAIL_LEASE_SECONDS)
+    if not claimed:
+        return 0
+
+    results = await transport.send_batch(claimed)
+
+    sent, dead = [], 0
+    async with SessionLocal() as db:
+        for message, error in zip(claimed, results):
+            if error is None:
+                sent.append(message.id)
+                continue
+            when = None if error.permanent else retry_at(message.attempts)
+            dead += when is None
+            await crud_email.mark_failed(db, message.id, str(error), when)
+        await crud_email.mark_sent(db, sent)
+        await db.commit()
+
+    failed = len(claimed) - len(sent)
+    if failed:
+        print(f"Email outbox: sent {len(sent)}, failed {failed} ({dead} dead-lettered)")
+    return len(claimed)
+
+
+async def run_dispatcher():
+    transport = get_transport()
+    try:
+        while True:
+            try:
+                claimed = await dispatch_once(transport)
+            except Exception as e:
+                print(f"Email dispatch failed: {e}")
+                claimed = 0
+            # A full batch means there is probably more waiting; otherwise sleep until woken.
+            if claimed < settings.EMAIL_BATCH_SIZE:
+                await wait_for_work(settings.EMAIL_POLL_INTERVAL)
+    finally:
+        await transport.close()
@@ -0,0 +1,244 @@
+"""Password hashing off the event loop.
+
+bcrypt is deliberately expensive CPU work (~200 ms per call), so running it inside
+a coroutine freezes every other request on the worker.  Hashes are computed in a
+dedicated process pool instead.  The pool admits at most
+``HASH_POOL_WORKERS + HASH_POOL_MAX_QUEUE`` calls at once; anything beyond that is
+rejected immediately with 503 + Retry-After rather than piling up behind a burst
+of logins.
+
+The work factor is not hard-coded: at startup `configure_hashing` measures this
+machine and picks bcrypt rounds (or argon2 time/memory cost, with
+``PASSWORD_HASH_SCHEME=argon2``) so one hash takes about
+``PASSWORD_HASH_TARGET_MS``.  Stored hashes outside that policy (another
+scheme, or a cost more than one step away) report `needs_update`, and login
+rehashes them in the background.
+"""
+import asyncio
+import math
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from config import settings
+
+HASH_SCHEMES = ("bcrypt", "argon2")
+# passlib's defaults, used when calibration is off and PASSWORD_HASH_ROUNDS is not set
+DEFAULT_ROUNDS = {"bcrypt": 12, "argon2": 3}
+
+
+def build_policy(scheme: str, rounds: int, memory_kb: int = 0) -> dict:
+    """CryptContext settings that hash with `scheme` at `rounds` (bcrypt log2 rounds, argon2 time_cost).
+
+    Hashes one step above `rounds` stay in policy: uvicorn workers calibrate
+    separately and may land on neighbouring values, and they must not keep
+    rehashing each other's hashes.  The other scheme is only accepted for
+    verification, so switching schemes migrates users as they log in.
+    """
+    others = [other for other in HASH_SCHEMES if other != scheme]
+    policy = {
+        "schemes": [scheme, *others],
+        "deprecated": others,
+        f"{scheme}__default_rounds": rounds,
+        f"{scheme}__min_rounds": rounds,
+        f"{scheme}__max_rounds": rounds + 1,
+    }
+    if scheme == "argon2":
+        policy.update({"argon2__memory_cost": memory_kb, "argon2__parallelism": 1})
+    return policy
+
+
+def fixed_policy() -> dict:
+    scheme = settings.PASSWORD_HASH_SCHEME
+    return build_policy(scheme, settings.PASSWORD_HASH_ROUNDS or DEFAULT_ROUNDS[scheme], settings.ARGON2_MEMORY_KB)
+
+
+def time_hash(policy: dict, samples: int = 3) -> float:
+    """Median seconds per hash under `policy` in this process."""
+    context = CryptContext(**policy)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash("calibration-password")
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate(scheme: str, target_ms: float) -> dict:
+    """The policy whose hashes take about `target_ms` here, never below the configured floors."""
+    target = target_ms / 1000
+    if scheme == "bcrypt":
+        # Each round doubles the cost, so one cheap probe is enough to extrapolate.
+        probe = 8
+        rounds = probe + math.floor(math.log2(target / time_hash(build_policy("bcrypt", probe))))
+        return build_policy("bcrypt", min(31, max(settings.BCRYPT_MIN_ROUNDS, rounds)))
+
+    # argon2: keep the memory cost and add passes (time grows linearly with them);
+    # if one pass is already too slow, use less memory, down to ARGON2_MIN_MEMORY_KB.
+    memory_kb = settings.ARGON2_MEMORY_KB
+    one_pass = time_hash(build_policy("argon2", 1, memory_kb))
+    if one_pass > target:
+        memory_kb = max(settings.ARGON2_MIN_MEMORY_KB, int(memory_kb * target / one_pass) // 1024 * 1024)
+        return build_policy("argon2", 1, memory_kb)
+    return build_policy("argon2", max(1, math.floor(target / one_pass)), memory_kb)
+
+
+def describe_policy(policy: dict) -> dict:
+    scheme = policy["schemes"][0]
+    description = {"scheme": scheme, "rounds": policy[f"{scheme}__default_rounds"]}
+    if scheme == "argon2":
+        description["memory_kb"] = policy["argon2__memory_cost"]
+    return description
+
+
+pwd_context = CryptContext(**fixed_policy())
+
+
+# Worker-side functions: these run inside the pool processes.
+def _configure_worker(policy: dict):
+    pwd_context.load(policy)
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHashPool:
+    def __init__(self, workers: int, max_queue: int, retry_after: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.policy = fixed_policy()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1024)
+        self.completed = 0
+        self.rejected = 0
+        self.respawns = 0
+        self.latency_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn" so the workers don't inherit the event loop or open DB connections.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_configure_worker,
+                initargs=(self.policy,),
+            )
+        return self._executor
+
+    def configure(self, policy: dict):
+        """Hash with `policy` from now on, here and in the pool processes."""
+        pwd_context.load(policy)
+        self.policy = policy
+        self.shutdown()  # workers started with the old policy; the next call spawns new ones
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    async def warm_up(self):
+        """Start every worker process now (one hash each, concurrently) instead of on the first logins."""
+        await asyncio.gather(*(self.run(_hash, "warm-up") for _ in range(self.workers)))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    async def run(self, fn, *args):
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self._in_flight += 1
+        start = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault) and the executor refuses all work
+            # from now on: drop it so the next call respawns workers with self.policy.
+            if executor is self._executor:
+                self.shutdown()
+                self.respawns += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        finally:
+            self._in_flight -= 1
+            elapsed = time.perf_counter() - start
+            self._latencies.append(elapsed)
+            self.latency_total += elapsed
+            self.completed += 1
+
+    def stats(self) -> dict:
+        """Queue depth and hash latency (queue wait + compute) for sizing the pool."""
+        samples = sorted(self._latencies)
+
+        def pct(p):
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 2)
+
+        return {
+            "policy": describe_policy(self.policy),
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "respawns": self.respawns,
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99)},
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hash_pool = PasswordHashPool(
+    workers=settings.HASH_POOL_WORKERS,
+    max_queue=settings.HASH_POOL_MAX_QUEUE,
+    retry_after=settings.HASH_POOL_RETRY_AFTER,
+)
+
+
+async def hash_password(password: str) -> str:
+    return await hash_pool.run(_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(_verify, plain_password, hashed_password)
+
+def needs_update(hashed_password: str) -> bool:
+    """True if the hash was made with another scheme or a cost outside the current policy."""
+    return pwd_context.needs_update(hashed_password)
+
+
+def configure_hashing():
+    """Startup: calibrate the work factor on this machine (unless disabled) and apply it."""
+    scheme, target_ms = settings.PASSWORD_HASH_SCHEME, settings.PASSWORD_HASH_TARGET_MS
+    policy = calibrate(scheme, target_ms) if settings.PASSWORD_HASH_CALIBRATE else fixed_policy()
+    hash_pool.configure(policy)
+    measured_ms = time_hash(policy, samples=1) * 1000
+    print(f"Password hashing: {describe_policy(policy)}, {measured_ms:.0f} ms per hash (target {target_ms:.0f} ms)")
@@ -0,0 +1,94 @@
+"""Background garbage collection for the content-addressed image store.
+
+Requests never delete image files.  Every `IMAGE_GC_INTERVAL` seconds each
+worker sweeps:
+
+1. `images` rows whose refcount dropped to zero more than `IMAGE_GC_GRACE`
+   seconds ago.  Rows are claimed with FOR UPDATE SKIP LOCKED, their files are
+   removed while the rows are still locked, then the rows are deleted.  An upload
+   that re-references one of those hashes blocks on the row lock and re-renders
+   the variants after its commit (see `upload_profile_image`).
+2. Hashed files on disk that have no `images` row at all (e.g. an upload that
+   failed between rendering and its DB commit) and have not been touched for
+   the grace period.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from crud import image as crud_image
+from database import SessionLocal
+from services.images import HASHED_FILENAME, remove_hash_files
+
+
+def _stale_hashed_files(cutoff: float) -> dict:
+    """hash -> [paths] for hashed files whose every variant is older than `cutoff`."""
+    by_hash, fresh = {}, set()
+    if not os.path.isdir(settings.STATIC_DIR):
+        return by_hash
+    with os.scandir(settings.STATIC_DIR) as entries:
+        for entry in entries:
+            match = HASHED_FILENAME.match(entry.name)
+            if not match:
+                continue
+            if entry.stat().st_mtime >= cutoff:
+                fresh.add(match.group(1))
+            by_hash.setdefault(match.group(1), []).append(entry.path)
+    return {image_hash: paths for image_hash, paths in by_hash.items() if image_hash not in fresh}
+
+
+def _remove_if_stale(paths, cutoff: float) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            # Re-check: a dedupe hit refreshes mtime (services.images._missing_variants).
+            if os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+async def sweep_once() -> dict:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.IMAGE_GC_GRACE)
+    collected = 0
+    async with SessionLocal() as db:
+        while True:
+            hashes = await crud_image.claim_unreferenced(db, cutoff, settings.IMAGE_GC_BATCH)
+            if not hashes:
+                await db.rollback()
+                break
+            await run_in_threadpool(remove_hash_files, hashes)
+            await crud_image.delete_images(db, hashes)
+            await db.commit()
+            collected += len(hashes)
+
+    cutoff_ts = time.time() - settings.IMAGE_GC_GRACE
+    stale = await run_in_threadpool(_stale_hashed_files, cutoff_ts)
+    orphan_files = 0
+    if stale:
+        candidates, known = list(stale), set()
+        async with SessionLocal() as db:
+            for start in range(0, len(candidates), 1000):
+                known |= await crud_image.get_known_hashes(db, candidates[start:start + 1000])
+        for image_hash, paths in stale.items():
+            if image_hash not in known:
+                orphan_files += await run_in_threadpool(_remove_if_stale, paths, cutoff_ts)
+
+    if collected or orphan_files:
+        print(f"Image GC: collected {collected} unreferenced images, removed {orphan_files} orphan files")
+    return {"collected": collected, "orphan_files": orphan_files}
+
+
+async def run_gc_loop():
+    while True:
+        await asyncio.sleep(settings.IMAGE_GC_INTERVAL)
+        try:
+            await sweep_once()
+        except Exception as e:
+            print(f"Image GC sweep failed: {e}")
@@ -0,0 +1,347 @@
+"""Profile image upload pipeline and content-addressed image store.
+
+* The multipart body is parsed from a byte-capped request stream, so an
+  oversized upload is rejected with 413 as soon as it crosses
+  `IMAGE_UPLOAD_MAX_BYTES` instead of after it has been fully received.
+* The file is streamed to a temp file in async chunks while its sha256 is
+  computed, and its type is sniffed from the magic bytes; the client's
+  Content-Type and filename are not trusted.
+* Images are stored under their content hash: variants
+  (`IMAGE_VARIANT_SIZES` x `IMAGE_VARIANT_FORMATS`) are named
+  `<sha256>_<size>.<ext>` and are only rendered (by Pillow, in a process pool)
+  the first time a hash is seen.  Identical uploads share the same files and a
+  reference count in the `images` table (crud/image.py).
+* Hashed URLs never change content, so they are served with
+  `Cache-Control: immutable`.  Nothing is deleted on the request path; files of
+  unreferenced hashes are removed by the GC sweep in services/image_gc.py.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, NamedTuple, Optional
+
+import anyio
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser
+from starlette.staticfiles import StaticFiles
+
+from config import settings
+
+CHUNK_SIZE = 256 * 1024
+
+# Leading magic bytes -> canonical extension
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+# <sha256>_<size>.<ext>; anything else in static/ is not content-addressed.
+HASHED_FILENAME = re.compile(r"^([0-9a-f]{64})_([0-9]+)\.([a-z0-9]+)$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# EXIF orientation -> PIL.Image.Transpose value (same table as ImageOps.exif_transpose)
+_EXIF_TRANSPOSE = {2: 0, 3: 3, 4: 1, 5: 5, 6: 4, 7: 6, 8: 2}
+
+
+def hash_from_url(image_url: Optional[str]) -> Optional[str]:
+    if not image_url or not image_url.startswith(f"{settings.STATIC_FILES_BASE_URL}/"):
+        return None
+    match = HASHED_FILENAME.match(image_url.rsplit("/", 1)[-1])
+    return match.group(1) if match else None
+
+
+def variant_filename(image_hash: str, size: int, fmt: str) -> str:
+    return f"{image_hash}_{size}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class ImageTooLarge(Exception):
+    """Raised in a worker when the declared dimensions exceed `IMAGE_MAX_PIXELS`."""
+
+
+def _shrink(image, size: int):
+    """A new image that fits in size x size, or `image` itself if it already does.
+
+    `reduce()` first (integer box downscale, cheap) down to about twice the
+    target, then LANCZOS for the rest, like `thumbnail(reducing_gap=2.0)`.
+    """
+    from PIL import Image
+
+    width, height = image.size
+    if max(width, height) <= size:
+        return image
+    scale = size / max(width, height)
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    factor = int(max(width, height) / size / 2)
+    if factor > 1:
+        image = image.reduce(factor)
+    return image.resize(target, Image.Resampling.LANCZOS)
+
+
+# Worker-side function: runs inside the image pool processes.
+def _render_variants(source_path: str, out_dir: str, stem: str, sizes, formats, max_pixels: int) -> Dict[str, Dict[int, str]]:
+    from PIL import Image
+
+    # Pillow's own bomb check as a backstop: it raises in open() at twice this value.
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        opened = Image.open(source_path)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    written: Dict[str, Dict[int, str]] = {}
+    with opened as original:
+        # Only the header has been read so far: refuse before anything is decoded.
+        width, height = original.size
+        if width * height > max_pixels:
+            raise ImageTooLarge(f"{width}x{height} is {width * height} pixels")
+        largest = max(sizes)
+        # JPEG only: decode at 1/2..1/8 scale when the largest variant still fits.
+        original.draft(original.mode, (largest, largest))
+        original.load()
+        # Applied to each (small) variant instead of to the decoded original.
+        transpose = _EXIF_TRANSPOSE.get(original.getexif().get(0x0112))
+        image = original
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+        # Largest first, each variant shrunk from the previous one: the decoded
+        # image is resampled once and never copied per size.
+        for size in sorted(sizes, reverse=True):
+            image = _shrink(image, size)
+            variant = image.transpose(transpose) if transpose is not None else image
+            for fmt in formats:
+                filename = variant_filename(stem, size, fmt)
+                target = os.path.join(out_dir, filename)
+                tmp = f"{target}.{os.getpid()}.tmp"
+                if fmt == "jpeg":
+                    if variant.mode == "RGBA":
+                        flattened = Image.new("RGB", variant.size, (255, 255, 255))
+                        flattened.paste(variant, mask=variant.split()[3])
+                    else:
+                        flattened = variant
+                    flattened.save(tmp, "JPEG", quality=85, optimize=True, progressive=True)
+                else:
+                    variant.save(tmp, "WEBP", quality=80, method=4)
+                os.replace(tmp, target)
+                written.setdefault(fmt, {})[size] = filename
+    return written
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+def shutdown_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _capped_stream(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Upload exceeds the {max_bytes} byte limit.",
+            )
+        yield chunk
+
+
+async def receive_upload(request: Request, field: str = "file") -> UploadFile:
+    """Parse a multipart upload without ever accepting more than the configured cap."""
+    max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds the {max_bytes} byte limit.",
+        )
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload.")
+
+    parser = MultiPartParser(request.headers, _capped_stream(request, max_bytes), max_files=1, max_fields=5)
+    form = await parser.parse()
+    upload = form.get(field)
+    if not isinstance(upload, UploadFile):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing '{field}' file field.")
+    return upload
+
+
+class IncomingImage(NamedTuple):
+    hash: str
+    temp_path: str
+
+
+async def receive_image(upload: UploadFile) -> IncomingImage:
+    """Stream an upload to a temp file, sniffing its type and hashing it on the way."""
+    head = await upload.read(CHUNK_SIZE)
+    if sniff_image_type(head) is None:
+        await upload.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PNG, JPEG, GIF or WebP images are allowed.")
+
+    fd, temp_path = tempfile.mkstemp(prefix="upload-")
+    os.close(fd)
+    digest = hashlib.sha256()
+    try:
+        async with await anyio.open_file(temp_path, "wb") as out:
+            chunk = head
+            while chunk:
+                digest.update(chunk)
+                await out.write(chunk)
+                chunk = await upload.read(CHUNK_SIZE)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    finally:
+        await upload.close()
+    return IncomingImage(hash=digest.hexdigest(), temp_path=temp_path)
+
+
+async def discard_incoming(incoming: IncomingImage):
+    await run_in_threadpool(_remove_path, incoming.temp_path)
+
+
+def _missing_variants(image_hash: str) -> bool:
+    paths = [
+        os.path.join(settings.STATIC_DIR, variant_filename(image_hash, size, fmt))
+        for size in settings.IMAGE_VARIANT_SIZES
+        for fmt in settings.IMAGE_VARIANT_FORMATS
+    ]
+    try:
+        # Touch on a dedupe hit so the orphan-file sweep treats the files as fresh.
+        for path in paths:
+            os.utime(path)
+    except FileNotFoundError:
+        return True
+    return False
+
+
+async def ensure_variants(incoming: IncomingImage) -> Dict[str, object]:
+    """Make sure every variant of `incoming.hash` is on disk and return their URLs.
+
+    A hash seen before costs a few stat() calls; only new content is rendered.
+    Returns {"image_url": <default variant url>, "variants": {fmt: {size: url}},
+    "srcset": {fmt: "url 64w, url 256w, ..."}}.
+    """
+    os.makedirs(settings.STATIC_DIR, exist_ok=True)
+    if await run_in_threadpool(_missing_variants, incoming.hash):
+        executor = _get_executor()
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                executor, _render_variants, incoming.temp_path, settings.STATIC_DIR, incoming.hash,
+                settings.IMAGE_VARIANT_SIZES, settings.IMAGE_VARIANT_FORMATS, settings.IMAGE_MAX_PIXELS,
+            )
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault): the executor is unusable from now on,
+            # so drop it and let the next upload spawn a fresh pool.  Only if it is
+            # still the current one: concurrent uploads all see the same breakage.
+            if executor is _executor:
+                shutdown_pool()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing is restarting, please retry.",
+                headers={"Retry-After": "1"},
+            )
+        except ImageTooLarge:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Image exceeds the {settings.IMAGE_MAX_PIXELS} pixel limit.",
+            )
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The file could not be decoded as an image.")
+
+    variants = {
+        fmt: {
+            size: f"{settings.STATIC_FILES_BASE_URL}/{variant_filename(incoming.hash, size, fmt)}"
+            for size in settings.IMAGE_VARIANT_SIZES
+        }
+        for fmt in settings.IMAGE_VARIANT_FORMATS
+    }
+    default_fmt, default_size = settings.IMAGE_DEFAULT_VARIANT
+    return {
+        "image_url": variants[default_fmt][default_size],
+        "variants": variants,
+        "srcset": image_srcset(variants[default_fmt][default_size]),
+    }
+
+
+def _srcset(urls_by_size: Dict[int, str]) -> str:
+    return ", ".join(f"{url} {size}w" for size, url in sorted(urls_by_size.items()))
+
+
+def image_srcset(image_url: Optional[str]) -> Dict[str, str]:
+    """Rebuild the srcset map from any stored variant URL."""
+    image_hash = hash_from_url(image_url)
+    if image_hash is None:
+        return {}
+    return {
+        fmt: _srcset({
+            size: f"{settings.STATIC_FILES_BASE_URL}/{variant_filename(image_hash, size, fmt)}"
+            for size in settings.IMAGE_VARIANT_SIZES
+        })
+        for fmt in settings.IMAGE_VARIANT_FORMATS
+    }
+
+
+def _remove_path(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def remove_hash_files(image_hashes) -> int:
+    """Delete every file stored under any of `image_hashes` (blocking; call from a thread).
+
+    One directory scan per batch, so variants from older size/format settings go too.
+    """
+    image_hashes = set(image_hashes)
+    removed = 0
+    with os.scandir(settings.STATIC_DIR) as entries:
+        for entry in entries:
+            match = HASHED_FILENAME.match(entry.name)
+            if match and match.group(1) in image_hashes:
+                removed += _remove_path(entry.path)
+    return removed
+
+
+class HashedStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed files as immutable."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if HASHED_FILENAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,21 @@
+"""Single hook the CRUD layer calls after committing a write for a user.
+
+Keeping every per-user cache behind one function means a new cache only has to
+be registered here, not in each write path of `crud/`.
+"""
+import uuid
+
+from services.portfolio_cache import portfolio_cache
+from services.principal_cache import principal_cache
+from services.replicas import replica_router
+from services.snapshots import snapshot_writer
+
+
+def user_changed(user_id: uuid.UUID):
+    """Drop every cached view of `user_id`; call after the write is committed."""
+    principal_cache.evict(user_id)
+    portfolio_cache.invalidate(user_id)
+    # Read this owner's public pages from the primary until replicas have caught up.
+    replica_router.note_write(user_id)
+    # Unlinks the nginx-served snapshot now; it is re-rendered in the background.
+    snapshot_writer.invalidate(user_id)
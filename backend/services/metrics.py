@@ -0,0 +1,173 @@
+"""In-process request metrics, exposed at /api/metrics in Prometheus text format.
+
+`MetricsMiddleware` records per route template (not raw path, so label
+cardinality stays bounded): request counts by status, a latency histogram, and
+the SQL statements and DB time that `services.query_stats` attributed to the
+request.  Connection-pool gauges are read from `database.engine` at scrape time.
+
+Everything is plain dicts touched from the event loop thread only, so the hot
+path is two perf_counter() calls, a bisect and a few dict updates; see
+`benchmarks/metrics_overhead.py`.  Each uvicorn worker keeps its own numbers;
+Prometheus sums them across targets.
+"""
+import bisect
+import time
+from typing import Dict, List, Tuple
+
+from services import query_stats
+
+# Upper bounds in seconds; the implicit last bucket is +Inf.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+
+class RouteStats:
+    __slots__ = ("statuses", "latency", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.latency = Histogram()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_progress = 0
+        self.started = time.time()
+
+    def record(self, method: str, route: str, status: int, elapsed: float, stats):
+        route_stats = self.routes.get((method, route))
+        if route_stats is None:
+            route_stats = self.routes[(method, route)] = RouteStats()
+        route_stats.statuses[status] = route_stats.statuses.get(status, 0) + 1
+        route_stats.latency.observe(elapsed)
+        if stats is not None:
+            route_stats.db_queries += stats.count
+            route_stats.db_seconds += stats.duration
+
+
+metrics = Metrics()
+
+
+def _route_label(scope, root_path: str) -> str:
+    """Route template of the request, read from the scope after routing filled it in."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps (StaticFiles) only extend root_path with their mount point.
+    mount_path = scope.get("root_path", "")[len(root_path):]
+    if mount_path:
+        return f"{mount_path}/{{path}}"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; must sit inside QueryStatsMiddleware to see its counts."""
+
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        root_path = scope.get("root_path", "")
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.in_progress += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.in_progress -= 1
+            registry.record(scope["method"], _route_label(scope, root_path), status_code, elapsed, query_stats.current())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _pool_gauges(engine) -> List[Tuple[str, str, float]]:
+    pool = engine.sync_engine.pool
+    gauges = []
+    for name, help_text, getter in (
+        ("db_pool_size", "Configured persistent connections.", "size"),
+        ("db_pool_checked_out", "Connections currently in use.", "checkedout"),
+        ("db_pool_checked_in", "Idle connections in the pool.", "checkedin"),
+        ("db_pool_overflow", "Connections open beyond pool_size (negative while below it).", "overflow"),
+    ):
+        if hasattr(pool, getter):
+            gauges.append((name, help_text, float(getattr(pool, getter)())))
+    return gauges
+
+
+def render(engine=None, registry: Metrics = metrics) -> str:
+    """The Prometheus text exposition (format 0.0.4) of everything recorded so far."""
+    lines = []
+    routes = sorted(registry.routes.items())
+
+    lines += ["# HELP http_requests_total Requests handled, by route template and status.",
+              "# TYPE http_requests_total counter"]
+    for (method, route), stats in routes:
+        labels = f'method="{method}",route="{_escape(route)}"'
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+
+    lines += ["# HELP http_request_duration_seconds Time to serve a request, body included.",
+              "# TYPE http_request_duration_seconds histogram"]
+    for (method, route), stats in routes:
+        labels = f'method="{method}",route="{_escape(route)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats.latency.counts):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += stats.latency.counts[-1]
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.latency.sum:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+    lines += ["# HELP http_request_db_queries_total SQL statements executed while serving requests.",
+              "# TYPE http_request_db_queries_total counter"]
+    for (method, route), stats in routes:
+        lines.append(f'http_request_db_queries_total{{method="{method}",route="{_escape(route)}"}} {stats.db_queries}')
+
+    lines += ["# HELP http_request_db_seconds_total Time spent in SQL statements while serving requests.",
+              "# TYPE http_request_db_seconds_total counter"]
+    for (method, route), stats in routes:
+        lines.append(f'http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {stats.db_seconds:.6f}')
+
+    lines += ["# HELP http_requests_in_progress Requests currently being served.",
+              "# TYPE http_requests_in_progress gauge",
+              f"http_requests_in_progress {registry.in_progress}"]
+
+    if engine is not None:
+        for name, help_text, value in _pool_gauges(engine):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+
+    lines += ["# HELP process_start_time_seconds Start time of the worker since the epoch.",
+              "# TYPE process_start_time_seconds gauge",
+              f"process_start_time_seconds {registry.started:.3f}"]
+    return "\n".join(lines) + "\n"
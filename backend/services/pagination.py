@@ -0,0 +1,56 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row of a page, base64url-encoded JSON so
+clients treat it as an opaque token.  Decoding errors surface as 400s.
+Project lists sort by (created_at, id); search results by (score DESC, id).
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+def _encode(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    return _encode({"c": created_at.isoformat(), "i": str(row_id)})
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, uuid.UUID]]:
+    if not cursor:
+        return None
+    try:
+        data = _decode(cursor)
+        return datetime.fromisoformat(data["c"]), uuid.UUID(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise _invalid_cursor()
+
+
+def encode_score_cursor(score: float, row_id: uuid.UUID) -> str:
+    # repr() round-trips the float exactly, so the next page resumes at the same score.
+    return _encode({"s": repr(float(score)), "i": str(row_id)})
+
+
+def decode_score_cursor(cursor: Optional[str]) -> Optional[Tuple[float, uuid.UUID]]:
+    if not cursor:
+        return None
+    try:
+        data = _decode(cursor)
+        return float(data["s"]), uuid.UUID(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise _invalid_cursor()
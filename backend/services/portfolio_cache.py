@@ -0,0 +1,122 @@
+"""Cache of pre-serialized public portfolio responses.
+
+`GET /api/user/portfolio/{user_id}` is the hottest endpoint and its payload only
+changes when the owner writes.  Each entry stores the rendered JSON bytes plus a
+strong ETag derived from them, so repeat visitors sending `If-None-Match` get a
+304 without a database round trip.  Entries are bounded by count and by total
+body bytes (LRU), and are invalidated by `services.invalidation.user_changed`
+after every committed write for the owner.  That only reaches the worker that
+made the write, so entries also expire after ``PORTFOLIO_CACHE_TTL`` seconds:
+the bound on how long another worker or backend replica serves a stale
+portfolio and ETag.
+"""
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from config import settings
+
+
+class CachedPortfolio(NamedTuple):
+    etag: str
+    body: bytes
+    expires_at: float = 0.0  # time.monotonic()
+
+
+def make_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison is what If-None-Match specifies, so ignore a W/ prefix.
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class PortfolioCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[uuid.UUID, CachedPortfolio]" = OrderedDict()
+        self._bytes = 0
+        # Write version of the most recent invalidation per owner, so a render that
+        # started before a write is not stored after it.  Bounded like the entries;
+        # owners that fall off are covered by `_invalidated_floor`.
+        self.version = 0
+        self._invalidated: "OrderedDict[uuid.UUID, int]" = OrderedDict()
+        self._invalidated_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, user_id: uuid.UUID) -> Optional[CachedPortfolio]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._discard(user_id)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry
+
+    def put(self, user_id: uuid.UUID, body: bytes, started_version: int) -> CachedPortfolio:
+        """Store `body` rendered from data read at `started_version` and return the entry.
+
+        The entry is always returned so the caller can serve it, but it is only
+        cached if no write for this owner happened since the render started.
+        """
+        entry = CachedPortfolio(etag=make_etag(body), body=body, expires_at=time.monotonic() + self.ttl)
+        last_write = self._invalidated.get(user_id, self._invalidated_floor)
+        if last_write > started_version or len(body) > self.max_bytes:
+            return entry
+        self._discard(user_id)
+        self._entries[user_id] = entry
+        self._bytes += len(body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+        return entry
+
+    def invalidate(self, user_id: uuid.UUID):
+        self.version += 1
+        self._discard(user_id)
+        self._invalidated[user_id] = self.version
+        self._invalidated.move_to_end(user_id)
+        while len(self._invalidated) > self.max_entries:
+            _, version = self._invalidated.popitem(last=False)
+            self._invalidated_floor = max(self._invalidated_floor, version)
+
+    def _discard(self, user_id: uuid.UUID):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "expired": self.expired,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+portfolio_cache = PortfolioCache(
+    max_entries=settings.PORTFOLIO_CACHE_MAX_ENTRIES,
+    max_bytes=settings.PORTFOLIO_CACHE_MAX_BYTES,
+    ttl=settings.PORTFOLIO_CACHE_TTL,
+)
@@ -0,0 +1,77 @@
+"""In-process TTL + LRU cache of authenticated principals.
+
+`get_current_user` would otherwise run one `SELECT users` per API call.  Entries
+map a user id (the token `sub`) to a detached `User` snapshot and live for at
+most `PRINCIPAL_CACHE_TTL` seconds, and never past the `exp` of the token that
+loaded them.  The cache is per worker process: every write path in `crud/`
+evicts the entry for the user it touched, so this process never serves a stale
+snapshot after a write.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[uuid.UUID, tuple]" = OrderedDict()
+        # Bumped on every eviction; a loader that started before an eviction must
+        # not store what it read (see `put`).
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: uuid.UUID):
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return user
+            del self._entries[user_id]
+        self.misses += 1
+        return None
+
+    def put(self, user_id: uuid.UUID, user, token_exp: Optional[float], version: int):
+        if self.max_size <= 0 or version != self.version:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, user_id: uuid.UUID):
+        self.version += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+)
@@ -0,0 +1,229 @@
+"""On-demand sampling profiler for individual requests.
+
+Off unless ``PROFILER_ENABLED``; then `ProfilerMiddleware` is installed and
+profiles a request when it carries ``X-Profile-Token: <ADMIN_API_TOKEN>`` or,
+for paths starting with one of ``PROFILER_PATHS`` (all paths if empty), with
+probability ``PROFILER_SAMPLE_RATE``.  Any other request costs one header
+lookup and one random().  With the profiler disabled the middleware is not
+installed at all.
+
+While at least one request is being profiled, a daemon thread wakes every
+``PROFILER_INTERVAL_MS`` and records, for each of them, where its asyncio task
+is: the await chain from the task's coroutine down to what it is waiting on
+(a DB round trip, a hash in the process pool...), extended with the event
+loop thread's stack when that task is the one running.  So the profile is
+wall-clock time, with waits ending in ``[await:<type>]``.
+
+Each capture is written as collapsed stacks (``frame;frame;frame count`` per
+line, the input of flamegraph.pl and speedscope) into ``PROFILER_DIR``, which
+keeps only the newest ``PROFILER_MAX_FILES`` captures.  Request metadata is in
+the file name; ``/api/admin/profiles`` lists and downloads them.
+"""
+import asyncio
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+from config import settings
+
+CAPTURE_SUFFIX = ".folded"
+# <ms since epoch>_<id>_<METHOD>_<status>_<duration ms>_<path slug>.folded
+CAPTURE_NAME = re.compile(r"^(\d+)_([0-9a-f]{8})_([A-Z]+)_(\d+)_(\d+)_([A-Za-z0-9.~-]*)\.folded$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_qualname}"
+
+
+def _await_chain(coro):
+    """Frames of `coro` and everything it awaits, outermost first, plus what the innermost one waits on."""
+    frames, awaited = [], None
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            awaited = coro  # a Future or another non-coroutine awaitable
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames, awaited
+
+
+class Capture:
+    __slots__ = ("task", "method", "path", "status", "started", "samples")
+
+    def __init__(self, task: asyncio.Task, method: str, path: str):
+        self.task = task
+        self.method = method
+        self.path = path
+        self.status = 0
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()
+
+
+class Sampler:
+    """One background thread sampling every active capture while there is any."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[int, Capture] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id = 0
+
+    def start(self, capture: Capture):
+        with self._lock:
+            self._loop_thread_id = threading.get_ident()
+            self._active[id(capture)] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, capture: Capture):
+        with self._lock:
+            self._active.pop(id(capture), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            # Held while sampling so `stop` never returns with a sample still being added.
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                loop_frame = sys._current_frames().get(self._loop_thread_id)
+                for capture in self._active.values():
+                    try:
+                        capture.samples[self._stack(capture.task, loop_frame)] += 1
+                    except Exception:
+                        pass  # the await chain changed under us; skip this sample
+
+    def _stack(self, task: asyncio.Task, loop_frame) -> str:
+        frames, awaited = _await_chain(task.get_coro())
+        labels = [_frame_label(frame) for frame in frames]
+        innermost = frames[-1] if frames else None
+        running: List[str] = []
+        frame = loop_frame
+        while frame is not None and frame is not innermost:
+            running.append(_frame_label(frame))
+            frame = frame.f_back
+        if frame is not None:
+            labels.extend(reversed(running))  # this task is on the CPU right now
+        else:
+            labels.append(f"[await:{type(awaited).__name__}]" if awaited is not None else "[await]")
+        return ";".join(labels)
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.~-]", "-", path.strip("/").replace("/", "~"))[:80]
+
+
+class CaptureStore:
+    """Bounded directory of collapsed-stack files, oldest removed first."""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, capture: Capture, duration: float) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        name = (
+            f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}_{capture.method}_{capture.status}"
+            f"_{round(duration * 1000)}_{_slug(capture.path)}{CAPTURE_SUFFIX}"
+        )
+        body = "".join(f"{stack} {count}\n" for stack, count in capture.samples.most_common())
+        tmp_path = os.path.join(self.directory, f".tmp-{name}")
+        with open(tmp_path, "w") as f:
+            f.write(body)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._prune()
+        return name
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.directory) if CAPTURE_NAME.match(name))
+        for name in names[:max(0, len(names) - self.max_files)]:
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass  # another worker pruned it first
+
+    def list(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        captures = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            match = CAPTURE_NAME.match(name)
+            if not match:
+                continue
+            created_ms, _, method, status, duration_ms, slug = match.groups()
+            captures.append({
+                "name": name,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(int(created_ms) / 1000)),
+                "method": method,
+                "path": "/" + slug.replace("~", "/"),
+                "status": int(status),
+                "duration_ms": int(duration_ms),
+                "size": os.path.getsize(os.path.join(self.directory, name)),
+            })
+        return captures
+
+    def path(self, name: str) -> Optional[str]:
+        """Absolute path of capture `name`, or None if it is not a capture file (or gone)."""
+        if not CAPTURE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+sampler = Sampler(settings.PROFILER_INTERVAL_MS / 1000)
+capture_store = CaptureStore(settings.PROFILER_DIR, settings.PROFILER_MAX_FILES)
+
+
+class ProfilerMiddleware:
+    def __init__(self, app, sample_rate: float, paths: List[str], token: str):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.paths = tuple(paths)
+        self.token = token.encode()
+
+    def _selected(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile-token":
+                    return hmac.compare_digest(value, self.token)
+        return (
+            self.sample_rate > 0
+            and random.random() < self.sample_rate
+            and (not self.paths or scope["path"].startswith(self.paths))
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        capture = Capture(asyncio.current_task(), scope["method"], scope["path"])
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                capture.status = message["status"]
+            await send(message)
+
+        sampler.start(capture)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            sampler.stop(capture)
+            duration = time.perf_counter() - capture.started
+            try:
+                await asyncio.to_thread(capture_store.save, capture, duration)
+            except OSError as e:
+                print(f"Could not store profile of {capture.method} {capture.path}: {e!r}")
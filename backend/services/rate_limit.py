@@ -0,0 +1,128 @@
+"""Admission control for the authentication endpoints.
+
+Login, signup and the password-reset pair each cost a bcrypt hash or an email,
+so a credential-stuffing burst can keep every hash worker busy and starve the
+rest of the API.  Each of those routes first takes one token from two buckets:
+
+* per client IP (``X-Real-IP``, set by nginx) and route: caps one source, and
+* per target email and route: caps a distributed attack on one account.
+
+A request is admitted only if both buckets have a token, and then both are
+charged; otherwise it is rejected with 429 + Retry-After before any query or
+hash runs.  Buckets live in a table split into ``AUTH_RATE_SHARDS`` LRU shards
+whose total size is bounded by ``AUTH_RATE_MAX_KEYS``, so a flood of random IPs
+or emails evicts idle buckets instead of growing memory.  Limits are per worker
+process, like the other in-process caches.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from config import settings
+
+
+class TokenBucketTable:
+    """Token buckets (capacity `burst`, refilled at `rate` per second) keyed by string."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int, shards: int):
+        self.rate = rate
+        self.burst = burst
+        self.shard_size = max(1, max_keys // max(1, shards))
+        self._shards: List["OrderedDict[str, List[float]]"] = [OrderedDict() for _ in range(max(1, shards))]
+        self.evicted = 0
+
+    def _shard(self, key: str) -> "OrderedDict[str, List[float]]":
+        return self._shards[hash(key) % len(self._shards)]
+
+    def available(self, key: str, now: float) -> float:
+        bucket = self._shard(key).get(key)
+        if bucket is None:
+            return float(self.burst)
+        tokens, updated = bucket
+        return min(float(self.burst), tokens + (now - updated) * self.rate)
+
+    def charge(self, key: str, tokens: float, now: float):
+        """Store `tokens` (as returned by `available`) minus one for `key`."""
+        shard = self._shard(key)
+        shard[key] = [tokens - 1, now]
+        shard.move_to_end(key)
+        while len(shard) > self.shard_size:
+            # A bucket that refilled would be recreated full, so evicting the least
+            # recently used one only forgets a client that went quiet.
+            shard.popitem(last=False)
+            self.evicted += 1
+
+    def wait_time(self, tokens: float) -> float:
+        """Seconds until a bucket holding `tokens` has one to give."""
+        return (1 - tokens) / self.rate if self.rate > 0 else math.inf
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class AuthRateLimiter:
+    def __init__(self, ip_table: TokenBucketTable, email_table: TokenBucketTable, trust_x_real_ip: bool):
+        self.ip_table = ip_table
+        self.email_table = email_table
+        self.trust_x_real_ip = trust_x_real_ip
+        self.admitted = 0
+        self.rejected = {"ip": 0, "email": 0}
+
+    def client_ip(self, request: Request) -> str:
+        if self.trust_x_real_ip:
+            real_ip = request.headers.get("x-real-ip")
+            if real_ip:
+                return real_ip.strip()
+        return request.client.host if request.client else "unknown"
+
+    def check(self, action: str, request: Request, email: Optional[str] = None):
+        """Charge the caller's buckets for `action`, or raise 429 without charging anything."""
+        now = time.monotonic()
+        checks: List[Tuple[str, TokenBucketTable, str]] = [("ip", self.ip_table, f"{action}:{self.client_ip(request)}")]
+        if email:
+            checks.append(("email", self.email_table, f"{action}:{email.strip().lower()}"))
+
+        levels = []
+        for kind, table, key in checks:
+            tokens = table.available(key, now)
+            if tokens < 1:
+                self.rejected[kind] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts, please retry later.",
+                    headers={"Retry-After": str(max(1, math.ceil(table.wait_time(tokens))))},
+                )
+            levels.append(tokens)
+        for (_, table, key), tokens in zip(checks, levels):
+            table.charge(key, tokens, now)
+        self.admitted += 1
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "ip_buckets": len(self.ip_table),
+            "email_buckets": len(self.email_table),
+            "evicted": self.ip_table.evicted + self.email_table.evicted,
+        }
+
+
+auth_rate_limiter = AuthRateLimiter(
+    ip_table=TokenBucketTable(
+        settings.AUTH_RATE_IP_PER_MINUTE / 60, settings.AUTH_RATE_IP_BURST,
+        settings.AUTH_RATE_MAX_KEYS, settings.AUTH_RATE_SHARDS,
+    ),
+    email_table=TokenBucketTable(
+        settings.AUTH_RATE_EMAIL_PER_MINUTE / 60, settings.AUTH_RATE_EMAIL_BURST,
+        settings.AUTH_RATE_MAX_KEYS, settings.AUTH_RATE_SHARDS,
+    ),
+    trust_x_real_ip=settings.AUTH_RATE_TRUST_X_REAL_IP,
+)
+
+
+def limit_auth(action: str, request: Request, email: Optional[str] = None):
+    if settings.AUTH_RATE_LIMIT_ENABLED:
+        auth_rate_limiter.check(action, request, email)
@@ -0,0 +1,151 @@
+"""Refresh-token rotation with reuse detection.
+
+Every login starts a token family (`models/refresh_token.py`).  A refresh token
+carries ``type=refresh``, its own ``jti`` and the family id ``fam``; exchanging
+it at ``POST /api/user/refresh-token`` is one compare-and-set UPDATE that
+swaps the family's current jti for a new one, and never touches bcrypt.
+
+A token that is not the family's current one has been used before, so someone
+holds a copy: the family is revoked and every token in it stops working.
+Revoked families are also kept in `revoked_families`, an in-memory set bounded
+by ``REFRESH_REVOKED_CACHE_SIZE`` and filled at startup from the table, so
+replays of a revoked chain are refused without a query.  The set is only a
+shortcut: the UPDATE refuses revoked families on its own, so a worker that has
+not heard of a revocation yet still gets it right.
+
+A successful refresh still costs that one UPDATE (by primary key, no bcrypt).
+It cannot be skipped: detecting reuse means recording that a token was
+consumed, and that record has to be shared by every worker and backend
+replica, or a copied token replayed against another process would pass.
+"""
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from crud import refresh_token as crud_refresh_token
+from database import SessionLocal
+from services.auth import create_access_token, create_refresh_token
+
+
+class RevokedFamilies:
+    """Family ids mapped to the time their last token expires; expired ids drop out."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._families: Dict[uuid.UUID, float] = {}
+        self.hits = 0
+
+    def add(self, family_id: uuid.UUID, expires_at: Optional[datetime]):
+        until = expires_at.timestamp() if expires_at else time.time() + settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        self._families[family_id] = until
+        if len(self._families) > self.max_size:
+            now = time.time()
+            self._families = {fam: t for fam, t in self._families.items() if t > now}
+            # Still full: forget the families that expire first; the DB keeps refusing them.
+            while len(self._families) > self.max_size:
+                del self._families[min(self._families, key=self._families.get)]
+
+    def __contains__(self, family_id: uuid.UUID) -> bool:
+        until = self._families.get(family_id)
+        if until is None:
+            return False
+        if until <= time.time():
+            del self._families[family_id]
+            return False
+        self.hits += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._families)
+
+
+revoked_families = RevokedFamilies(settings.REFRESH_REVOKED_CACHE_SIZE)
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _issue(user_id: uuid.UUID, family_id: uuid.UUID, jti: uuid.UUID, expires_at: datetime) -> str:
+    return create_refresh_token(
+        data={"sub": str(user_id), "jti": str(jti), "fam": str(family_id)},
+        expires_delta=expires_at - datetime.now(timezone.utc),
+    )
+
+
+def _new_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+async def start_session(db: AsyncSession, user_id: uuid.UUID) -> str:
+    """Create a token family for a fresh login and return its first refresh token."""
+    jti, expires_at = uuid.uuid4(), _new_expiry()
+    family_id = await crud_refresh_token.create_family(db, user_id, jti, expires_at)
+    return _issue(user_id, family_id, jti, expires_at)
+
+
+def _decode(token: str) -> Tuple[uuid.UUID, uuid.UUID, uuid.UUID]:
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if payload.get("type") != "refresh":
+            raise _invalid_refresh_token()
+        return uuid.UUID(payload["sub"]), uuid.UUID(payload["fam"]), uuid.UUID(payload["jti"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise _invalid_refresh_token()
+
+
+async def rotate(db: AsyncSession, token: str) -> dict:
+    """Exchange a refresh token for a new access token and the next refresh token of its family."""
+    user_id, family_id, jti = _decode(token)
+    if family_id in revoked_families:
+        raise _invalid_refresh_token()
+
+    new_jti, expires_at = uuid.uuid4(), _new_expiry()
+    owner_id = await crud_refresh_token.rotate_family(db, family_id, jti, new_jti, expires_at)
+    if owner_id is None:
+        # Already rotated (a copy is in use), revoked, or unknown: end the whole family.
+        revoked_until = await crud_refresh_token.revoke_family(db, family_id)
+        if revoked_until is not None:
+            print(f"Refresh token reuse detected for family {family_id}; family revoked")
+        revoked_families.add(family_id, revoked_until)
+        raise _invalid_refresh_token()
+    if owner_id != user_id:
+        raise _invalid_refresh_token()
+
+    return {
+        "access_token": create_access_token(
+            data={"sub": str(user_id)},
+            expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        ),
+        "token_type": "bearer",
+        "refresh_token": _issue(user_id, family_id, new_jti, expires_at),
+    }
+
+
+async def revoke_user_sessions(db: AsyncSession, user_id: uuid.UUID):
+    """Revoke every refresh-token family of the user; the caller commits."""
+    for family_id, expires_at in await crud_refresh_token.revoke_user_families(db, user_id):
+        revoked_families.add(family_id, expires_at)
+
+
+async def load_revoked_families():
+    """Startup task: drop expired families and remember the revoked ones still replayable."""
+    try:
+        async with SessionLocal() as db:
+            deleted = await crud_refresh_token.delete_expired_families(db)
+            for family_id, expires_at in await crud_refresh_token.get_revoked_families(db):
+                revoked_families.add(family_id, expires_at)
+        print(f"Refresh tokens: {len(revoked_families)} revoked families loaded, {deleted} expired removed")
+    except Exception as e:
+        # Only the fast path is lost; rotate_family still refuses revoked families.
+        print(f"Could not load revoked refresh-token families: {e!r}")
@@ -0,0 +1,212 @@
+"""Routing of public, read-only endpoints to read replicas.
+
+`get_read_db` is a drop-in for `database.get_db` on routes that never write.
+It hands out a session on a healthy replica (round-robin) unless the read must
+see the primary:
+
+* the client wrote recently: `PrimaryPinMiddleware` sets a short-lived
+  `db_pin` cookie (`REPLICA_PIN_SECONDS`) on every successful non-GET
+  response, so the editor reads their own writes whatever worker serves them;
+* the owner in the path (`{user_id}`) was written through this worker within
+  the same window (`note_write`, called from `services.invalidation`), so a
+  lagging replica cannot refill this worker's portfolio cache with stale data.
+
+A background loop checks every replica each `REPLICA_HEALTH_INTERVAL` seconds
+(connectivity and replay lag against `REPLICA_MAX_LAG_SECONDS`); a replica
+that fails a check or a request is skipped until it passes again, and with no
+healthy replica every read falls back to the primary.  `get_read_db` connects
+before handing out the session, so a request that finds its replica down is
+served from the primary rather than failing.
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from config import settings
+from database import ReplicaSessionLocals, SessionLocal, replica_engines
+
+PIN_COOKIE = "db_pin"
+
+# 0 on a primary (or a caught-up standby), seconds since the last replayed transaction otherwise.
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    __slots__ = ("index", "engine", "sessionmaker", "healthy", "lag", "last_error", "sessions")
+
+    def __init__(self, index: int, engine, sessionmaker):
+        self.index = index
+        self.engine = engine
+        self.sessionmaker = sessionmaker
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.sessions = 0
+
+
+class ReplicaRouter:
+    def __init__(self, replicas: List[Replica], pin_seconds: float):
+        self.replicas = replicas
+        self.pin_seconds = pin_seconds
+        self._next = 0
+        self._written: Dict[str, float] = {}
+        self.primary_sessions = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def note_write(self, user_id):
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        self._written[str(user_id)] = now + self.pin_seconds
+        if len(self._written) > 10000:
+            self._written = {key: until for key, until in self._written.items() if until > now}
+
+    def recently_written(self, user_id) -> bool:
+        until = self._written.get(str(user_id))
+        return until is not None and until > time.monotonic()
+
+    def pick(self) -> Optional[Replica]:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy:
+                return replica
+        return None
+
+    def mark_down(self, replica: Replica, error: str):
+        if replica.healthy:
+            print(f"Replica {replica.index} marked unhealthy: {error}")
+        replica.healthy = False
+        replica.last_error = error
+
+    async def check(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                lag = float((await conn.execute(LAG_QUERY)).scalar() or 0)
+        except Exception as e:
+            self.mark_down(replica, repr(e))
+            return
+        replica.lag = lag
+        if lag > settings.REPLICA_MAX_LAG_SECONDS:
+            self.mark_down(replica, f"replication lag {lag:.1f}s")
+            return
+        if not replica.healthy:
+            print(f"Replica {replica.index} healthy again (lag {lag:.1f}s)")
+        replica.healthy = True
+        replica.last_error = None
+
+    async def run_health_loop(self):
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(settings.REPLICA_HEALTH_INTERVAL)
+
+    def stats(self) -> dict:
+        return {
+            "primary_sessions": self.primary_sessions,
+            "fallbacks": self.fallbacks,
+            "replicas": [
+                {
+                    "index": replica.index,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag,
+                    "sessions": replica.sessions,
+                    "last_error": replica.last_error,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+replica_router = ReplicaRouter(
+    [Replica(i, engine, sessionmaker) for i, (engine, sessionmaker) in enumerate(zip(replica_engines, ReplicaSessionLocals))],
+    settings.REPLICA_PIN_SECONDS,
+)
+
+
+def _must_read_primary(request: Request) -> bool:
+    if request.cookies.get(PIN_COOKIE):
+        return True
+    owner_id = request.path_params.get("user_id")
+    if owner_id is None:
+        return False
+    # Writes are recorded under str(UUID); the path may spell the same id in
+    # upper case, without dashes, or in braces.
+    try:
+        owner_id = uuid.UUID(owner_id)
+    except ValueError:
+        return False  # not an id at all: the route answers 422 without reading anything
+    return replica_router.recently_written(owner_id)
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes: a healthy replica when allowed, else the primary."""
+    replica = None if _must_read_primary(request) else replica_router.pick()
+    if replica is None:
+        replica_router.primary_sessions += 1
+        async with SessionLocal() as db:
+            yield db
+        return
+
+    replica.sessions += 1
+    db = replica.sessionmaker()
+    try:
+        # Check out the connection before the route runs: a replica that is down
+        # then costs this request a fallback to the primary instead of a 500.
+        await db.connection()
+    except (OperationalError, InterfaceError, OSError) as e:
+        await db.close()
+        replica_router.mark_down(replica, repr(e))
+        replica_router.fallbacks += 1
+        replica_router.primary_sessions += 1
+        async with SessionLocal() as db:
+            yield db
+        return
+
+    try:
+        async with db:
+            yield db
+    except (OperationalError, InterfaceError, OSError) as e:
+        # Connection-level failure: stop routing here until the health loop sees it recover.
+        replica_router.mark_down(replica, repr(e))
+        raise
+    except DBAPIError as e:
+        if e.connection_invalidated:
+            replica_router.mark_down(replica, repr(e))
+        raise
+
+
+class PrimaryPinMiddleware:
+    """Pure ASGI middleware: successful writes pin the client's reads to the primary for a few seconds."""
+
+    def __init__(self, app, pin_seconds: float):
+        self.app = app
+        self.cookie = f"{PIN_COOKIE}=1; Max-Age={max(1, int(pin_seconds))}; Path=/api; HttpOnly; SameSite=Lax".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", self.cookie))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
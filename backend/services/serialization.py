@@ -0,0 +1,38 @@
+"""Serialize response models straight to JSON bytes.
+
+A route that returns an ORM object with `response_model=` makes FastAPI validate
+it into the model, dump that to a dict of JSON-safe Python values, and then run
+`json.dumps` over the dict.  For a portfolio with thousands of projects the two
+extra walks dominate the request.  `model_response` validates the ORM object
+and writes JSON in one pass each, both inside pydantic-core, and returns a
+ready `Response` (FastAPI skips its own serialization for those).  Keep
+`response_model=` on the route: it still drives the OpenAPI schema.
+
+See `benchmarks/serialization.py` for the numbers.
+"""
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def dump_json(model, obj: Any) -> bytes:
+    """`obj` (a `model` instance, or ORM rows/dicts shaped like it) as JSON bytes."""
+    adapter = _adapter(model)
+    if not (isinstance(model, type) and isinstance(obj, model)):
+        obj = adapter.validate_python(obj, from_attributes=True)
+    return adapter.dump_json(obj)
+
+
+def model_response(model, obj: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    return FastJSONResponse(dump_json(model, obj), status_code=status_code, headers=headers)
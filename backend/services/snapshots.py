@@ -0,0 +1,190 @@
+"""Prerendered public portfolios, written to disk for nginx to serve.
+
+With ``PORTFOLIO_SNAPSHOT_DIR`` set, every public portfolio has a file
+``<dir>/portfolio/<user_id>.json`` holding exactly the body of
+``GET /api/user/portfolio/{user_id}`` (and, with ``PORTFOLIO_SNAPSHOT_HTML``,
+a small static page ``<user_id>.html``).  nginx answers that route from the
+file with ``try_files`` and only proxies to the API when it is missing.
+
+`services.invalidation.user_changed` calls `snapshot_writer.invalidate` after
+every committed write: the stale files are unlinked at once (so nginx falls
+back to the API, never to old data) and the user is queued.  A background task
+re-renders queued users from the primary after ``PORTFOLIO_SNAPSHOT_DEBOUNCE``
+seconds, so a burst of edits costs one render.  Files are written to a temp
+file in the same directory and renamed into place, so nginx never sees a
+partial document.  `python -m scripts.rebuild_snapshots` regenerates them all.
+"""
+import asyncio
+import html
+import os
+import tempfile
+import uuid
+from typing import Dict, Optional, Set
+from urllib.parse import urlsplit
+
+from config import settings
+from database import SessionLocal
+from schemas.user import PortfolioResponse
+from services.serialization import dump_json
+
+
+async def render_portfolio(db, user_id: uuid.UUID) -> Optional[PortfolioResponse]:
+    """The public portfolio document of `user_id`, or None if there is no such user.
+
+    Shared by the API route and the snapshot writer so both produce the same bytes.
+    """
+    # crud.user imports services.invalidation, which imports this module.
+    from crud import user as crud_user
+
+    user, next_cursor = await crud_user.get_user_with_project_page(db, user_id, settings.PORTFOLIO_EMBEDDED_PROJECTS)
+    if not user:
+        return None
+    # In a real app, you might create a dedicated schema for public portfolio
+    # to explicitly exclude sensitive fields like email and email_verified
+    portfolio = PortfolioResponse.model_validate(user)
+    portfolio.projects_next_cursor = next_cursor
+    return portfolio
+
+
+def _http_url(value: Optional[str]) -> Optional[str]:
+    """`value` if it is an http(s) URL; escaping alone lets javascript: or data: links through."""
+    # urlsplit drops the leading spaces and tabs/newlines a browser would ignore too.
+    if value and urlsplit(value).scheme.lower() in ("http", "https"):
+        return value
+    return None
+
+
+def _link(url: Optional[str], label: str) -> str:
+    url = _http_url(url)
+    return f'<a href="{html.escape(url)}" rel="nofollow">{label}</a>' if url else ""
+
+
+def render_html(portfolio: PortfolioResponse) -> bytes:
+    """A dependency-free page for link previews and crawlers; the app lives at /portfolio/<id>."""
+    e = lambda value: html.escape(value or "")
+    projects = "".join(
+        f"<li><h2>{e(p.name)}</h2><p>{e(p.description)}</p>"
+        + _link(p.demo_url, "Demo") + " "
+        + _link(p.repository_url, "Code")
+        + "</li>"
+        for p in portfolio.projects
+    )
+    image_url = _http_url(portfolio.profile_image_url)
+    image = f'<img src="{e(image_url)}" alt="" width="160">' if image_url else ""
+    return (
+        "<!doctype html><html><head><meta charset=\"utf-8\">"
+        f"<title>{e(portfolio.name) or 'Portfolio'}</title>"
+        f"<meta name=\"description\" content=\"{e(portfolio.job_title)}\">"
+        f"<link rel=\"canonical\" href=\"/portfolio/{portfolio.id}\"></head><body>"
+        f"{image}<h1>{e(portfolio.name)}</h1><p>{e(portfolio.job_title)}</p><p>{e(portfolio.bio)}</p>"
+        f"<ul>{projects}</ul></body></html>"
+    ).encode()
+
+
+def _write_temp(directory: str, data: bytes) -> str:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; nginx runs as another user
+    return tmp_path
+
+
+class SnapshotWriter:
+    def __init__(self, directory: str, write_html: bool, debounce: float):
+        self.directory = os.path.join(directory, "portfolio") if directory else ""
+        self.write_html = write_html
+        self.debounce = debounce
+        self._pending: Set[uuid.UUID] = set()
+        # Version of the last invalidation per queued or rendering user, so only those are kept.
+        self._version = 0
+        self._generation: Dict[uuid.UUID, int] = {}
+        self._wakeup = asyncio.Event()
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def path(self, user_id: uuid.UUID, extension: str) -> str:
+        return os.path.join(self.directory, f"{user_id}.{extension}")
+
+    def _remove(self, user_id: uuid.UUID):
+        for extension in ("json", "html"):
+            try:
+                os.unlink(self.path(user_id, extension))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, user_id: uuid.UUID):
+        """Drop the user's files now and queue a re-render; call after the write is committed."""
+        if not self.enabled:
+            return
+        # Renders that started before this write must not rename their files into place.
+        self._version += 1
+        self._generation[user_id] = self._version
+        self._remove(user_id)
+        self._pending.add(user_id)
+        self._wakeup.set()
+
+    def queue_if_missing(self, user_id: uuid.UUID):
+        """Have the user's files written if they do not exist (the API served an nginx miss)."""
+        if self.enabled and user_id not in self._pending and not os.path.exists(self.path(user_id, "json")):
+            self._pending.add(user_id)
+            self._wakeup.set()
+
+    async def refresh(self, user_id: uuid.UUID, db=None) -> bool:
+        """Render and atomically (re)write the user's files; False if the user does not exist."""
+        generation = self._generation.get(user_id, 0)
+        if db is None:
+            async with SessionLocal() as session:
+                portfolio = await render_portfolio(session, user_id)
+        else:
+            portfolio = await render_portfolio(db, user_id)
+        if portfolio is None:
+            self._remove(user_id)
+            return False
+
+        documents = {"json": dump_json(PortfolioResponse, portfolio)}
+        if self.write_html:
+            documents["html"] = render_html(portfolio)
+        temp_paths = {}
+        try:
+            for extension, data in documents.items():
+                temp_paths[extension] = await asyncio.to_thread(_write_temp, self.directory, data)
+            if self._generation.get(user_id, 0) != generation:
+                return True  # a newer write queued another render
+            for extension, tmp_path in temp_paths.items():
+                os.replace(tmp_path, self.path(user_id, extension))
+            temp_paths.clear()
+            if user_id not in self._pending:
+                self._generation.pop(user_id, None)
+        finally:
+            for tmp_path in temp_paths.values():
+                os.unlink(tmp_path)
+        self.written += 1
+        return True
+
+    async def run(self):
+        """Background task: re-render invalidated users, batching bursts of writes."""
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            batch, self._pending = self._pending, set()
+            for user_id in batch:
+                try:
+                    await self.refresh(user_id)
+                except Exception as e:
+                    # The file stays missing, so nginx keeps proxying this portfolio to the API.
+                    self.failed += 1
+                    print(f"Snapshot of portfolio {user_id} failed: {e!r}")
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "pending": len(self._pending), "written": self.written, "failed": self.failed}
+
+
+snapshot_writer = SnapshotWriter(
+    settings.PORTFOLIO_SNAPSHOT_DIR, settings.PORTFOLIO_SNAPSHOT_HTML, settings.PORTFOLIO_SNAPSHOT_DEBOUNCE,
+)
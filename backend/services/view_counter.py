@@ -0,0 +1,123 @@
+"""Portfolio view counts without a write per view.
+
+``GET /api/user/portfolio/{user_id}`` is the hottest read path; an
+``UPDATE ... SET views = views + 1`` per hit would make every popular portfolio
+a row-lock hotspot.  Instead `ViewCounter.hit` adds one to a dict entry in this
+process (no I/O, no await), and a background task writes the accumulated
+deltas to ``portfolio_stats`` every ``VIEW_COUNTER_FLUSH_INTERVAL`` seconds, or
+sooner once ``VIEW_COUNTER_FLUSH_THRESHOLD`` distinct portfolios are pending.
+
+Deltas are split over ``VIEW_COUNTER_SHARDS`` dicts by user id.  A flush swaps
+each shard for an empty one and upserts it as one statement (at most
+``FLUSH_CHUNK`` rows), so hits keep landing in fresh shards while earlier ones
+are written, and no statement grows past the bind-parameter limit.  A failed
+flush merges its deltas back for the next attempt; the lifespan flushes once
+more on shutdown.  Counts are per worker until flushed, so totals are exact
+but lag by up to one interval.
+
+Behind nginx, snapshot hits never reach the API: nginx mirrors each one to
+``POST /api/internal/portfolio-views/{user_id}`` (see nginx/nginx.conf).  A
+snapshot miss jumps to ``@backend_api`` before the mirror runs, so the route
+itself counts the views it serves; each view is counted exactly once.
+"""
+import asyncio
+import uuid
+from collections import Counter
+from typing import List
+
+from config import settings
+from crud import portfolio_stats as crud_portfolio_stats
+from database import SessionLocal
+
+FLUSH_CHUNK = 5000  # rows per upsert: two bind parameters each, far below asyncpg's 32767
+
+
+class ViewCounter:
+    def __init__(self, shards: int, flush_interval: float, flush_threshold: int):
+        self._shards: List[Counter] = [Counter() for _ in range(max(1, shards))]
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending_keys = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.hits = 0
+        self.flushed_views = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def hit(self, user_id: uuid.UUID, count: int = 1):
+        shard = self._shards[hash(user_id) % len(self._shards)]
+        if user_id not in shard:
+            self._pending_keys += 1
+            if self._pending_keys >= self.flush_threshold:
+                self._wakeup.set()
+        shard[user_id] += count
+        self.hits += count
+
+    def pending(self, user_id: uuid.UUID) -> int:
+        """Views of `user_id` counted by this worker and not flushed yet."""
+        return self._shards[hash(user_id) % len(self._shards)].get(user_id, 0)
+
+    def _restore(self, deltas: Counter):
+        for user_id, count in deltas.items():
+            shard = self._shards[hash(user_id) % len(self._shards)]
+            if user_id not in shard:
+                self._pending_keys += 1
+            shard[user_id] += count
+
+    async def flush(self):
+        """Write every pending delta to portfolio_stats."""
+        async with self._flush_lock:
+            for i, deltas in enumerate(self._shards):
+                if not deltas:
+                    continue
+                self._shards[i] = Counter()
+                self._pending_keys -= len(deltas)
+                items = list(deltas.items())
+                try:
+                    async with SessionLocal() as db:
+                        for start in range(0, len(items), FLUSH_CHUNK):
+                            await crud_portfolio_stats.add_views(db, items[start:start + FLUSH_CHUNK])
+                        await db.commit()
+                except BaseException:
+                    # Not committed (error or cancellation): keep the views for the next flush.
+                    self._restore(deltas)
+                    raise
+                self.flushed_views += sum(deltas.values())
+            self.flushes += 1
+
+    async def run(self):
+        """Background task: flush on the interval, or early when many portfolios are pending."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.failed_flushes += 1
+                print(f"View counter flush failed, retrying next interval: {e!r}")
+
+    async def shutdown(self):
+        """Final flush after the background task is cancelled; counts are lost only if this fails."""
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"View counter: {self._pending_keys} portfolios not flushed on shutdown: {e!r}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.VIEW_COUNTER_ENABLED,
+            "hits": self.hits,
+            "pending_portfolios": self._pending_keys,
+            "flushed_views": self.flushed_views,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+view_counter = ViewCounter(
+    settings.VIEW_COUNTER_SHARDS, settings.VIEW_COUNTER_FLUSH_INTERVAL, settings.VIEW_COUNTER_FLUSH_THRESHOLD,
+)
@@ -0,0 +1,172 @@
+"""Startup warm-up and the readiness state behind ``/api/live`` and ``/api/ready``.
+
+Without it a fresh worker answers its first requests cold: each of the first
+``DB_POOL_SIZE`` concurrent requests pays a TCP + auth handshake with Postgres,
+the first logins spawn the password-hash processes (a fresh interpreter each,
+importing passlib and the hash backend), and docker-compose already routes traffic to it
+because the old ``/api/health`` answered "ok" without checking anything.
+
+`warm_up` runs as a background task started by the lifespan, so uvicorn
+accepts connections (and ``/api/live`` answers) while it works:
+
+* pool:    opens ``WARMUP_DB_CONNECTIONS`` connections at once (``SELECT 1``
+           each) on the primary, so they sit idle in the pool; retried with
+           backoff until the database answers.  Replicas get one best-effort
+           attempt in a separate task (`warm_replicas`) and never hold up
+           readiness: a dead replica is the replica health loop's business
+           (services/replicas.py), and reads fall back to the primary;
+* schemas: builds the serializer of every route's ``response_model``
+           (services/serialization.py) before a request needs it;
+* hashing: one hash per ``HASH_POOL_WORKERS`` in the hash pool, which starts
+           every worker process with the calibrated policy.
+
+`readiness.check` (``/api/ready``) is 503 until that is done, then reflects
+the pool: a ``SELECT 1`` through it within ``READY_CHECK_TIMEOUT`` seconds,
+with the result cached for ``READY_CHECK_CACHE`` seconds so probes from
+several sources cost one round trip.  A saturated pool (no connection free
+within the timeout) reports not ready as well, which is what a load balancer
+should see.  ``benchmarks/cold_start.py`` measures spawn-to-first-request.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import text
+
+from config import settings
+from database import engine, replica_engines
+from services.hashing import hash_pool
+from services.serialization import _adapter
+
+RETRY_MAX_DELAY = 5.0
+
+
+def pool_stats(target) -> dict:
+    pool = target.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+async def _open_connections(target, count: int):
+    # All held at the same time, otherwise the pool would hand the same connection back each time.
+    connections = []
+    try:
+        for connection in await asyncio.gather(*(target.connect() for _ in range(count)), return_exceptions=True):
+            if isinstance(connection, BaseException):
+                raise connection
+            connections.append(connection)
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in connections))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+
+
+class Readiness:
+    def __init__(self, check_timeout: float, check_cache: float):
+        self.check_timeout = check_timeout
+        self.check_cache = check_cache
+        self.warm = False
+        self.started = time.monotonic()
+        self.steps: Dict[str, float] = {}
+        self.warmup_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._checked_at = 0.0
+        self._check_ok = False
+        self._check_lock = asyncio.Lock()
+
+    async def _step(self, name: str, coro):
+        start = time.perf_counter()
+        await coro
+        self.steps[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def warm_replicas(self):
+        """Background task next to `warm_up`: best effort, failures are only logged."""
+        count = min(settings.WARMUP_DB_CONNECTIONS, settings.DB_POOL_SIZE)
+        for i, replica in enumerate(replica_engines):
+            try:
+                await _open_connections(replica, count)
+            except Exception as e:
+                print(f"Warm-up: replica {i} not warmed, left to the health loop: {e!r}")
+
+    async def _warm_pool(self):
+        count = min(settings.WARMUP_DB_CONNECTIONS, settings.DB_POOL_SIZE)
+        delay = 0.2
+        while True:
+            try:
+                await _open_connections(engine, count)
+                self.last_error = None
+                return
+            except Exception as e:
+                self.last_error = f"database: {e!r}"
+                print(f"Warm-up: database not reachable, retrying in {delay:.1f}s: {e!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    async def _warm_schemas(self, app):
+        for route in app.routes:
+            if isinstance(route, APIRoute) and route.response_model is not None:
+                _adapter(route.response_model)
+
+    async def warm_up(self, app):
+        """Background task: make the first real requests as fast as the later ones, then report ready."""
+        try:
+            await self._step("schemas", self._warm_schemas(app))
+            await asyncio.gather(
+                self._step("db_pool", self._warm_pool()),
+                self._step("hash_pool", hash_pool.warm_up()),
+            )
+        except Exception as e:
+            # Stays not ready: /api/ready shows the error and the orchestrator keeps traffic away.
+            self.last_error = f"warm-up: {e!r}"
+            print(f"Warm-up failed: {e!r}")
+            return
+        self.warmup_seconds = round(time.monotonic() - self.started, 3)
+        self._checked_at, self._check_ok = time.monotonic(), True
+        self.warm = True
+        print(f"Warm-up done in {self.warmup_seconds}s: {self.steps}")
+
+    def mark_ready(self):
+        """Skip the warm-up (WARMUP_ENABLED=false): ready at once, /api/ready still checks the pool."""
+        self.warmup_seconds = round(time.monotonic() - self.started, 3)
+        self.warm = True
+
+    async def _ping(self) -> bool:
+        try:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = f"database: {e!r}"
+            return False
+
+    async def check(self) -> bool:
+        if not self.warm:
+            return False
+        async with self._check_lock:
+            if time.monotonic() - self._checked_at >= self.check_cache:
+                try:
+                    self._check_ok = await asyncio.wait_for(self._ping(), self.check_timeout)
+                except asyncio.TimeoutError:
+                    self.last_error = f"database: no pool connection within {self.check_timeout}s"
+                    self._check_ok = False
+                self._checked_at = time.monotonic()
+            return self._check_ok
+
+    def stats(self) -> dict:
+        return {
+            "warm": self.warm,
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "warmup_s": self.warmup_seconds,
+            "warmup_ms": self.steps,
+            "last_error": self.last_error,
+            "pool": pool_stats(engine),
+            "hash_pool_started": hash_pool.started,
+        }
+
+
+readiness = Readiness(settings.READY_CHECK_TIMEOUT, settings.READY_CHECK_CACHE)
@@ -22,6 +22,21 @@ api.interceptors.request.use(
   }
 );
 
+// Refresh tokens are single-use (the server revokes the whole session when one is
+// reused), so requests that fail together share one in-flight refresh call.
+let refreshPromise = null;
+
+const refreshTokens = (refreshToken) => {
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post(`${import.meta.env.VITE_API_BASE_URL}/user/refresh-token`, { refresh_token: refreshToken })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Interceptor để xử lý lỗi response, ví dụ: refresh token khi access token hết hạn
 api.interceptors.response.use(
   (response) => response,
@@ -39,9 +54,7 @@ api.interceptors.response.use(
         }
 
         // Gọi API refresh token
-        const res = await axios.post(`${import.meta.env.VITE_API_BASE_URL}/user/refresh-token`, {
-          refresh_token: refreshToken,
-        });
+        const res = await refreshTokens(refreshToken);
 
         const { access_token, refresh_token: newRefreshToken } = res.data;
 
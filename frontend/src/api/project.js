@@ -7,5 +7,22 @@ export const updateProject = (projectId, projectData) => api.put(`/user/projects
 export const deleteProject = (projectId) => api.delete(`/user/projects/${projectId}`);
 
 // --- New API call ---
-export const getAllUserProjects = () => api.get('/user/projects/me');
+// Paginated: returns { items, next_cursor }; pass next_cursor back to get the next page.
+export const getUserProjectsPage = (cursor = null, limit = 100) =>
+  api.get('/user/projects/me', { params: { limit, ...(cursor ? { cursor } : {}) } });
+
+export const getAllUserProjects = async () => {
+  const projects = [];
+  let cursor = null;
+  do {
+    const response = await getUserProjectsPage(cursor);
+    projects.push(...response.data.items);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return projects;
+};
+
+// One request, one transaction: operations = [{ op: 'create'|'update'|'delete', id?, project? }, ...]
+// Returns { results: [{ index, op, status, id, project }] } in the same order.
+export const bulkProjects = (operations) => api.post('/user/projects/bulk', { operations });
 // --- End new API call ---
\ No newline at end of file
@@ -0,0 +1,15 @@
+// src/api/search.js
+import api from './axios';
+
+// Returns { users: { items, next_cursor }, projects: { items, next_cursor } }.
+// `snippet` is already HTML-escaped, with matches wrapped in <mark>.
+export const search = (q, { type = 'all', limit = 20, usersCursor = null, projectsCursor = null } = {}) =>
+  api.get('/search', {
+    params: {
+      q,
+      type,
+      limit,
+      ...(usersCursor ? { users_cursor: usersCursor } : {}),
+      ...(projectsCursor ? { projects_cursor: projectsCursor } : {}),
+    },
+  });
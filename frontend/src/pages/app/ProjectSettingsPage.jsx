@@ -23,8 +23,8 @@ function ProjectSettingsPage() {
     if (!userProfile) return;
     setLocalLoading(true);
     try {
-      const response = await getAllUserProjects();
-      setProjects(response.data);
+      const allProjects = await getAllUserProjects();
+      setProjects(allProjects);
     } catch (err) {
       console.error('Failed to fetch user projects:', err);
       // Optionally set an error state for project list fetching
@@ -9,6 +9,7 @@ function PublicPortfolioPage() {
   const [portfolio, setPortfolio] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchPortfolio = async () => {
@@ -33,6 +34,26 @@ function PublicPortfolioPage() {
     }
   }, [userId]);
 
+  // The portfolio embeds only the first page of projects; fetch the rest on demand.
+  const loadMoreProjects = async () => {
+    if (!portfolio?.projects_next_cursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${import.meta.env.VITE_API_BASE_URL}/user/portfolio/${userId}/projects`, {
+        params: { cursor: portfolio.projects_next_cursor },
+      });
+      setPortfolio((prev) => ({
+        ...prev,
+        projects: [...prev.projects, ...response.data.items],
+        projects_next_cursor: response.data.next_cursor,
+      }));
+    } catch (err) {
+      console.error('Failed to load more projects:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) return <div className="text-center p-8">Loading portfolio...</div>;
   if (error) return <div className="text-center p-8 text-red-500">Error: {error}</div>;
   if (!portfolio) return <div className="text-center p-8">Portfolio not found.</div>;
@@ -100,6 +121,17 @@ function PublicPortfolioPage() {
                 </div>
               </div>
             ))}
+            {portfolio.projects_next_cursor && (
+              <div className="text-center">
+                <button
+                  onClick={loadMoreProjects}
+                  disabled={loadingMore}
+                  className="px-4 py-2 bg-indigo-600 text-white rounded-md hover:bg-indigo-700 transition duration-300 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more projects'}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <p className="text-gray-600">No projects to display yet.</p>